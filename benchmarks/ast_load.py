@@ -0,0 +1,67 @@
+#! cd .. && python3 -m benchmarks.ast_load
+
+"""
+compare loading a cached ast using pickle and the binary format
+
+The largest modules in res/ and examples/ are loaded the same way the
+builder loads them, and the cache entry for each is encoded using both
+pickle and daedalus.serialize. The size of each encoding and the best
+time to decode it are reported.
+
+    python -m benchmarks.ast_load [--count N] [--repeat N]
+"""
+
+import os
+import glob
+import time
+import pickle
+import argparse
+
+from daedalus.builder import JsFile
+from daedalus import serialize
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn()
+        elapsed = time.process_time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=5,
+        help="number of modules to measure, largest first")
+    parser.add_argument("--repeat", type=int, default=25,
+        help="number of times each measurement is repeated")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = glob.glob(os.path.join(root, "res", "**", "*.js"), recursive=True)
+    paths += glob.glob(os.path.join(root, "examples", "*.js"))
+    paths = sorted(paths, key=os.path.getsize, reverse=True)[:args.count]
+
+    print("%-24s %10s %10s %10s %10s" % (
+        "module", "pickle B", "pickle ms", "binary B", "binary ms"))
+
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        jsf = JsFile(path, name, quiet=True)
+        jsf.load()
+        record = (jsf.size, jsf.ast, jsf.imports,
+            jsf.module_imports, jsf.exports, jsf.styles)
+
+        data_pickle = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        data_binary = serialize.dumps(record)
+
+        t_pickle = best_time(lambda: pickle.loads(data_pickle), args.repeat)
+        t_binary = best_time(lambda: serialize.loads(data_binary), args.repeat)
+
+        print("%-24s %10d %10.2f %10d %10.2f" % (os.path.basename(path),
+            len(data_pickle), 1e3 * t_pickle, len(data_binary), 1e3 * t_binary))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,94 @@
+#! cd .. && python3 -m benchmarks.build_memory
+
+"""
+measure the peak memory and time of building a large project
+
+A project is generated, and built in a new process for each
+configuration: with the module asts copied before the scope transform
+is applied, without copying, and without copying while the output is
+written to a file one module at a time. The peak resident set size is reported
+after the files are loaded and at the end of the build. The difference
+is the memory used to scope and format the program.
+
+    python -m benchmarks.build_memory [--modules N] [--files N]
+"""
+
+import os
+import io
+import sys
+import time
+import json
+import shutil
+import resource
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+from daedalus.builder import Builder
+from benchmarks.incremental_build import write_project
+
+def max_rss():
+    """ returns the peak resident set size of this process in MB """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss /= 1024
+    return rss / 1024
+
+class MeasuredBuilder(Builder):
+
+    def discover(self, path):
+        jsm = super(MeasuredBuilder, self).discover(path)
+        self.loaded_rss = max_rss()
+        return jsm
+
+def child(path, minify, copy_ast, stream):
+    """ build the project and print the measurements as json """
+    builder = MeasuredBuilder([os.path.dirname(path)], {})
+    builder.cache = None
+    builder.copy_ast = copy_ast
+    t0 = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()), \
+            tempfile.TemporaryFile("w") as output:
+        builder.build(path, minify=minify, output=output if stream else None)
+    elapsed = time.process_time() - t0
+    if builder.error:
+        raise builder.error
+    print(json.dumps({"loaded": builder.loaded_rss, "peak": max_rss(), "time": elapsed}))
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=60,
+        help="number of modules in the generated project")
+    parser.add_argument("--files", type=int, default=10,
+        help="number of files included by each module")
+    parser.add_argument("--child", nargs=4, default=None,
+        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        path, minify, copy_ast, stream = args.child
+        child(path, minify == "1", copy_ast == "1", stream == "1")
+        return
+
+    root = tempfile.mkdtemp()
+    try:
+        path = write_project(root, args.modules, args.files)
+        print("%d modules, %d files" % (args.modules, args.modules * (args.files + 1) + 1))
+        print("%-8s %-8s %-8s %12s %12s %12s %10s" % ("minify", "copy", "stream",
+            "loaded (MB)", "peak (MB)", "build (MB)", "time (s)"))
+        for minify in ("0", "1"):
+            for copy_ast, stream in (("1", "0"), ("0", "0"), ("0", "1")):
+                output = subprocess.check_output([sys.executable, "-m",
+                    "benchmarks.build_memory", "--child", path, minify, copy_ast, stream],
+                    stderr=subprocess.DEVNULL)
+                result = json.loads(output.decode("utf-8").strip().split("\n")[-1])
+                print("%-8s %-8s %-8s %12.1f %12.1f %12.1f %10.2f" % (minify == "1",
+                    copy_ast == "1", stream == "1", result["loaded"], result["peak"],
+                    result["peak"] - result["loaded"], result["time"]))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,109 @@
+#! cd .. && python3 -m benchmarks.incremental_build
+
+"""
+measure the time to rebuild a large project after a one line change
+
+A project is generated with a number of modules, each of which
+includes several files. The project is built once by Builder, and
+once by IncrementalBuilder. A line is then appended to a file in one
+module, and the project is built again by the same builders. Files are
+parsed without the ast cache, so that the first build parses every file.
+
+    python -m benchmarks.incremental_build [--modules N] [--files N] [--repeat N]
+"""
+
+import os
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from daedalus.builder import Builder
+from daedalus.incremental import IncrementalBuilder
+
+def write_project(root, modules, files):
+    """
+    write a project to the directory root
+
+    returns the path to the index file
+    """
+
+    for m in range(modules):
+        moddir = os.path.join(root, "mod%d" % m)
+        os.makedirs(moddir)
+        lines = []
+        for f in range(files):
+            lines.append("include './file%d.js'" % f)
+            with open(os.path.join(moddir, "file%d.js" % f), "w") as wf:
+                for i in range(10):
+                    wf.write("function f%d_%d_%d(x, y) {\n" % (m, f, i))
+                    wf.write("    const z = [x, y].map(v => v * %d)\n" % i)
+                    wf.write("    return {sum: z[0] + z[1], text: `${x}:${y}`}\n")
+                    wf.write("}\n")
+        if m > 0:
+            lines.append("from module mod%d import {value%d}" % (m - 1, m - 1))
+        lines.append("export function value%d() {\n    return f%d_0_0(1, 2)\n}" % (m, m))
+        with open(os.path.join(moddir, "mod%d.js" % m), "w") as wf:
+            wf.write("\n".join(lines) + "\n")
+
+    path = os.path.join(root, "app.js")
+    with open(path, "w") as wf:
+        wf.write("from module mod%d import {value%d}\n" % (modules - 1, modules - 1))
+        wf.write("export function main() {\n    return value%d()\n}\n" % (modules - 1))
+    return path
+
+def edit(path, count):
+    """ append a line to a file, and advance the modified time """
+    st = os.stat(path)
+    with open(path, "a") as af:
+        af.write("const edit%d = %d\n" % (count, count))
+    os.utime(path, (st.st_atime, st.st_mtime + 1))
+
+def timed_build(builder, path):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        builder.build(path, sourcemap=True)
+    if builder.error:
+        raise builder.error
+    return time.perf_counter() - t0
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=60,
+        help="number of modules in the generated project")
+    parser.add_argument("--files", type=int, default=10,
+        help="number of files included by each module")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of edits measured")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        path = write_project(root, args.modules, args.files)
+
+        builders = []
+        for cls in (Builder, IncrementalBuilder):
+            builder = cls([root], {})
+            builder.cache = None
+            builders.append((cls.__name__, builder, timed_build(builder, path)))
+
+        print("%d modules, %d files" % (args.modules, args.modules * (args.files + 1) + 1))
+        print("%-20s %12s %12s" % ("builder", "first (s)", "edit (s)"))
+        target = os.path.join(root, "mod%d" % (args.modules // 2), "file0.js")
+        results = {}
+        for count in range(args.repeat):
+            edit(target, count)
+            for name, builder, _ in builders:
+                elapsed = timed_build(builder, path)
+                results[name] = min(results.get(name, elapsed), elapsed)
+
+        for name, builder, first in builders:
+            print("%-20s %12.3f %12.3f" % (name, first, results[name]))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,75 @@
+#! cd .. && python3 -m benchmarks.minify_names
+
+"""
+compare the size of minified builds with and without ranked labels
+
+Each example, and a generated project, is built with minify enabled.
+The labels are assigned in a single pass, in the order the variables
+are defined, and then in a second pass with the shortest labels given
+to the most referenced variables. The size of the javascript, and the
+size after gzip compression, are reported for both.
+
+    python -m benchmarks.minify_names [--modules N] [--files N]
+"""
+
+import os
+import io
+import glob
+import gzip
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from daedalus.builder import Builder
+from benchmarks.project import generate_project
+
+def build_size(path, search_paths, rank_labels):
+    """ returns the size and the compressed size of a minified build """
+    builder = Builder(search_paths, {})
+    builder.cache = None
+    builder.disable_warnings = True
+    builder.rank_labels = rank_labels
+    with contextlib.redirect_stdout(io.StringIO()), \
+            contextlib.redirect_stderr(io.StringIO()):
+        css, js, html = builder.build(path, minify=True)
+    if builder.error:
+        raise builder.error
+    data = js.encode("utf-8")
+    return len(data), len(gzip.compress(data, 9))
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=40,
+        help="number of modules in the generated project")
+    parser.add_argument("--files", type=int, default=8,
+        help="number of files included by each module")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    projects = [(os.path.basename(path), path, [])
+        for path in sorted(glob.glob(os.path.join(root, "examples", "*.js")))]
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = generate_project(tmpdir, modules=args.modules, files=args.files)
+        projects.append(("generated", path, [tmpdir]))
+
+        print("%-16s %10s %10s %8s %10s %10s %8s" % ("project",
+            "single B", "ranked B", "delta", "single gz", "ranked gz", "delta"))
+        for name, path, search_paths in projects:
+            try:
+                single, single_gz = build_size(path, search_paths, False)
+            except Exception:
+                # not every example can be built on its own
+                continue
+            ranked, ranked_gz = build_size(path, search_paths, True)
+            print("%-16s %10d %10d %7.1f%% %10d %10d %7.1f%%" % (name,
+                single, ranked, 100 * (ranked - single) / single,
+                single_gz, ranked_gz, 100 * (ranked_gz - single_gz) / single_gz))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
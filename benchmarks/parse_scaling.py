@@ -0,0 +1,78 @@
+#! cd .. && python3 -m benchmarks.parse_scaling
+
+"""
+measure how parse time scales with the size of a module
+
+A module containing a single large array of static data is generated
+with 1k to 1M tokens. Grouping brackets is measured using ParserBase,
+which has no precedence levels, and then the complete parse is measured
+using Parser. The time per token should remain roughly constant as the
+module grows.
+
+    python -m benchmarks.parse_scaling [--max-tokens N] [--engine NAME] [--repeat N]
+"""
+
+import time
+import argparse
+
+from daedalus.lexer import Lexer
+from daedalus.parser import ParserBase, Parser
+
+def static_data_module(ntokens):
+    """ generate source text for a module with approximately ntokens tokens """
+
+    rows = []
+    # each row produces 28 tokens, including the newline
+    for i in range(ntokens // 28 + 1):
+        rows.append("  {id: %d, name: 'row %d', tags: [%d, %d, [%d]], f: g(%d)}," % (
+            i, i, i, i, i, i))
+    return "const table = [\n" + "\n".join(rows) + "\n]\n"
+
+def timed(fn, tokens, repeat):
+    """ return the best time to parse a copy of the token stream """
+
+    best = None
+    for _ in range(repeat):
+        # the token list is modified by the parser
+        seq = [tok.clone() for tok in tokens]
+        t0 = time.process_time()
+        fn(seq)
+        elapsed = time.process_time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--max-tokens", type=int, default=1000000,
+        help="size of the largest generated module")
+    parser.add_argument("--engine", default="default",
+        help="parser engine used for the complete parse")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of times each measurement is repeated")
+    args = parser.parse_args()
+
+    def group(tokens):
+        ParserBase().parse(tokens)
+
+    def parse(tokens):
+        p = Parser()
+        p.engine = args.engine
+        p.parse(tokens)
+
+    print("%9s %10s %12s %10s %12s" % (
+        "tokens", "group (s)", "group us/tok", "parse (s)", "parse us/tok"))
+
+    ntokens = 1000
+    while ntokens <= args.max_tokens:
+        tokens = Lexer().lex(static_data_module(ntokens))
+        count = len(tokens)
+        t_group = timed(group, tokens, args.repeat)
+        t_parse = timed(parse, tokens, args.repeat)
+        print("%9d %10.3f %12.2f %10.3f %12.2f" % (
+            count, t_group, 1e6 * t_group / count, t_parse, 1e6 * t_parse / count))
+        ntokens *= 10
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,133 @@
+#! cd .. && python3 -m benchmarks.project
+
+"""
+generate a synthetic daedalus project
+
+Each module has an index file which includes the other files of the
+module, and imports a function from several earlier modules. Every
+file exports functions, and optionally classes, template strings and
+style sheets, so that the project exercises the lexer, parser and
+transforms in roughly the proportions of a real application. The
+output is the same for the same arguments.
+
+    python -m benchmarks.project [--modules N] [--files N] [--fanout N] out
+"""
+
+import os
+import argparse
+
+def write_file(path, m, f, functions, classes, templates, styles):
+    """ write one file of a module """
+
+    lines = []
+    for i in range(functions):
+        lines.append("export function f%d_%d_%d(x, y) {" % (m, f, i))
+        lines.append("    const z = [x, y].map(v => v * %d)" % i)
+        lines.append("    if (z[0] > z[1]) {")
+        lines.append("        return {sum: z[0] + z[1], diff: z[0] - z[1]}")
+        lines.append("    }")
+        lines.append("    return {sum: z[0] + z[1], diff: z[1] - z[0]}")
+        lines.append("}")
+
+    for i in range(classes):
+        lines.append("export class Model%d_%d_%d {" % (m, f, i))
+        lines.append("    constructor(items) {")
+        lines.append("        this.items = items")
+        lines.append("        this.count = 0")
+        lines.append("    }")
+        lines.append("    total() {")
+        lines.append("        let total = 0")
+        lines.append("        for (const item of this.items) {")
+        lines.append("            total += item.value ?? 0")
+        lines.append("        }")
+        lines.append("        return total")
+        lines.append("    }")
+        lines.append("}")
+
+    for i in range(templates):
+        lines.append("export function label%d_%d_%d(item) {" % (m, f, i))
+        lines.append("    return `${item.name}: ${item.value * %d} of ${item.total}`" % (i + 1))
+        lines.append("}")
+
+    if styles:
+        lines.append("export const style%d_%d = {" % (m, f))
+        for i in range(styles):
+            lines.append("    item%d: StyleSheet({color: 'blue', padding: '%dpx', "
+                "'margin-left': '%dem'})," % (i, i, i))
+        lines.append("}")
+
+    with open(path, "w") as wf:
+        wf.write("\n".join(lines) + "\n")
+
+def generate_project(root, modules=10, files=5, fanout=2, functions=10,
+        classes=2, templates=2, styles=2):
+    """
+    write a project to the directory root
+
+    modules: the number of modules
+    files: the number of files included by each module
+    fanout: the number of earlier modules imported by each module
+    functions, classes, templates, styles: the number of each
+        definition in a file
+
+    returns the path to the index file of the project
+    """
+
+    for m in range(modules):
+        moddir = os.path.join(root, "mod%d" % m)
+        os.makedirs(moddir)
+
+        lines = []
+        for f in range(files):
+            lines.append("include './file%d.js'" % f)
+            write_file(os.path.join(moddir, "file%d.js" % f), m, f,
+                functions, classes, templates, styles)
+
+        # import from the previous modules, spaced evenly
+        imports = sorted({m - 1 - (k * m) // fanout for k in range(min(fanout, m))})
+        for i in imports:
+            lines.append("from module mod%d import {value%d}" % (i, i))
+
+        lines.append("export function value%d() {" % m)
+        terms = ["value%d()" % i for i in imports]
+        if files and functions:
+            terms.append("f%d_0_0(1, 2).sum" % m)
+        lines.append("    return %s" % (" + ".join(terms) or "0"))
+        lines.append("}")
+
+        with open(os.path.join(moddir, "mod%d.js" % m), "w") as wf:
+            wf.write("\n".join(lines) + "\n")
+
+    path = os.path.join(root, "app.js")
+    with open(path, "w") as wf:
+        wf.write("from module mod%d import {value%d}\n" % (modules - 1, modules - 1))
+        wf.write("export function main() {\n    return value%d()\n}\n" % (modules - 1))
+    return path
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=10,
+        help="number of modules")
+    parser.add_argument("--files", type=int, default=5,
+        help="number of files included by each module")
+    parser.add_argument("--fanout", type=int, default=2,
+        help="number of modules imported by each module")
+    parser.add_argument("--functions", type=int, default=10,
+        help="number of functions in each file")
+    parser.add_argument("--classes", type=int, default=2,
+        help="number of classes in each file")
+    parser.add_argument("--templates", type=int, default=2,
+        help="number of template strings in each file")
+    parser.add_argument("--styles", type=int, default=2,
+        help="number of style sheets in each file")
+    parser.add_argument("out",
+        help="directory to write the project to, which must not exist")
+    args = parser.parse_args()
+
+    path = generate_project(args.out, args.modules, args.files, args.fanout,
+        args.functions, args.classes, args.templates, args.styles)
+    print(path)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
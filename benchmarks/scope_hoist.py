@@ -0,0 +1,134 @@
+#! cd .. && python3 -m benchmarks.scope_hoist
+
+"""
+compare the size and startup time of module and scope hoisted builds
+
+Each project is built with every module wrapped in a function, and
+with scope hoisting, with and without minification. The size of the
+output is reported before and after gzip compression.
+
+When node is installed, the startup time is the best time to run the
+output in a new context, with the browser globals replaced by stubs.
+
+    python -m benchmarks.scope_hoist [--repeat N] [--modules N] [path ...]
+"""
+
+import os
+import io
+import gzip
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+from daedalus.builder import Builder
+from benchmarks.project import generate_project
+
+# run a script several times and print the best time in milliseconds
+_startup_js = """
+const fs = require('fs');
+const vm = require('vm');
+function stub() {
+    return new Proxy(function() {}, {
+        get: (target, key) => key === Symbol.toPrimitive ? () => 0 : stub(),
+        apply: () => stub(),
+        construct: () => stub(),
+    });
+}
+const source = fs.readFileSync(process.argv[2], 'utf8');
+const repeat = parseInt(process.argv[3]);
+let best = null;
+for (let i = 0; i < repeat; i++) {
+    const context = vm.createContext({console: {log() {}, error() {}, warn() {}},
+        document: stub(), window: stub(), navigator: stub(), history: stub(),
+        location: stub(), localStorage: stub(), requestAnimationFrame: stub(),
+        setTimeout: stub()});
+    // a different source is compiled each time, to avoid the code cache
+    const t0 = process.hrtime.bigint();
+    new vm.Script(source + "\\n//" + i).runInContext(context);
+    const elapsed = Number(process.hrtime.bigint() - t0) / 1e6;
+    if (best === null || elapsed < best) {
+        best = elapsed;
+    }
+}
+console.log(JSON.stringify(best));
+"""
+
+def build(path, scope_hoist, minify):
+    """
+    returns the javascript for the project
+    """
+    builder = Builder([os.path.split(path)[0]], {})
+    builder.cache = None
+    builder.disable_warnings = True
+    builder.scope_hoist = scope_hoist
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, js, _ = builder.build(path, minify=minify)
+    if builder.error:
+        raise builder.error
+    return js
+
+def startup_time(node, js, repeat, tmpdir):
+    """
+    returns the best time in milliseconds to run the script
+    """
+    script = os.path.join(tmpdir, "startup.js")
+    with open(script, "w") as wf:
+        wf.write(_startup_js)
+    source = os.path.join(tmpdir, "source.js")
+    with open(source, "w") as wf:
+        wf.write(js)
+    proc = subprocess.run([node, script, source, str(repeat)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        return None
+    return json.loads(proc.stdout)
+
+def measure(path, repeat, node, tmpdir):
+    """
+    returns a list of (mode, minify, size, gzip size, startup ms) for a project
+    """
+    rows = []
+    for minify in (False, True):
+        for scope_hoist in (False, True):
+            js = build(path, scope_hoist, minify)
+            ms = startup_time(node, js, repeat, tmpdir) if node else None
+            rows.append(("hoist" if scope_hoist else "module", minify,
+                len(js), len(gzip.compress(js.encode("utf-8"))), ms))
+    return rows
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=20,
+        help="number of times the output is run")
+    parser.add_argument("--modules", type=int, default=20,
+        help="number of modules in the generated project")
+    parser.add_argument("paths", nargs="*",
+        help="projects to build, in addition to a generated project")
+    args = parser.parse_args()
+
+    node = shutil.which("node")
+    if not node:
+        print("node was not found, the startup time is not measured")
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        projects = [(path, path) for path in args.paths]
+        projects.append(("generated", generate_project(
+            os.path.join(tmpdir, "project"), modules=args.modules)))
+
+        print("%-28s %-6s %6s %9s %8s %11s" % (
+            "project", "mode", "minify", "size", "gzip", "startup ms"))
+        for name, path in projects:
+            for mode, minify, size, gz_size, ms in measure(path, args.repeat, node, tmpdir):
+                print("%-28s %-6s %6s %9d %8d %11s" % (os.path.split(name)[1], mode,
+                    "yes" if minify else "no", size, gz_size,
+                    "-" if ms is None else "%.2f" % ms))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
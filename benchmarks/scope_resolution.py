@@ -0,0 +1,102 @@
+#! cd .. && python3 -m benchmarks.scope_resolution
+
+"""
+time the scope transforms on deeply nested blocks and on a real bundle
+
+A synthetic program is generated with block statements nested to the
+given depths. Each block defines a variable, shadows a variable of the
+function, and reads variables defined in the outer blocks. The real
+bundle is the whole program of an example, as it is given to the
+transforms by the builder.
+
+TransformMinifyScope and TransformIdentityScope are applied to a copy
+of each program, and the best time of several runs is reported.
+
+    python -m benchmarks.scope_resolution [--repeat N] [--depth N ...] [path ...]
+"""
+
+import os
+import io
+import argparse
+import contextlib
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+from daedalus.token import Token
+from daedalus.transform import TransformMinifyScope, TransformIdentityScope
+from daedalus.builder import Builder, concat_ast
+from benchmarks.suite import best_time
+
+transforms = [("minify", TransformMinifyScope), ("identity", TransformIdentityScope)]
+
+def generate_nested(depth, functions=4):
+    """
+    returns the source of a program with blocks nested to the given depth
+    """
+    lines = []
+    for fn in range(functions):
+        lines.append("export function nested%d(arg) {" % fn)
+        lines.append("    let total = arg")
+        lines.append("    let shadow = 0")
+        for i in range(depth):
+            indent = "    " * (i + 1)
+            lines.append(indent + "if (total >= 0) {")
+            lines.append(indent + "    let v%d = total + %d" % (i, i))
+            lines.append(indent + "    let shadow = v%d + v%d" % (i, i // 2))
+            lines.append(indent + "    total = shadow + arg")
+        for i in reversed(range(depth)):
+            lines.append("    " * (i + 1) + "}")
+        lines.append("    return total + shadow")
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def parse(source):
+    """ returns the ast for the source """
+    return Parser().parse(Lexer().lex(source))
+
+def bundle(path):
+    """ returns the ast of the whole program, before scoping """
+    builder = Builder([os.path.split(path)[0]], {})
+    builder.cache = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        jsm = builder.discover(path)
+    order = builder._sort_modules(jsm)
+    return concat_ast(mod.getAST() for mod in order)
+
+def measure(ast, repeat):
+    """
+    returns a list of (transform name, best time) for the ast
+    """
+    rows = []
+    for name, cls in transforms:
+        def transform(ast):
+            xform = cls()
+            xform.disable_warnings = True
+            xform.transform(ast)
+        rows.append((name, best_time(transform, repeat, lambda: Token.deepCopy(ast))))
+    return rows
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5,
+        help="number of times each transform is run")
+    parser.add_argument("--depth", type=int, nargs="*", default=[50, 100, 200],
+        help="nesting depth of the synthetic programs")
+    parser.add_argument("paths", nargs="*",
+        help="projects to transform, in addition to examples/minesweeper.js")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    programs = [("depth %d" % depth, parse(generate_nested(depth)))
+        for depth in args.depth]
+    for path in [os.path.join(root, "examples", "minesweeper.js")] + args.paths:
+        programs.append((os.path.basename(path), bundle(path)))
+
+    print("%-20s %-10s %10s" % ("program", "transform", "seconds"))
+    for name, ast in programs:
+        for xform, seconds in measure(ast, args.repeat):
+            print("%-20s %-10s %10.4f" % (name, xform, seconds))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,96 @@
+#! cd .. && python3 -m benchmarks.sort_modules
+
+"""
+measure the time to order the modules of a synthetic dependency graph
+
+A graph is generated in layers. Each module imports several modules
+from the two layers below it, so most modules have a wide fan in. The
+graph is ordered by sort_dependencies, which is used to order modules
+and include files, and by the breadth first search that was used
+before, which enqueues a module once for every path from the root.
+The previous search is only run for the smaller graphs.
+
+    python -m benchmarks.sort_modules [--sizes N,N,...] [--fanout N] [--width N]
+"""
+
+import time
+import random
+import argparse
+
+from daedalus.builder import sort_dependencies
+
+def layered_graph(count, fanout, width, seed=0):
+    """
+    returns a dictionary of module => list of imported modules
+    module 0 is the root and imports every module in the first layer
+    """
+    rng = random.Random(seed)
+    edges = {0: list(range(1, min(width, count - 1) + 1))}
+    for node in range(1, count):
+        layer_end = ((node - 1) // width + 1) * width + 1
+        below = range(layer_end, count)
+        below = below[:2 * width]
+        edges[node] = sorted(rng.sample(below, min(fanout, len(below))))
+    return edges
+
+def previous_sort(root, edges):
+    """ the breadth first search used before sort_dependencies """
+    queue = [(root, 0)]
+    depth = {root: 0}
+    while queue:
+        c, d = queue.pop(0)
+        d = depth[c]
+        if d > len(edges):
+            raise ValueError("cycle")
+        for p in edges[c]:
+            if p not in depth:
+                depth[p] = d + 1
+            else:
+                depth[p] = max(depth[p], d + 1)
+            queue.append((p, d + 1))
+    return sorted(depth.keys(), key=lambda p: depth[p], reverse=True)
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn()
+        elapsed = time.process_time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", default="100,140,180,1000,10000",
+        help="comma separated list of module counts")
+    parser.add_argument("--fanout", type=int, default=4,
+        help="number of modules imported by each module")
+    parser.add_argument("--width", type=int, default=20,
+        help="number of modules in each layer")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of times each measurement is repeated")
+    parser.add_argument("--previous-limit", type=int, default=180,
+        help="largest graph to order using the previous search")
+    args = parser.parse_args()
+
+    print("%8s %8s %14s %14s" % ("modules", "edges", "sort (ms)", "previous (ms)"))
+    for size in [int(s) for s in args.sizes.split(",")]:
+        edges = layered_graph(size, args.fanout, args.width)
+        nedges = sum(len(v) for v in edges.values())
+
+        order, _ = sort_dependencies(0, edges.__getitem__)
+        t_sort = best_time(lambda: sort_dependencies(0, edges.__getitem__), args.repeat)
+
+        if size <= args.previous_limit:
+            if previous_sort(0, edges) != order:
+                raise AssertionError("order does not match the previous search")
+            t_prev = "%14.2f" % (1e3 * best_time(lambda: previous_sort(0, edges), 1))
+        else:
+            t_prev = "%14s" % "-"
+
+        print("%8d %8d %14.2f %s" % (size, nedges, 1e3 * t_sort, t_prev))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,262 @@
+#! cd .. && python3 -m benchmarks.suite
+
+"""
+time each stage of a build on a generated project
+
+A project is generated by benchmarks.project, and each scenario is
+timed using the best of several runs:
+
+    lexer       lex every file
+    parser      parse the tokens of every file
+    minify      apply TransformMinifyScope to the whole program
+    formatter   format the whole program
+    build_cold  build with an empty ast cache
+    build_warm  build with every file in the ast cache
+    build_edit  build after one file has been modified
+
+The results can be written to a json file, and compared to the results
+of a previous run. The exit status is 1 when a scenario is slower than
+the previous run by more than the threshold.
+
+    python -m benchmarks.suite [--modules N] [--files N] [--repeat N]
+        [--json out.json] [--compare baseline.json] [--threshold 0.1]
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+from daedalus.token import Token
+from daedalus.transform import TransformMinifyScope
+from daedalus.formatter import Formatter
+from daedalus.builder import Builder, concat_ast
+from daedalus.cache import AstCache
+from benchmarks.project import generate_project
+
+scenarios = ["lexer", "parser", "minify", "formatter",
+    "build_cold", "build_warm", "build_edit"]
+
+def best_time(fn, repeat, setup=None):
+    """
+    returns the best time to call fn
+
+    setup: a function called before each run, which is not timed.
+        the result is passed to fn
+    """
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        t0 = time.process_time()
+        fn(arg)
+        elapsed = time.process_time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+class Project(object):
+    """
+    a generated project, and the data shared by the scenarios
+    """
+
+    def __init__(self, root, path):
+        super(Project, self).__init__()
+        self.root = root
+        self.path = path
+        self.sources = []
+        for dirpath, _, filenames in sorted(os.walk(root)):
+            for name in sorted(filenames):
+                if name.endswith(".js"):
+                    with open(os.path.join(dirpath, name)) as rf:
+                        self.sources.append(rf.read())
+        self._program = None
+        self.edit_count = 0
+
+    def program(self):
+        """ returns the ast of the whole program, before scoping """
+        if self._program is None:
+            builder = Builder([self.root], {})
+            builder.cache = None
+            with contextlib.redirect_stdout(io.StringIO()):
+                jsm = builder.discover(self.path)
+            order = builder._sort_modules(jsm)
+            self._program = concat_ast(mod.getAST() for mod in order)
+        return self._program
+
+    def build(self, cache):
+        builder = Builder([self.root], {})
+        builder.cache = cache
+        builder.copy_ast = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            builder.build(self.path)
+        if builder.error:
+            raise builder.error
+
+    def edit(self):
+        """ modify one file """
+        path = os.path.join(self.root, "mod0", "file0.js")
+        with open(path, "a") as af:
+            af.write("const edit%d = %d\n" % (self.edit_count, self.edit_count))
+        self.edit_count += 1
+
+def run_scenario(project, name, repeat, cache_dir):
+    """
+    returns the best time of the named scenario
+
+    cache_dir: a directory used for the ast cache
+    """
+
+    if name == "lexer":
+        def lex(_):
+            for source in project.sources:
+                Lexer().lex(source)
+        return best_time(lex, repeat)
+
+    if name == "parser":
+        tokens = [Lexer().lex(source) for source in project.sources]
+        def parse(seqs):
+            for seq in seqs:
+                Parser().parse(seq)
+        # the token list is modified by the parser
+        return best_time(parse, repeat,
+            lambda: [[tok.clone() for tok in seq] for seq in tokens])
+
+    if name == "minify":
+        ast = project.program()
+        return best_time(lambda ast: TransformMinifyScope().transform(ast),
+            repeat, lambda: Token.deepCopy(ast))
+
+    if name == "formatter":
+        ast = project.program()
+        return best_time(lambda _: Formatter().format(ast), repeat)
+
+    if name == "build_cold":
+        def setup():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return AstCache(cache_dir)
+        return best_time(project.build, repeat, setup)
+
+    if name == "build_warm":
+        project.build(AstCache(cache_dir))
+        return best_time(project.build, repeat, lambda: AstCache(cache_dir))
+
+    if name == "build_edit":
+        project.build(AstCache(cache_dir))
+        def setup():
+            project.edit()
+            return AstCache(cache_dir)
+        return best_time(project.build, repeat, setup)
+
+    raise ValueError("unknown scenario: %s" % name)
+
+def run(root, names, repeat, **options):
+    """
+    generate a project in the directory root and time each scenario
+
+    options: arguments to generate_project
+    returns the results as a json object
+    """
+
+    path = generate_project(os.path.join(root, "project"), **options)
+    project = Project(os.path.join(root, "project"), path)
+    cache_dir = os.path.join(root, "cache")
+
+    results = {}
+    for name in names:
+        results[name] = run_scenario(project, name, repeat, cache_dir)
+
+    return {
+        "options": options,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+def compare(baseline, current, threshold):
+    """
+    compare the results of two runs
+
+    threshold: the fraction a scenario may be slower than the baseline
+    returns a list of (name, baseline seconds, current seconds, ratio, regressed)
+    for each scenario in both runs
+    """
+    rows = []
+    for name, seconds in current["results"].items():
+        previous = baseline["results"].get(name, None)
+        if previous is None:
+            continue
+        ratio = seconds / previous if previous > 0 else 1.0
+        rows.append((name, previous, seconds, ratio, ratio > 1 + threshold))
+    return rows
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=10,
+        help="number of modules in the generated project")
+    parser.add_argument("--files", type=int, default=5,
+        help="number of files included by each module")
+    parser.add_argument("--fanout", type=int, default=2,
+        help="number of modules imported by each module")
+    parser.add_argument("--classes", type=int, default=2,
+        help="number of classes in each file")
+    parser.add_argument("--templates", type=int, default=2,
+        help="number of template strings in each file")
+    parser.add_argument("--styles", type=int, default=2,
+        help="number of style sheets in each file")
+    parser.add_argument("--repeat", type=int, default=5,
+        help="number of times each scenario is repeated")
+    parser.add_argument("--scenario", action="append", default=None,
+        choices=scenarios, help="scenario to run, can be given multiple times")
+    parser.add_argument("--json", default=None,
+        help="write the results to a json file")
+    parser.add_argument("--compare", default=None,
+        help="compare the results to a json file from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+        help="fraction a scenario may be slower than the previous run")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        current = run(root, args.scenario or scenarios, args.repeat,
+            modules=args.modules, files=args.files, fanout=args.fanout,
+            classes=args.classes, templates=args.templates, styles=args.styles)
+    finally:
+        shutil.rmtree(root)
+
+    if args.json:
+        with open(args.json, "w") as wf:
+            json.dump(current, wf, indent=2)
+
+    if not args.compare:
+        print("%-12s %10s" % ("scenario", "time (s)"))
+        for name, seconds in current["results"].items():
+            print("%-12s %10.3f" % (name, seconds))
+        return
+
+    with open(args.compare) as rf:
+        baseline = json.load(rf)
+
+    if baseline["options"] != current["options"]:
+        sys.stderr.write("warning: the baseline was run with different options\n")
+
+    print("%-12s %10s %10s %8s" % ("scenario", "base (s)", "time (s)", "ratio"))
+    regressed = False
+    for name, previous, seconds, ratio, slower in compare(baseline, current, args.threshold):
+        print("%-12s %10.3f %10.3f %8.2f%s" % (name, previous, seconds, ratio,
+            "  regression" if slower else ""))
+        regressed = regressed or slower
+
+    if regressed:
+        sys.exit(1)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
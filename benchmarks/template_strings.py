@@ -0,0 +1,56 @@
+#! cd .. && python3 -m benchmarks.template_strings
+
+"""
+measure the time to lex and parse a module with many template strings
+
+A module is generated with one template literal per line, each with
+several substitutions. The substitutions are lexed by the main lexer
+pass and parsed by the same parser as the rest of the module.
+
+    python -m benchmarks.template_strings [--count N] [--repeat N]
+"""
+
+import time
+import argparse
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+
+def template_module(count):
+    """ generate source text for a module with count template strings """
+
+    lines = []
+    for i in range(count):
+        lines.append("const e%d = `<div class=\"${cls[%d]}\">${item.name} (${count + %d})</div>`;" % (
+            i, i % 5, i))
+    return "\n".join(lines) + "\n"
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=10000,
+        help="number of template strings in the generated module")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of times each measurement is repeated")
+    args = parser.parse_args()
+
+    text = template_module(args.count)
+
+    t_lex = None
+    t_parse = None
+    for _ in range(args.repeat):
+        t0 = time.process_time()
+        tokens = Lexer().lex(text)
+        t1 = time.process_time()
+        Parser().parse(tokens)
+        t2 = time.process_time()
+        if t_lex is None or t1 - t0 < t_lex:
+            t_lex = t1 - t0
+        if t_parse is None or t2 - t1 < t_parse:
+            t_parse = t2 - t1
+
+    print("%9s %10s %10s %10s" % ("templates", "lex (s)", "parse (s)", "total (s)"))
+    print("%9d %10.3f %10.3f %10.3f" % (args.count, t_lex, t_parse, t_lex + t_parse))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
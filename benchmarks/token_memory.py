@@ -0,0 +1,136 @@
+#! cd .. && python3 -m benchmarks.token_memory
+
+"""
+measure the memory used by each token in an AST
+
+The parsed AST of every file in examples/ and a synthetic module
+containing roughly one million tokens are copied into two trees: one
+built from Token, which uses slots, and one built from a token class
+which stores attributes in a per instance dictionary. The values are
+shared between the two trees, so the difference is the per node overhead.
+
+    python -m benchmarks.token_memory [--tokens N]
+"""
+
+import os
+import sys
+import glob
+import argparse
+import tracemalloc
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+from daedalus.token import Token
+
+class DictToken(object):
+    """ the token representation used before Token defined slots """
+
+    def __init__(self, type, line=0, index=0, value="", children=None, file=None):
+        super(DictToken, self).__init__()
+        self.type = type
+        self.line = line
+        self.index = index
+        self.value = value
+        self.children = list(children) if children is not None else []
+        self.file = file
+        self.original_value = None
+        self.ref = None
+        self.ref_attr = 0
+
+def copy_tree(roots, cls):
+    """ copy a list of tokens, and their children, using the given class """
+
+    copies = [cls(tok.type, tok.line, tok.index, tok.value, None, tok.file)
+        for tok in roots]
+    queue = list(zip(roots, copies))
+    while queue:
+        tok, new_tok = queue.pop()
+        for child in tok.children:
+            new_child = cls(child.type, child.line, child.index,
+                child.value, None, child.file)
+            new_tok.children.append(new_child)
+            queue.append((child, new_child))
+    return copies
+
+def count_nodes(roots):
+    count = 0
+    queue = list(roots)
+    while queue:
+        tok = queue.pop()
+        count += 1
+        queue.extend(tok.children)
+    return count
+
+def traced(fn):
+    """ return the result of fn and the number of bytes it allocated
+    which are still in use once it returns
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+def measure(name, roots):
+    """ print the bytes per node for both representations of a tree """
+
+    count = count_nodes(roots)
+    _, size_slots = traced(lambda: copy_tree(roots, Token))
+    _, size_dict = traced(lambda: copy_tree(roots, DictToken))
+    print("%-24s %9d %12.1f %12.1f %7.1f%%" % (
+        name, count, size_dict / count, size_slots / count,
+        100.0 * (size_dict - size_slots) / size_dict))
+    return count, size_dict, size_slots
+
+def synthetic_module(ntokens):
+    """ generate source text for a module with approximately ntokens tokens """
+
+    lines = []
+    # each line produces 22 tokens, including the newline
+    for i in range(ntokens // 22 + 1):
+        lines.append("const value_%d = compute(%d, 'item %d') + other.attr[%d] * 3.5 - x;" % (
+            i, i, i, i % 7))
+    return "\n".join(lines)
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--tokens", type=int, default=1000000,
+        help="number of tokens in the synthetic module")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    print("%-24s %9s %12s %12s %8s" % (
+        "source", "nodes", "dict B/node", "slots B/node", "saved"))
+
+    total = [0, 0, 0]
+    for path in sorted(glob.glob(os.path.join(root, "examples", "*.js"))):
+        with open(path) as rf:
+            text = rf.read()
+        ast = Parser().parse(Lexer().lex(text))
+        for i, n in enumerate(measure(os.path.basename(path), [ast])):
+            total[i] += n
+    count, size_dict, size_slots = total
+    print("%-24s %9d %12.1f %12.1f %7.1f%%" % (
+        "examples (total)", count, size_dict / count, size_slots / count,
+        100.0 * (size_dict - size_slots) / size_dict))
+
+    # the synthetic module is measured as a token stream, the parser
+    # is too slow for a benchmark of this size
+    text = synthetic_module(args.tokens)
+    tokens, size_lex = traced(lambda: Lexer({"engine": "regex"}).lex(text))
+    measure("synthetic (tokens)", tokens)
+
+    values = {id(tok.value) for tok in tokens if tok.type == Token.T_TEXT}
+    names = sum(1 for tok in tokens if tok.type == Token.T_TEXT)
+    print("lexer output: %d tokens, %.1f bytes/token including values" % (
+        len(tokens), size_lex / len(tokens)))
+    print("identifiers: %d tokens share %d interned strings" % (
+        names, len(values)))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,87 @@
+#! cd .. && python3 -m benchmarks.transform_pipeline
+
+"""
+measure the file load time saved by fusing transforms into fewer traversals
+
+Every module in res/ and examples/ is loaded the same way the builder
+loads them, without the ast cache. Each load is measured with the
+transforms scheduled by TransformPipeline, and again with every
+transform applying itself using its own traversal. The time spent in
+each transform, for the fused schedule, is reported after the table.
+
+    python -m benchmarks.transform_pipeline [--count N] [--repeat N]
+"""
+
+import os
+import glob
+import time
+import argparse
+
+from daedalus.builder import JsFile
+from daedalus.transform import TransformPipeline
+
+def separate(pipeline, ast):
+    """ apply each transform using its own traversal """
+    for stage in pipeline.stages:
+        for xform in stage:
+            xform.transform(ast)
+
+def best_time(path, repeat, timings=None):
+    best = None
+    for _ in range(repeat):
+        name = os.path.splitext(os.path.basename(path))[0]
+        jsf = JsFile(path, name, quiet=True)
+        jsf.transform_timings = timings
+        t0 = time.process_time()
+        jsf.load()
+        elapsed = time.process_time() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=10,
+        help="number of modules to measure, largest first")
+    parser.add_argument("--repeat", type=int, default=5,
+        help="number of times each measurement is repeated")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = glob.glob(os.path.join(root, "res", "**", "*.js"), recursive=True)
+    paths += glob.glob(os.path.join(root, "examples", "*.js"))
+    paths = sorted(paths, key=os.path.getsize, reverse=True)[:args.count]
+
+    print("%-24s %10s %12s %12s %8s" % (
+        "module", "bytes", "fused (ms)", "separate (ms)", "saved"))
+
+    transform = TransformPipeline.transform
+    total_fused = 0
+    total_separate = 0
+    for path in paths:
+        t_fused = best_time(path, args.repeat)
+        TransformPipeline.transform = separate
+        try:
+            t_separate = best_time(path, args.repeat)
+        finally:
+            TransformPipeline.transform = transform
+        total_fused += t_fused
+        total_separate += t_separate
+        print("%-24s %10d %12.2f %12.2f %7.1f%%" % (os.path.basename(path),
+            os.path.getsize(path), 1e3 * t_fused, 1e3 * t_separate,
+            100 * (t_separate - t_fused) / t_separate))
+
+    print("%-24s %10s %12.2f %12.2f %7.1f%%" % ("total", "",
+        1e3 * total_fused, 1e3 * total_separate,
+        100 * (total_separate - total_fused) / total_separate))
+
+    timings = {}
+    for path in paths:
+        best_time(path, 1, timings)
+    print()
+    for name, elapsed in sorted(timings.items(), key=lambda item: -item[1]):
+        print("%10.2f ms %s" % (1e3 * elapsed, name))
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,80 @@
+#! cd .. && python3 -m benchmarks.tree_shake
+
+"""
+compare the size of builds with and without tree shaking
+
+Each example, the project template and a generated project are built
+with and without removing the declarations which are not used by the
+root module. The size of the javascript, minified and compressed, and
+the number of removed declarations are reported.
+
+    python -m benchmarks.tree_shake [--modules N] [--files N]
+"""
+
+import os
+import io
+import glob
+import gzip
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from daedalus.builder import Builder
+from benchmarks.project import generate_project
+
+def build_size(path, search_paths, tree_shake, minify):
+    """
+    returns the size and compressed size of the javascript, and the
+    number of removed declarations
+    """
+    builder = Builder(search_paths, {})
+    builder.cache = None
+    builder.disable_warnings = True
+    builder.tree_shake = tree_shake
+    with contextlib.redirect_stdout(io.StringIO()), \
+            contextlib.redirect_stderr(io.StringIO()):
+        css, js, html = builder.build(path, minify=minify)
+    if builder.error:
+        raise builder.error
+    data = js.encode("utf-8")
+    removed = sum(len(names) for names in builder.shake_report.values())
+    return len(data), len(gzip.compress(data, 9)), removed
+
+def main():  # pragma: no cover
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", type=int, default=40,
+        help="number of modules in the generated project")
+    parser.add_argument("--files", type=int, default=8,
+        help="number of files included by each module")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    projects = [(os.path.basename(path), path, [])
+        for path in sorted(glob.glob(os.path.join(root, "examples", "*.js")))]
+    projects.append(("template.js", os.path.join(root, "res", "template.js"), []))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = generate_project(tmpdir, modules=args.modules, files=args.files)
+        projects.append(("generated", path, [tmpdir]))
+
+        print("%-16s %8s %10s %10s %10s %10s %10s %10s" % ("project", "removed",
+            "full B", "shaken B", "full min", "shaken min", "full gz", "shaken gz"))
+        for name, path, search_paths in projects:
+            try:
+                full, _, _ = build_size(path, search_paths, False, False)
+            except Exception:
+                # not every example can be built on its own
+                continue
+            shaken, _, removed = build_size(path, search_paths, True, False)
+            full_min, full_gz, _ = build_size(path, search_paths, False, True)
+            shaken_min, shaken_gz, _ = build_size(path, search_paths, True, True)
+            print("%-16s %8d %10d %10d %10d %10d %10d %10d" % (name, removed,
+                full, shaken, full_min, shaken_min, full_gz, shaken_gz))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
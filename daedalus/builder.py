@@ -5,12 +5,6 @@ TODO: if a new include file is added to the project
       the server will need to be restarted.
       fix loading new project files
 
-TODO: option for clean build (ignore ast cache)
-
-TODO: js ast cache needs a machine uuid embedded
-      daedalus commit hash?
-      date? to invalidate the cache after some time
-
 TODO: {"a", b:3} does not produce an error
       missing string after property id
 
@@ -27,6 +21,7 @@ TODO "{x:,7}" should be a syntax error
 import os
 import sys
 import time
+import concurrent.futures
 from . import __path__
 import json
 from .lexer import Lexer, Token, TokenError
@@ -34,7 +29,14 @@ from .parser import Parser, xform_apply_file
 from .transform import TransformExtractStyleSheet, TransformMinifyScope, \
     TransformConstEval, getModuleImportExport, TransformIdentityScope
 from .formatter import Formatter
-import pickle
+from .sourcemap import SourceMap
+from .cache import AstCache, sourceKey
+from .scanner import scanImportExport
+from .trace import span
+from .treeshake import TreeShaker
+from .hoist import ScopeHoister
+from .fold import ConstantFolder
+from . import serialize
 import base64
 import logging
 
@@ -84,12 +86,90 @@ def merge_imports(dst, src):
         else:
             dst[key] = val
 
+def sort_dependencies(root, children):
+    """
+    order the nodes reachable from root so that every node comes
+    after the nodes it depends on
+
+    root: the first node, any hashable value
+    children: a function which returns the list of nodes that a
+        node depends on. it is called once for each node
+
+    nodes are ordered by the length of the longest path from the root,
+    the longest first. nodes with the same depth are in the order they
+    are found by a breadth first search.
+
+    returns (order, cycle). when the graph has a cycle the order is
+    None and cycle is a list of nodes, starting and ending with the
+    same node, where each node depends on the next node
+    """
+
+    # breadth first search to find the edges of the graph
+    found = [root]
+    edges = {}
+    importers = {root: []}
+    index = 0
+    while index < len(found):
+        node = found[index]
+        index += 1
+        edges[node] = list(children(node))
+        for child in edges[node]:
+            if child not in importers:
+                importers[child] = []
+                found.append(child)
+            importers[child].append(node)
+
+    # visit a node after every node that depends on it has been visited
+    # the depth of a node is one more than the depth of the deepest
+    # node that depends on it
+    # the root has an importer only when it is part of a cycle
+    indegree = {node: len(importers[node]) for node in found}
+    depth = {root: 0}
+    queue = [root] if indegree[root] == 0 else []
+    for node in queue:
+        for child in edges[node]:
+            d = depth[node] + 1
+            if d > depth.get(child, 0):
+                depth[child] = d
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+
+    if len(queue) < len(found):
+        # every node which was not visited has an importer which was
+        # not visited. follow the importers until a node is repeated
+        node = next(node for node in found if indegree[node] > 0)
+        path = []
+        seen = {}
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(n for n in importers[node] if indegree[n] > 0)
+        cycle = path[seen[node]:] + [node]
+        cycle.reverse()
+        return None, cycle
+
+    order = sorted(found, key=lambda node: depth[node], reverse=True)
+    return order, None
+
 def merge_ast(a, b):
     token = Token(Token.T_MODULE, 0, 0, "")
     token.children = list(a.children)
     token.children.extend(b.children)
     return token
 
+def concat_ast(asts):
+    """
+    returns a module containing the children of each ast, in order
+
+    equivalent to merging the asts one at a time, without copying
+    the children of the partial result for each ast
+    """
+    token = Token(Token.T_MODULE, 0, 0, "")
+    for ast in asts:
+        token.children.extend(ast.children)
+    return token
+
 def buildFileIIFI(mod, exports):
     """
     convert a file into an immediatley invoked function interface.
@@ -347,6 +427,18 @@ class JsFile(object):
         self.quiet = quiet
 
         self.lexer_opts = {}
+        # an AstCache, or None to always parse the source
+        self.cache = None
+        # a dictionary to accumulate the time spent in each transform
+        self.transform_timings = None
+        # when true, the imports and exports found by scanning the
+        # source are compared to the parsed file. see daedalus.scanner
+        self.verify_scan = False
+        # a dictionary of cache key => serialized file data
+        # produced by worker processes. see Builder.preload
+        self.preloaded = None
+        # a Tracer, or None. see daedalus.trace
+        self.tracer = None
 
         if not name:
             self.name = os.path.splitext(os.path.split(name)[1])[0]
@@ -405,99 +497,199 @@ class JsFile(object):
 
         return BuildError(self.source_path, token, lines, org_msg, msg)
 
+    def scan(self):
+        """
+        returns the imports, module_imports and exports of the file
+        without parsing it
+        """
+        try:
+            return scanImportExport(self.getSource())
+        except TokenError as e:
+            raise BuildError.fromTokenError(self.source_path, e)
+
+    def _verifyScan(self, source):
+        """
+        compare the result of scanning the source to the parsed file
+        """
+        expected = (self.imports, self.module_imports, self.exports)
+        try:
+            actual = scanImportExport(source)
+        except TokenError as e:
+            actual = e
+        if actual != expected:
+            sys.stderr.write("warning: dependency scan does not match the parsed file: %s\n" % self.source_path)
+            sys.stderr.write("    parsed:  %r\n" % (expected,))
+            sys.stderr.write("    scanned: %r\n" % (actual,))
+
     def getSource(self):
 
         with open(self.source_path, "r") as rf:
             return rf.read()
 
-    def load(self, force=False):
-
-        t1 = time.time()
-
-        dirpath, filename = os.path.split(self.source_path)
-        cachename = os.path.splitext(filename)[0] + ".ast"
-        cachedir = os.path.join(dirpath, "__pycache__")
-        cachepath = os.path.join(dirpath, "__pycache__", cachename)
-
-        self.ast = None
-        # try to load the file data from the cache
-        if force is False and os.path.exists(cachepath):
+    def cacheKey(self, source):
+        """
+        returns the key for the cached data of the file
+        """
+        # the file name and the style sheet uid are part of the ast
+        uid = TransformExtractStyleSheet.generateUid(self.source_path)
+        return sourceKey(source, self.lexer_opts,
+            self.name, uid, self.source_type)
 
-            mtime1 = os.stat(self.source_path).st_mtime
-            mtime2 = os.stat(cachepath).st_mtime
+    def _parse(self, source):
+        """
+        returns the data which is stored in the cache for the file
+        """
 
-            if mtime1 < mtime2:
-                try:
-                    with open(cachepath, 'rb') as f:
-                        self.size, self.ast, self.imports, \
-                            self.module_imports, self.exports, \
-                            self.styles = pickle.load(f)
-                except pickle.PickleError:
-                    self.ast = None
-                except ValueError:
-                    self.ast = None
+        uid = TransformExtractStyleSheet.generateUid(self.source_path)
 
-        if self.ast is None:
+        # the time spent in each transform is recorded for this file
+        # when tracing, and added to the totals of the builder
+        timings = self.transform_timings
+        if self.tracer is not None:
+            timings = {}
 
-            source = self.getSource()
-            error = None
-            try:
+        error = None
+        try:
+            with span(self.tracer, "lex", file=self.source_path):
                 tokens = Lexer(self.lexer_opts).lex(source)
                 for token in tokens:
                     token.file = self.source_path
-                parser = Parser()
-                parser.module_name = self.path
+            parser = Parser()
+            parser.module_name = self.path
+            tr1 = TransformExtractStyleSheet(uid)
+            # applied in the same traversals as the parser transforms
+            parser.transforms = [TransformConstEval(), tr1]
+            parser.transform_timings = timings
+            with span(self.tracer, "parse", file=self.source_path) as parse_span:
                 ast = parser.parse(tokens)
-                TransformConstEval().transform(ast)
-                uid = TransformExtractStyleSheet.generateUid(self.source_path)
-                tr1 = TransformExtractStyleSheet(uid)
-                tr1.transform(ast)
-                self.styles = tr1.getStyles()
-            except TokenError as e:
-                error = self._newBuildError(e.token, e)
-
-            if error:
-                raise error
-
-            self.size = len(source)
-            try:
-                self.ast, self.imports, self.module_imports, self.exports = \
+            styles = tr1.getStyles()
+        except TokenError as e:
+            error = self._newBuildError(e.token, e)
+
+        if self.tracer is not None:
+            if error is None:
+                parse_span.args["transforms"] = timings
+            for name, elapsed in timings.items():
+                self.tracer.addTime("transform " + name, elapsed)
+                if self.transform_timings is not None:
+                    self.transform_timings[name] = \
+                        self.transform_timings.get(name, 0) + elapsed
+
+        if error:
+            raise error
+
+        try:
+            with span(self.tracer, "imports", file=self.source_path):
+                ast, self.imports, self.module_imports, self.exports = \
                     getModuleImportExport(ast, self.source_type != 2)
-            except TokenError as e:
-                raise BuildError.fromTokenError(self.source_path, e)
+        except TokenError as e:
+            raise BuildError.fromTokenError(self.source_path, e)
 
-            if not os.path.exists(cachedir):
-                os.makedirs(cachedir)
+        if self.verify_scan:
+            self._verifyScan(source)
 
-            data = (self.size, self.ast, self.imports,
-                self.module_imports, self.exports, self.styles)
+        # reset the file path for all tokens in the ast
+        # use the absolute dotted name of this file
+        xform_apply_file(ast, self.name)
 
-            # reset the file path for all tokens in the ast
-            # use the absolute dotted name of this file
-            xform_apply_file(self.ast, self.name)
+        return (len(source), ast, self.imports,
+            self.module_imports, self.exports, styles)
 
-            with open(cachepath, 'wb') as f:
-                pickle.dump(data, f)
+    def load(self, force=False):
 
-        self.mtime = os.stat(self.source_path).st_mtime
+        with span(self.tracer, "load", file=self.source_path):
+            t1 = time.time()
 
-        t2 = time.time()
+            source = self.getSource()
 
-        if not self.quiet:
-            sys.stderr.write("%10d %.2f %s\n" % (
-                self.size, t2 - t1, self.source_path))
+            key = None
+            if self.cache is not None or self.preloaded:
+                key = self.cacheKey(source)
+
+            # try to load the file data from the cache
+            data = None
+            if force is False and key is not None:
+                content = self.preloaded.pop(key, None) if self.preloaded else None
+                if content is not None:
+                    # the file was parsed by a worker process, see Builder.preload
+                    data = tuple(serialize.loads(content))
+                    if self.cache is not None:
+                        self.cache.putContent(key, content)
+                elif self.cache is not None:
+                    data = self.cache.get(key)
+
+            if data is None:
+                data = self._parse(source)
+                if key is not None and self.cache is not None:
+                    self.cache.put(key, data)
+
+            self.size, self.ast, self.imports, \
+                self.module_imports, self.exports, \
+                self.styles = data
+
+            self.mtime = os.stat(self.source_path).st_mtime
+
+            t2 = time.time()
+
+            if not self.quiet:
+                sys.stderr.write("%10d %.2f %s\n" % (
+                    self.size, t2 - t1, self.source_path))
 
     def reload(self):
+        """
+        load the file if it has not been loaded or has been modified
+
+        returns true if the file was loaded
+        """
         if self.source_path:
             if self.mtime == 0:
                 self.load(False)
-            else:
-                mtime = os.stat(self.source_path).st_mtime
-                if mtime > self.mtime:
-                    self.load()
-            return True
+                return True
+            mtime = os.stat(self.source_path).st_mtime
+            if mtime > self.mtime:
+                self.load()
+                return True
         return False
 
+def _preloadWorker(task):
+    """
+    parse a file in a worker process. see Builder.preload
+
+    returns the cache key, the serialized file data and the transform
+    timings. the file data is None if the file is already in the cache
+    or could not be parsed. errors are reported when the file is loaded
+    by the builder
+    """
+    path, name, source_type, platform, lexer_opts, verify_scan, timings, cache_dir = task
+
+    jf = JsFile(path, name, source_type, platform=platform, quiet=True)
+    jf.lexer_opts = lexer_opts
+    jf.verify_scan = verify_scan
+    jf.transform_timings = {} if timings else None
+
+    try:
+        source = jf.getSource()
+        key = jf.cacheKey(source)
+        if cache_dir is not None and key in AstCache(cache_dir):
+            return key, None, None
+        content = serialize.dumps(jf._parse(source))
+    except (OSError, BuildError, serialize.SerializeError):
+        return None, None, None
+
+    return key, content, jf.transform_timings
+
+# the settings of the builder which are given to every file and module
+_shared_settings = ("lexer_opts", "cache", "transform_timings",
+    "verify_scan", "preloaded", "tracer")
+
+def _copySettings(src, dst):
+    """
+    copy the shared settings from a builder or module to a file or module
+    """
+    for name in _shared_settings:
+        setattr(dst, name, getattr(src, name))
+    return dst
+
 class JsModule(object):
     def __init__(self, index_js, module_name=None, platform=None, quiet=False):
         super(JsModule, self).__init__()
@@ -510,6 +702,8 @@ class JsModule(object):
         self.module_exports = set()
         self.module_imports = {}
         self.static_exports = set()
+        # the user provided static data, name => value
+        self.static_values = {}
         self.import_paths = {}
         self.ast = None
         self.source_size = 0
@@ -517,31 +711,36 @@ class JsModule(object):
         self.platform = platform
         self.quiet = quiet
         self.lexer_opts = {}
+        self.cache = None
+        self.transform_timings = None
+        self.verify_scan = False
+        self.preloaded = None
+        self.tracer = None
+        # a ModuleShake, or None to keep every statement. see daedalus.treeshake
+        self.shake = None
+        # file path => (ast, key, folded ast). see daedalus.fold
+        self.folded = {}
 
     def __repr__(self):
         return f"<JsModule({self.module_name})"
 
+    def _newFile(self, path, name, source_type):
+        """
+        returns a JsFile which uses the settings of the module
+        """
+        jf = JsFile(path, name, source_type, platform=self.platform, quiet=self.quiet)
+        return _copySettings(self, jf)
+
     def _getFiles(self):
         # sort include files
-        jsf = self.index_js
-        queue = [(jsf, 0)]
-        depth = {jsf.path: 0}
-        while queue:
-            c, d = queue.pop(0)
-            d = depth[c.path]
-
-            if d > len(self.files):
-                msg = "include cycle detected."
-                raise BuildError(c.path, None, [], msg)
+        order, cycle = sort_dependencies(self.index_js.path,
+            lambda p: self.import_paths[p])
 
-            for p in self.import_paths[c.path]:
-                if p not in depth:
-                    depth[p] = d + 1
-                else:
-                    depth[p] = max(depth[p], d + 1)
-                queue.append((self.files[p], d + 1))
+        if cycle:
+            msg = "include cycle detected: %s" % " -> ".join(
+                os.path.split(p)[1] for p in cycle)
+            raise BuildError(cycle[0], None, [], msg)
 
-        order = sorted(depth.keys(), key=lambda p: depth[p], reverse=True)
         self.source_size = sum([self.files[p].size for p in order])
         return [self.files[p] for p in order]
 
@@ -575,12 +774,14 @@ class JsModule(object):
                     tmp_name = os.path.splitext(os.path.split(path)[1])[0]
                     if self.module_name:
                         tmp_name = self.module_name + "." + tmp_name
-                    jf = JsFile(path, tmp_name, 2, platform=self.platform, quiet=self.quiet)
-                    jf.lexer_opts = self.lexer_opts
-                    queue.append(jf)
+                    queue.append(self._newFile(path, tmp_name, 2))
                     self.dirty = True
                 else:
                     queue.append(self.files[path])
+        if files.keys() != self.files.keys():
+            # a file is no longer included
+            self.dirty = True
+
         if self.dirty:
             self.ast = None
 
@@ -592,33 +793,97 @@ class JsModule(object):
     def name(self):
         return self.module_name # self.index_js.name
 
+    def setShake(self, shake):
+        """
+        set the statements, imports and exports which are kept when
+        the ast is built. the ast is built again when they change
+        """
+        if shake != self.shake:
+            self.ast = None
+        self.shake = shake
+
+    def setFold(self, folded):
+        """
+        set the files with the static data folded into the ast.
+        the ast is built again when they change
+        """
+        if {path: id(entry[2]) for path, entry in folded.items()} != \
+                {path: id(entry[2]) for path, entry in self.folded.items()}:
+            self.ast = None
+        self.folded = folded
+
+    def foldedAST(self, jsf):
+        """
+        returns the ast of a file, with the static data folded
+        """
+        entry = self.folded.get(jsf.path, None)
+        if entry is not None and entry[0] is jsf.ast and entry[2] is not None:
+            return entry[2]
+        return jsf.ast
+
+    def _fileAST(self, jsf):
+        """
+        returns the ast and exports of a file, without the
+        statements removed by tree shaking
+        """
+        ast = self.foldedAST(jsf)
+        if self.shake is None:
+            return ast, jsf.exports
+        return self.shake.filterFile(jsf, ast)
+
+    def getImports(self):
+        """
+        returns the names imported from each module which are kept
+        """
+        if self.shake is not None:
+            return self.shake.module_imports
+        return self.module_imports
+
+    def getExports(self):
+        """
+        returns the exported names which are kept
+        """
+        if self.shake is not None:
+            return self.shake.exports | self.static_exports
+        return self.module_exports | self.static_exports
+
+    def getParts(self):
+        """
+        returns the ast and exports of each file, in the order the files
+        are included. used to build a scope hoisted program
+        """
+        order = self._getFiles()
+        self.styles = sum([jsf.styles for jsf in order], [])
+        return [self._fileAST(jsf) for jsf in order]
+
     def getAST(self, merge=False):
         t1 = time.time()
 
         if self.ast and not self.dirty:
             return self.ast
 
-        order = self._getFiles()
+        with span(self.tracer, "assemble", module=self.name()):
+            order = self._getFiles()
 
-        if len(order) > 1:
-            if self.static_data:
-                ast = self.static_data
+            if len(order) > 1:
+                parts = [self.static_data] if self.static_data else []
+                parts.extend(buildFileIIFI(*self._fileAST(jsf)) for jsf in order)
+                ast = concat_ast(parts)
+            elif self.static_data:
+                # the static data is exported, and must be defined
+                ast = concat_ast([self.static_data, self._fileAST(order[0])[0]])
             else:
-                ast = Token(Token.T_MODULE, 0, 0, "")
+                ast = self._fileAST(order[0])[0]
 
-            for jsf in order:
-                ast = merge_ast(ast, buildFileIIFI(jsf.ast, jsf.exports))
-        else:
-            ast = order[0].ast
+            self.styles = sum([jsf.styles for jsf in order], [])
 
-        self.styles = sum([jsf.styles for jsf in order], [])
+            module_imports = self.getImports()
+            all_exports = self.getExports()
 
-        all_exports = self.module_exports | self.static_exports
-
-        if self.platform == "python":
-            self.ast = buildPythonAst(self.name(), ast, self.module_imports, all_exports)
-        else:
-            self.ast = buildModuleIIFI(self.name(), ast, self.module_imports, all_exports, merge)
+            if self.platform == "python":
+                self.ast = buildPythonAst(self.name(), ast, module_imports, all_exports)
+            else:
+                self.ast = buildModuleIIFI(self.name(), ast, module_imports, all_exports, merge)
 
         self.dirty = False
         t2 = time.time()
@@ -630,6 +895,7 @@ class JsModule(object):
         # parse the user provided static data
         lines = []
         self.static_exports = set()
+        self.static_values = dict(data) if data else {}
         if data:
             for key, value in data.items():
                 line = "const %s=%s;" % (key, json.dumps(value))
@@ -643,6 +909,18 @@ class JsModule(object):
         else:
             self.static_data = None
 
+class CompiledUnit(object):
+    """
+    the formatted output of one part of the program
+    """
+    def __init__(self, ast, text, globals, sourcemap):
+        super(CompiledUnit, self).__init__()
+        # the ast which was compiled, not the scoped copy
+        self.ast = ast
+        self.text = text
+        self.globals = globals
+        self.sourcemap = sourcemap
+
 class Builder(object):
     def __init__(self, search_paths, static_data, platform=None):
         super(Builder, self).__init__()
@@ -656,6 +934,42 @@ class Builder(object):
         self.quiet = True
         self.disable_warnings = False
         self.lexer_opts = {}
+        # parsed files are stored in a content addressed cache
+        # set to None to always parse every file
+        self.cache = AstCache()
+        # when a dictionary, the time spent in each transform while
+        # loading files is accumulated and printed after the build
+        self.transform_timings = None
+        # when true, check the dependency scanner against each parsed file
+        self.verify_scan = False
+        # the number of processes used to parse files. when greater
+        # than one, files are parsed by a process pool before the
+        # modules are discovered
+        self.jobs = 1
+        self.preloaded = {}
+        # when true, the scope transform is applied to a copy of the
+        # module asts. otherwise the module asts are modified, and every
+        # file is loaded again by the next build
+        self.copy_ast = True
+        # when true, the minified names are assigned after the whole
+        # program is scoped, shortest first to the most used variables
+        self.rank_labels = True
+        # when true, declarations which are not reachable from the exports
+        # of the root module are removed. see daedalus.treeshake
+        self.tree_shake = True
+        # module name => names of the declarations removed by tree shaking
+        self.shake_report = {}
+        # when true, references to the static data are replaced by the
+        # value, and the branches which are not taken are removed.
+        # see daedalus.fold
+        self.fold_constants = True
+        # when true, every module is placed in a single function and
+        # imported names refer directly to the exported declaration.
+        # see daedalus.hoist
+        self.scope_hoist = False
+        # a Tracer, or None. when given, the time spent in each phase
+        # of the build is recorded. see daedalus.trace
+        self.tracer = None
 
         self.webroot = "/"
 
@@ -685,6 +999,35 @@ class Builder(object):
     def _name2path(self, name):
         return findModule(name, self.search_paths)
 
+    def _absname(self, modpath, modroots):
+        """
+        returns the dotted name of a module index file relative
+        to the search path which contains it
+        """
+        commonpath = ""
+        for root in modroots:
+            common = os.path.commonpath([root, modpath])
+            if len(common) > len(commonpath):
+                commonpath = common
+        absname = os.path.splitext(modpath[len(commonpath)+1:])[0].replace("/", ".")
+        if absname == "daedalus.res.daedalus.daedalus":
+            absname = "daedalus.daedalus"
+        return absname
+
+    def _newFile(self, path, name, source_type):
+        """
+        returns a JsFile which uses the settings of the builder
+        """
+        jf = JsFile(path, name, source_type, platform=self.platform, quiet=self.quiet)
+        return _copySettings(self, jf)
+
+    def _newModule(self, index_js, module_name):
+        """
+        returns a JsModule which uses the settings of the builder
+        """
+        jm = JsModule(index_js, module_name=module_name, platform=self.platform, quiet=self.quiet)
+        return _copySettings(self, jm)
+
     def _discover(self, jsm):
 
         queue = [jsm]
@@ -715,24 +1058,12 @@ class Builder(object):
                 modpath = self._name2path(modname)
                 #modname = os.path.split(os.path.split(modpath)[0])[1]
 
-                commonpath = ""
-                for root in modroots:
-                    common = os.path.commonpath([root, modpath])
-                    if len(common) > len(commonpath):
-                        commonpath = common
-                absname = os.path.splitext(modpath[len(commonpath)+1:])[0].replace("/", ".")
-                if absname == "daedalus.res.daedalus.daedalus":
-                    absname = "daedalus.daedalus"
-
                 if modpath not in self.files:
-                    jsname = absname
-                    jf = JsFile(modpath, jsname, 2, platform=self.platform, quiet=self.quiet)
-                    jf.lexer_opts = self.lexer_opts
-                    self.files[modpath] = jf
+                    jsname = self._absname(modpath, modroots)
+                    self.files[modpath] = self._newFile(modpath, jsname, 2)
 
                 if modpath not in self.modules:
-                    jm = JsModule(self.files[modpath], module_name=modname, platform=self.platform, quiet=self.quiet)
-                    jm.lexer_opts = self.lexer_opts
+                    jm = self._newModule(self.files[modpath], modname)
                     self.modules[modpath] = jm
                     self.modules[modpath].setStaticData(self.static_data.get(modname, None))
 
@@ -749,6 +1080,9 @@ class Builder(object):
         source_type = 1 # TODO: deprecate and remove
                         # source_map == 2 is only used to surpress warnings
 
+        if self.jobs > 1:
+            self.preload(path)
+
         if path.endswith(".js"):
             path = os.path.abspath(path)
             modname = path.replace("\\","/").split("/")[-1]
@@ -758,22 +1092,148 @@ class Builder(object):
             modname = path
             path = self._name2path(modname)
 
-        jf = JsFile(path, modname, source_type, platform=self.platform, quiet=self.quiet)
-        jf.lexer_opts = self.lexer_opts
-        self.files[path] = jf
-        jm = JsModule(self.files[path], modname, platform=self.platform, quiet=self.quiet)
-        jm.lexer_opts = self.lexer_opts
+        self.files[path] = self._newFile(path, modname, source_type)
+        jm = self._newModule(self.files[path], modname)
         jm.setStaticData(self.static_data.get(modname, None))
         self.modules[path] = jm
 
         self.root_module = jm
 
-        self._discover(jm)
+        with span(self.tracer, "discover"):
+            self._discover(jm)
 
-        self._fix_export_star()
+            self._fix_export_star()
+
+        # discard files which were not loaded
+        self.preloaded.clear()
 
         return jm
 
+    def preload(self, path):
+        """
+        parse the files which will be loaded by discover, starting with
+        the given file, using a pool of self.jobs worker processes
+
+        the files are found using scanDependencies. each file is returned
+        in the format used by the ast cache, and is decoded when the file
+        is loaded. files which are in the cache, or which have not been
+        modified since they were last loaded, are not parsed again
+        """
+
+        try:
+            graph = self.scanDependencies(path)
+        except BuildError:
+            # the error is reported when the file is loaded
+            return
+
+        modroots = [os.path.abspath(p) for p in self.search_paths]
+
+        tasks = []
+        for index, (modname, index_path, files, _) in enumerate(graph):
+            for file_path in files:
+                jf = self.files.get(file_path)
+                if jf is not None and jf.ast is not None and \
+                   jf.mtime >= os.stat(jf.source_path).st_mtime:
+                    continue
+
+                if file_path != index_path:
+                    name = os.path.splitext(os.path.split(file_path)[1])[0]
+                    name, source_type = modname + "." + name, 2
+                elif index == 0:
+                    name, source_type = modname, 1
+                else:
+                    name, source_type = self._absname(file_path, modroots), 2
+
+                tasks.append(self._preloadTask(file_path, name, source_type))
+
+        self._preloadTasks(tasks)
+
+    def _preloadTask(self, path, name, source_type):
+        """
+        returns the arguments of _preloadWorker for a file
+        """
+        cache_dir = self.cache.cache_dir if self.cache is not None else None
+        timings = self.transform_timings is not None
+        return (path, name, source_type, self.platform,
+            self.lexer_opts, self.verify_scan, timings, cache_dir)
+
+    def _preloadTasks(self, tasks):
+        """
+        parse files using a pool of self.jobs worker processes
+        """
+        if not tasks:
+            return
+
+        # start the largest files first
+        tasks.sort(key=lambda task: -os.path.getsize(task[0]))
+
+        t1 = time.time()
+        with span(self.tracer, "preload", files=len(tasks)), \
+                concurrent.futures.ProcessPoolExecutor(self.jobs) as pool:
+            for key, content, file_timings in pool.map(_preloadWorker, tasks):
+                if content is not None:
+                    self.preloaded[key] = content
+                if file_timings:
+                    for name, elapsed in file_timings.items():
+                        self.transform_timings[name] = \
+                            self.transform_timings.get(name, 0) + elapsed
+        t2 = time.time()
+
+        if not self.quiet:
+            sys.stderr.write("%10s %.2f parsed %d files using %d processes\n" % (
+                '', t2 - t1, len(self.preloaded), self.jobs))
+
+    def scanDependencies(self, path):
+        """
+        find every module imported starting with the given file, without
+        parsing any file. see discover
+
+        returns a list of (module_name, index_path, file_paths, module_imports)
+        in the order the modules are discovered. file_paths is the index
+        file followed by every included file.
+        """
+
+        if path.endswith(".js"):
+            path = os.path.abspath(path)
+            modname = path.replace("\\","/").split("/")[-1]
+            if modname.endswith(".js"):
+                modname = modname[:-3]
+        else:
+            modname = path
+            path = self._name2path(modname)
+
+        graph = []
+        queue = [(modname, path)]
+        visited = {path}
+        while queue:
+            modname, index_path = queue.pop()
+
+            moddir = os.path.split(index_path)[0]
+            files = []
+            module_imports = {}
+            file_queue = [index_path]
+            while file_queue:
+                file_path = file_queue.pop()
+                if file_path in files:
+                    continue
+                files.append(file_path)
+
+                name = os.path.splitext(os.path.split(file_path)[1])[0]
+                imports, file_module_imports, _ = JsFile(file_path, name, quiet=True).scan()
+                merge_imports(module_imports, file_module_imports)
+                for name in imports.keys():
+                    file_queue.append(os.path.normpath(os.path.join(moddir, name)))
+
+            graph.append((modname, index_path, files, module_imports))
+
+            for name in module_imports.keys():
+                modpath = self._name2path(name)
+                if modpath not in visited:
+                    visited.add(modpath)
+                    queue.append((name, modpath))
+
+        return graph
+
     def _fix_export_star(self):
 
         name2mod = {mod.module_name: mod for mod in self.modules.values()}
@@ -805,12 +1265,9 @@ class Builder(object):
 
     def _sort_modules(self, jsm):
         name2mod = {m.name(): m for m in self.modules.values()}
-        queue = [(jsm, 0)]
-        depth = {jsm.name(): 0}
-        while queue:
-            m, d = queue.pop(0)
-            d = depth[m.name()]
 
+        def _imports(name):
+            m = name2mod[name]
             _x_module_imports = {}
             for n in m.module_imports:
 
@@ -825,38 +1282,73 @@ class Builder(object):
                             n = t
                             break
 
-                if n not in depth:
-                    depth[n] = d + 1
-                else:
-                    depth[n] = max(depth[n], d + 1)
-
                 if n not in name2mod:
                     print(list(sorted(name2mod.keys())))
-                jsm = name2mod[n]
+                    raise KeyError(n)
                 _x_module_imports[original_name] = n
 
-                # worst case depth is a simple linked list with length
-                # of N where N is the number of modules. If the computed
-                # depth is greater than that, then there is a cycle somewhere
-                if d > len(self.modules):
-                    msg = "import cycle detected. %s imports %s" % (jsm.index_js.name, m.index_js.name)
-                    raise BuildError(m.index_js.path, None, [], msg)
-                queue.append((jsm, d + 1))
-
             # TODO: this is a hack, can the imports be fixed prior to sort?
             m.module_imports = {_x_module_imports[k]:v for k,v in m.module_imports.items()}
+            return list(_x_module_imports.values())
+
+        with span(self.tracer, "order"):
+            order, cycle = sort_dependencies(jsm.name(), _imports)
+
+        if cycle:
+            m = name2mod[cycle[0]]
+            msg = "import cycle detected: %s" % " -> ".join(cycle)
+            raise BuildError(m.index_js.path, None, [], msg)
 
-        order = sorted(depth.keys(), key=lambda n: depth[n], reverse=True)
         return [name2mod[n] for n in order]
 
+    def _fold(self, order):
+        """
+        fold the static data into the files of each module
+        """
+        if not self.fold_constants:
+            for mod in order:
+                mod.setFold({})
+            return
+
+        with span(self.tracer, "fold"):
+            folder = ConstantFolder(order)
+            for mod in order:
+                mod.setFold(folder.foldModule(mod))
+
+    def _shake(self, jsm, order):
+        """
+        remove the declarations of each module which are not used
+        """
+        self.shake_report = {}
+
+        if not self.tree_shake:
+            for mod in order:
+                mod.setShake(None)
+            return
+
+        with span(self.tracer, "shake"):
+            shaker = TreeShaker(order)
+            shaker.use(jsm.name(), jsm.module_exports)
+            # the html renders the root element using daedalus
+            shaker.use("daedalus", ["render"])
+            results = shaker.shake()
+
+        for mod in order:
+            shake = results[mod.name()]
+            mod.setShake(shake)
+            names = shake.names()
+            if names:
+                self.shake_report[mod.name()] = names
+
     def build_module(self, path, minify=False):
         jsm = self.discover(path)
         ast = jsm.getAST()
 
         return ast
 
-    def _build_impl(self, path, standalone=False, sourcemap=False, minify=False):
+    def _build_impl(self, path, standalone=False, sourcemap=False, minify=False, output=None):
         t1 = time.time()
+        output_start = output.tell() if output is not None else 0
         try:
 
             jsm = self.discover(path)
@@ -869,10 +1361,21 @@ class Builder(object):
 
             self.root_exports = jsm.module_exports
 
-            if standalone is False:
+            if standalone is False and self.scope_hoist:
+                order = self._sort_modules(jsm)
+                self._fold(order)
+                self._shake(jsm, order)
+                with span(self.tracer, "hoist"):
+                    hoister = ScopeHoister(order, self.copy_ast, self.lexer_opts)
+                    units = [hoister.build()]
+                if not self.copy_ast:
+                    for mod in order:
+                        self._discardModule(mod)
+            elif standalone is False:
                 order = self._sort_modules(jsm)
-                ast = Token(Token.T_MODULE, 0, 0, "")
-                source_size = 0
+                self._fold(order)
+                self._shake(jsm, order)
+                structs = []
                 mod_structure = {}
 
                 def _get(name):
@@ -890,99 +1393,66 @@ class Builder(object):
                     if struct:
                         source = '%s = %s' % (key, json.dumps(struct))
                         tokens = Lexer(self.lexer_opts).lex(source)
-                        ast = merge_ast(ast, Parser().parse(tokens))
-
-                for mod in order:
-                    struct = _get(mod.name())
-                    ast2 = mod.getAST(merge=len(struct) > 0)
-                    ast = merge_ast(ast, ast2)
-                    source_size += mod.source_size
-                
-
-                styles = sum([mod.styles for mod in order], [])
+                        structs.append(Parser().parse(tokens))
+
+                def _units():
+                    # the ast of each module is built when it is compiled
+                    yield from structs
+                    for mod in order:
+                        struct = _get(mod.name())
+                        # the module is compiled before the next ast is requested
+                        with span(self.tracer, "module", module=mod.name()):
+                            yield mod.getAST(merge=len(struct) > 0)
+                        if not self.copy_ast:
+                            self._discardModule(mod)
+                units = _units()
             else:
-                ast = jsm.getAST()
-                styles = jsm.styles
-                source_size = jsm.source_size
+                order = [jsm]
+                units = [jsm.getAST()]
 
-            css = "\n".join(styles)
             error = None
             self.globals = {}
 
+            js, srcmap = self._compile(units, minify, output)
 
-            if minify:
-                ast = Token.deepCopy(ast)
-                xform = TransformMinifyScope()
-                xform.disable_warnings = self.disable_warnings
-                self.globals = xform.transform(ast)
-
-            else:
-                ast_source = ast
-                ast = Token.deepCopy(ast)
+            # the styles and size of a module are known after the ast is built
+            css = "\n".join(sum([mod.styles for mod in order], []))
+            source_size = sum(mod.source_size for mod in order)
 
-                xform = TransformIdentityScope()
-                xform.disable_warnings = self.disable_warnings
-                try:
-                    self.globals = xform.transform(ast)
-                except TokenError as e:
-
-                    # certain syntax errors (double defines)
-                    # can trigger this
-
-                    # feels like a hack.
+            if sourcemap:
+                with span(self.tracer, "sourcemap"):
+                    sources = srcmap.sources
                     name2path = {}
+                    url2path = {}
+                    url2index = {}
+
+                    # TODO: clean this up
+                    #
                     for path, jf in self.files.items():
                         name2path[jf.name] = path
-                    e.token.file = name2path[e.token.file]
-
-                    # TODO: the source file could be None: need to fix this
-                    nodes = [ast_source]
-                    sources = set()
-                    while nodes:
-                        node = nodes.pop(0)
-                        sources.add(node.file)
-                        nodes.extend(node.children)
-                    print(sources)
-                    raise e
 
+                    for srcname in sources.keys():
 
-            formatter = Formatter(opts={'minify': minify})
+                        if srcname in name2path:
+                            abspath = name2path[srcname]
+                            # TODO: optional relative path to support github actions
+                            # TODO: support typescript when the original path is typescript
+                            url = f'srcmap/{srcname.replace(".", "/")}.js'
+                            url2index[url] = sources[srcname]
+                            url2path[url] = abspath
+                            #print("adding sourcemap", url)
+                        else:
+                            print("sourcemap not found:", srcname)
 
-            js = formatter.format(ast)
+                    srcmap.sources = url2index
+                    srcmap.source_routes = url2path
 
-            if sourcemap:
-                sources = formatter.sourcemap.sources
-                name2path = {}
-                url2path = {}
-                url2index = {}
-
-                # TODO: clean this up
-                #
-                for path, jf in self.files.items():
-                    name2path[jf.name] = path
-
-                for srcname in sources.keys():
-
-                    if srcname in name2path:
-                        abspath = name2path[srcname]
-                        # TODO: optional relative path to support github actions
-                        # TODO: support typescript when the original path is typescript
-                        url = f'srcmap/{srcname.replace(".", "/")}.js'
-                        url2index[url] = sources[srcname]
-                        url2path[url] = abspath
-                        #print("adding sourcemap", url)
-                    else:
-                        print("sourcemap not found:", srcname)
-
-                formatter.sourcemap.sources = url2index
-                formatter.sourcemap.source_routes = url2path
-
-                # the sourcemap payload is:
-                #  - a dictionary mapping a url to a local path
-                #  - a json object, the source map data.
-                self.sourcemap_obj = formatter.sourcemap.getSourceMap()
-                self.servermap = formatter.sourcemap.getServerMap()
-                self.sourcemap_url2path = url2path
+                    # the sourcemap payload is:
+                    #  - a dictionary mapping a url to a local path
+                    #  - a json object, the source map data.
+                    self.sourcemap_obj = srcmap.getSourceMap()
+                    self.servermap = srcmap.getServerMap()
+                    self.sourcemap_url2path = url2path
 
 
         except TokenError as e:
@@ -1011,20 +1481,179 @@ class Builder(object):
         else:
             export_name = jsm.name() + "." + list(jsm.module_exports)[0]
 
-        final_source_size = len(js)
+        if output is not None:
+            final_source_size = output.tell() - output_start
+        else:
+            final_source_size = len(js)
         p = 100 * final_source_size / source_size
         t2 = time.time()
         if not self.quiet:
             sys.stderr.write("%10d %.2f %.2f%% of %d bytes\n" % (final_source_size, t2 - t1, p, source_size))
+            if self.cache is not None:
+                sys.stderr.write("ast cache: %(hits)d hits %(misses)d misses "
+                    "%(writes)d writes %(evictions)d evictions\n" % self.cache.stats())
+
+        if self.transform_timings is not None:
+            sys.stderr.write("transform timings:\n")
+            timings = sorted(self.transform_timings.items(), key=lambda item: -item[1])
+            for name, elapsed in timings:
+                sys.stderr.write("%10.3f %s\n" % (elapsed, name))
 
         return css, js, export_name
 
-    def build(self, path, minify=False, onefile=False, sourcemap=False):
+    def _scope(self, ast, ast_source, minify):
+        """
+        apply the scope transform to a copy of the program
+
+        ast: the copy, which is modified
+        ast_source: the program which was copied
+        returns the mapping of global names
+        """
+        if minify:
+            xform = TransformMinifyScope()
+            xform.disable_warnings = self.disable_warnings
+            xform.rank_labels = self.rank_labels
+            with span(self.tracer, "scope"):
+                return xform.transform(ast)
+
+        xform = TransformIdentityScope()
+        xform.disable_warnings = self.disable_warnings
+        try:
+            with span(self.tracer, "scope"):
+                return xform.transform(ast)
+        except TokenError as e:
+
+            # certain syntax errors (double defines)
+            # can trigger this
+
+            # feels like a hack.
+            name2path = {}
+            for path, jf in self.files.items():
+                name2path[jf.name] = path
+            e.token.file = name2path[e.token.file]
+
+            # TODO: the source file could be None: need to fix this
+            nodes = [ast_source]
+            sources = set()
+            while nodes:
+                node = nodes.pop(0)
+                sources.add(node.file)
+                nodes.extend(node.children)
+            print(sources)
+            raise e
+
+    def _compile(self, units, minify, output=None):
+        """
+        scope and format the program
+
+        units: an iterable of the ast of each part of the program, in order
+        output: a file object. when given the formatted source is written
+            to the file and the returned source is empty
+        returns the formatted source and the SourceMap
+        """
+        try:
+            if minify:
+                # names are minified across the whole program
+                ast = concat_ast(units)
+
+                ast_source = ast
+                if self.copy_ast:
+                    ast = Token.deepCopy(ast)
+                self.globals = self._scope(ast, ast_source, minify)
+
+                formatter = Formatter(opts={'minify': minify})
+                with span(self.tracer, "format"):
+                    js = formatter.format(ast)
+                if output is not None:
+                    output.write(js)
+                    js = ""
+                return js, formatter.sourcemap
+
+            # the output of each part depends only on that part, so
+            # the parts are compiled and written one at a time
+            return self._join((self._compileUnit(unit)
+                for unit in units if unit.children), output)
+        finally:
+            if not self.copy_ast:
+                self._discardAst()
+
+    def _compileUnit(self, unit):
+        """
+        scope and format one part of the program without minifying
+        """
+        ast = Token.deepCopy(unit) if self.copy_ast else unit
+        names = self._scope(ast, unit, False)
+        formatter = Formatter(opts={'minify': False})
+        with span(self.tracer, "format"):
+            text = formatter.format(ast)
+        return CompiledUnit(unit, text, names, formatter.sourcemap)
+
+    def _join(self, compiled, output=None):
+        """
+        returns the formatted source and the SourceMap for
+        an iterable of CompiledUnit
+
+        output: a file object. when given the source of each part is
+            written to the file and the returned source is empty
+        """
+        self.globals = {}
+        texts = []
+        sourcemaps = []
+        for index, part in enumerate(compiled):
+            self.globals.update(part.globals)
+            sourcemaps.append(part.sourcemap)
+            if output is None:
+                texts.append(part.text)
+            else:
+                if index > 0:
+                    output.write("\n")
+                output.write(part.text)
+
+        with span(self.tracer, "sourcemap"):
+            srcmap = SourceMap.join(sourcemaps)
+        return "\n".join(texts), srcmap
+
+    def _discardModule(self, jsm):
+        """
+        discard the ast of a module and its files after they have
+        been modified by the scope transform
+        """
+        for jsf in jsm.files.values():
+            jsf.ast = None
+            jsf.mtime = 0
+        jsm.ast = None
+        jsm.folded = {}
+        jsm.setStaticData(self.static_data.get(jsm.module_name, None))
+
+    def _discardAst(self):
+        """
+        discard the asts of every file and module after they have
+        been modified by the scope transform
+        """
+        for jsm in self.modules.values():
+            self._discardModule(jsm)
+        for jsf in self.files.values():
+            jsf.ast = None
+            jsf.mtime = 0
+
+    def build(self, path, minify=False, onefile=False, sourcemap=False, output=None):
+        """
+        build the program starting from the given file
+
+        output: a file object. when given, and not building one file,
+            the javascript is written to the file one module at a time
+            and the returned javascript is empty
+        returns the css, javascript and html
+        """
         self.error = None
+        if onefile:
+            output = None
+        if output is not None and sourcemap:
+            output.write("//# sourceMappingURL=index.js.map\n")
         # make this have API functions which
         # can be overridden
         try:
-            css, js, root = self._build_impl(path, sourcemap=sourcemap, minify=minify)
+            css, js, root = self._build_impl(path, sourcemap=sourcemap, minify=minify, output=output)
         except BuildError as e:
             return self.build_error(e)
         except FileNotFoundError as e:
@@ -1032,28 +1661,29 @@ class Builder(object):
             return self.build_error(e)
 
         if sourcemap:
-            # inject the file content into the sourcemap
+            with span(self.tracer, "sourcemap"):
+                # inject the file content into the sourcemap
 
-            sources = []
-            for src in self.sourcemap_obj['sources']:
-                path = self.sourcemap_url2path[src]
-                with open(path) as rf:
-                    sources.append(rf.read())
-            self.sourcemap_obj['sourcesContent'] = sources
+                sources = []
+                for src in self.sourcemap_obj['sources']:
+                    path = self.sourcemap_url2path[src]
+                    with open(path) as rf:
+                        sources.append(rf.read())
+                self.sourcemap_obj['sourcesContent'] = sources
 
-            srcmap_content = json.dumps(self.sourcemap_obj)
+                srcmap_content = json.dumps(self.sourcemap_obj)
 
-            if onefile:
+                if onefile:
 
-                header = "//# sourceMappingURL=data:application/json;base64,"
-                header += base64.b64encode(srcmap_content.encode("UTF-8")).decode("utf-8")
-                header += "\n"
-                js = header + js
+                    header = "//# sourceMappingURL=data:application/json;base64,"
+                    header += base64.b64encode(srcmap_content.encode("UTF-8")).decode("utf-8")
+                    header += "\n"
+                    js = header + js
 
-            else:
-                js = "//# sourceMappingURL=index.js.map\n" + js
+                elif output is None:
+                    js = "//# sourceMappingURL=index.js.map\n" + js
 
-            self.sourcemap = (self.sourcemap_url2path, srcmap_content)
+                self.sourcemap = (self.sourcemap_url2path, srcmap_content)
 
         else:
             #srcmap_content = "" #json.dumps(self.sourcemap_obj)
@@ -1061,35 +1691,36 @@ class Builder(object):
 
 
 
-        try:
-            index_html = self.find("index.%s.html" % self.platform)
-        except FileNotFoundError:
-            index_html = None
+        with span(self.tracer, "html"):
+            try:
+                index_html = self.find("index.%s.html" % self.platform)
+            except FileNotFoundError:
+                index_html = None
 
-        if index_html is None:
-            index_html = self.find("index.html")
+            if index_html is None:
+                index_html = self.find("index.html")
 
-        with open(index_html, "r") as hfile:
-            html = hfile.read()
+            with open(index_html, "r") as hfile:
+                html = hfile.read()
 
-        if self.globals and 'daedalus' in self.globals:
-            render_function = self.globals['daedalus'] + '.render'
-        else:
-            render_function = 'daedalus.render'
+            if self.globals and 'daedalus' in self.globals:
+                render_function = self.globals['daedalus'] + '.render'
+            else:
+                render_function = 'daedalus.render'
 
-        try:
-            self.favicon_path = findFile("favicon.ico", self.search_paths)
-        except FileNotFoundError:
-            self.favicon_path = None
-
-        html = html \
-            .replace("${PATH}", self.getPlatformPathPrefix().rstrip("/")) \
-            .replace("<!--TITLE-->", self.getHtmlTitle()) \
-            .replace("<!--FAVICON-->", self.getHtmlFavIcon()) \
-            .replace("<!--STYLE-->", self.getHtmlStyle(css, onefile)) \
-            .replace("<!--SOURCE-->", self.getHtmlSource(js, onefile)) \
-            .replace("<!--EVENT-->", self.getHtmlEvent(onefile)) \
-            .replace("<!--RENDER-->", self.getHtmlRender(render_function, root))
+            try:
+                self.favicon_path = findFile("favicon.ico", self.search_paths)
+            except FileNotFoundError:
+                self.favicon_path = None
+
+            html = html \
+                .replace("${PATH}", self.getPlatformPathPrefix().rstrip("/")) \
+                .replace("<!--TITLE-->", self.getHtmlTitle()) \
+                .replace("<!--FAVICON-->", self.getHtmlFavIcon()) \
+                .replace("<!--STYLE-->", self.getHtmlStyle(css, onefile)) \
+                .replace("<!--SOURCE-->", self.getHtmlSource(js, onefile)) \
+                .replace("<!--EVENT-->", self.getHtmlEvent(onefile)) \
+                .replace("<!--RENDER-->", self.getHtmlRender(render_function, root))
 
         return css, js, html
 
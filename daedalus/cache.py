@@ -0,0 +1,238 @@
+
+"""
+content addressed cache for parsed javascript files
+
+entries are keyed by a hash of the source text, the lexer options, and
+a version derived from the source code of the lexer, parser,
+transforms and the builder which applies them. any change to daedalus
+invalidates the cache without needing to remove it. the key does not
+depend on the modified time of the source file, so an entry is reused
+when a file is written without being changed. the key does include
+the style sheet uid, which is derived from the path of the file, so
+an entry is only reused for a file at the same path.
+
+entries are written atomically, and the least recently used entries
+are removed when the total size of the cache exceeds a limit.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+from . import serialize
+
+# increment when the format of a cache entry changes
+CACHE_FORMAT = 2
+
+# modules which affect the result of loading a source file
+_versioned_modules = ["token.py", "lexer.py", "parser.py", "transform.py",
+    "builder.py", "serialize.py"]
+
+_compiler_version = None
+
+def compilerVersion():
+    """
+    return a hash of the source of the modules used to produce an ast
+    """
+    global _compiler_version
+    if _compiler_version is None:
+        m = hashlib.sha256()
+        m.update(b"%d" % CACHE_FORMAT)
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in _versioned_modules:
+            with open(os.path.join(root, name), "rb") as rb:
+                m.update(rb.read())
+        _compiler_version = m.hexdigest()
+    return _compiler_version
+
+def sourceKey(source, lexer_opts, *extra):
+    """
+    return the key for a source file
+
+    source: the source text
+    lexer_opts: the options used to construct the lexer
+    extra: any other strings or numbers used to produce the entry
+    """
+    m = hashlib.sha256()
+    m.update(compilerVersion().encode("utf-8"))
+    m.update(json.dumps(lexer_opts, sort_keys=True).encode("utf-8"))
+    m.update(json.dumps(extra).encode("utf-8"))
+    m.update(b"\0")
+    m.update(source.encode("utf-8"))
+    return m.hexdigest()
+
+def defaultCacheDir():
+    """
+    return the directory used when a cache directory is not given
+
+    DAEDALUS_CACHE_DIR overrides the default of $XDG_CACHE_HOME/daedalus
+    """
+    path = os.environ.get("DAEDALUS_CACHE_DIR", None)
+    if not path:
+        root = os.environ.get("XDG_CACHE_HOME", None) or \
+            os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(root, "daedalus")
+    return os.path.join(path, "ast")
+
+class AstCache(object):
+    """
+    a directory of serialized entries, one file per entry
+
+    an entry is a tuple of values which can be encoded by serialize
+
+    failure to read or write the cache directory is never an error,
+    the entry is treated as a miss and the file is parsed again
+    """
+
+    def __init__(self, cache_dir=None, max_size=256 * 1024 * 1024):
+        super(AstCache, self).__init__()
+
+        self.cache_dir = cache_dir or defaultCacheDir()
+        self.max_size = max_size
+
+        # total size in bytes of all entries, computed on the first write
+        self.size = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "<AstCache(%s)>" % self.cache_dir
+
+    def key(self, source, lexer_opts, *extra):
+        """
+        return the key for a source file. see sourceKey
+        """
+        return sourceKey(source, lexer_opts, *extra)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key[2:])
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """
+        return the entry for key, or None if it is not in the cache
+        """
+        path = self._path(key)
+        try:
+            data = tuple(serialize.load(path))
+        except (OSError, ValueError, IndexError, serialize.SerializeError):
+            # missing, truncated, or written by an incompatible version
+            self.misses += 1
+            return None
+
+        try:
+            # the modified time records the last use for eviction
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        add an entry to the cache
+
+        the entry is written to a temporary file which is then renamed,
+        readers never see a partially written entry
+        """
+        try:
+            content = serialize.dumps(data)
+        except serialize.SerializeError as e:
+            sys.stderr.write("warning: failed to write ast cache: %s\n" % e)
+            return False
+
+        return self.putContent(key, content)
+
+    def putContent(self, key, content):
+        """
+        add an entry which has already been serialized to the cache
+        """
+        path = self._path(key)
+        dirpath = os.path.dirname(path)
+        try:
+            os.makedirs(dirpath, exist_ok=True)
+            try:
+                # the size of an entry which is replaced
+                previous = os.stat(path).st_size
+            except FileNotFoundError:
+                previous = 0
+            fd, tmppath = tempfile.mkstemp(dir=dirpath, prefix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as wb:
+                    wb.write(content)
+                os.replace(tmppath, path)
+            except BaseException:
+                os.unlink(tmppath)
+                raise
+            nbytes = os.stat(path).st_size
+        except OSError as e:
+            # a read only or full file system disables writing
+            sys.stderr.write("warning: failed to write ast cache: %s\n" % e)
+            return False
+
+        self.writes += 1
+        if self.size is None:
+            self.size = sum(size for _, _, size in self._entries())
+        else:
+            self.size += nbytes - previous
+
+        if self.size > self.max_size:
+            self.evict()
+
+        return True
+
+    def _entries(self):
+        """ yield (mtime, path, size) for every entry in the cache """
+        try:
+            dirs = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for d in dirs:
+            if not d.is_dir():
+                continue
+            try:
+                files = list(os.scandir(d.path))
+            except OSError:
+                continue
+            for f in files:
+                if f.name.startswith(".tmp"):
+                    # an entry which is still being written
+                    continue
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                yield st.st_mtime, f.path, st.st_size
+
+    def evict(self):
+        """
+        remove the least recently used entries until the total
+        size of the cache is less than the maximum size
+        """
+        entries = sorted(self._entries())
+        self.size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
@@ -7,12 +7,13 @@ import json
 
 from .server import SampleServer
 from .lexer import Lexer
-from .parser import Parser
+from .parser import Parser, LazyToken
+from .token import Token
 from .formatter import Formatter
 from .transform import TransformMinifyScope
 
 
-from .cli_util import build
+from .cli_util import build, list_deps
 
 from .vm import vmGetAst, VmRuntime
 from .vm_compiler import VmCompiler
@@ -84,6 +85,28 @@ class BuildCLI(CLI):
         subparser.add_argument('--htmlname', type=str, default="index.html")
         subparser.add_argument('--sourcemap', action='store_true')
         subparser.add_argument('--webroot', type=str, default="/")
+        subparser.add_argument('--cache-dir', type=str, default=None,
+            help="directory for the parsed file cache (default: $DAEDALUS_CACHE_DIR)")
+        subparser.add_argument('--no-cache', action='store_true',
+            help="parse every file without reading or writing the cache")
+        subparser.add_argument('--transform-timings', action='store_true',
+            help="print the time spent in each ast transform")
+        subparser.add_argument('--list-deps', action='store_true',
+            help="print the imported modules and included files without building")
+        subparser.add_argument('--verify-deps', action='store_true',
+            help="check the dependency scanner against every parsed file")
+        subparser.add_argument('--jobs', type=int, default=1,
+            help="number of processes used to parse files, 0 for one per cpu")
+        subparser.add_argument('--trace', type=str, default=None,
+            help="write the time spent in each phase of the build to a chrome trace json file")
+        subparser.add_argument('--no-tree-shake', action='store_true',
+            help="keep the declarations which are not used by the root module")
+        subparser.add_argument('--shake-report', action='store_true',
+            help="print the declarations removed from each module")
+        subparser.add_argument('--scope-hoist', action='store_true',
+            help="place every module in a single function scope")
+        subparser.add_argument('--no-const-fold', action='store_true',
+            help="keep the branches which depend on the static data")
         subparser.add_argument('index_js')
         subparser.add_argument('out')
 
@@ -104,6 +127,10 @@ class BuildCLI(CLI):
 
         staticdata = parse_env(args.env)
 
+        if args.list_deps:
+            list_deps(index_js, paths=paths, platform=platform)
+            return
+
         build(outdir, index_js,
             staticdir=staticdir,
             staticdata=staticdata,
@@ -113,7 +140,17 @@ class BuildCLI(CLI):
             onefile=onefile,
             htmlname=args.htmlname,
             sourcemap=args.sourcemap,
-            webroot=args.webroot)
+            webroot=args.webroot,
+            cache_dir=args.cache_dir,
+            cache=not args.no_cache,
+            transform_timings=args.transform_timings,
+            verify_deps=args.verify_deps,
+            jobs=args.jobs or os.cpu_count(),
+            trace=args.trace,
+            tree_shake=not args.no_tree_shake,
+            shake_report=args.shake_report,
+            scope_hoist=args.scope_hoist,
+            const_fold=not args.no_const_fold)
 
 class BuildProfileCLI(CLI):
     """
@@ -133,6 +170,17 @@ class BuildProfileCLI(CLI):
         subparser.add_argument('--env', type=str, action='append', default=[])
         subparser.add_argument('--platform', type=str, default=None)
         subparser.add_argument('--static', type=str, default=None)
+        subparser.add_argument('--cache-dir', type=str, default=None)
+        subparser.add_argument('--no-cache', action='store_true')
+        subparser.add_argument('--transform-timings', action='store_true')
+        subparser.add_argument('--list-deps', action='store_true')
+        subparser.add_argument('--verify-deps', action='store_true')
+        subparser.add_argument('--jobs', type=int, default=1)
+        subparser.add_argument('--trace', type=str, default=None)
+        subparser.add_argument('--no-tree-shake', action='store_true')
+        subparser.add_argument('--shake-report', action='store_true')
+        subparser.add_argument('--scope-hoist', action='store_true')
+        subparser.add_argument('--no-const-fold', action='store_true')
         subparser.add_argument('index_js')
         subparser.add_argument('out')
 
@@ -166,6 +214,12 @@ class ServeCLI(CLI):
         subparser.add_argument('--static', type=str, default="./static")
         subparser.add_argument('--cert', type=str, default=None)
         subparser.add_argument('--keyfile', type=str, default=None)
+        subparser.add_argument('--jobs', type=int, default=1,
+            help="number of processes used to parse files, 0 for one per cpu")
+        subparser.add_argument('--no-watch', action='store_true',
+            help="build for every page request instead of when a source file changes")
+        subparser.add_argument('--no-tree-shake', action='store_true',
+            help="keep the declarations which are not used by the root module")
         subparser.add_argument('index_js')
 
     def execute(self, args):
@@ -183,6 +237,9 @@ class ServeCLI(CLI):
             args.index_js, paths,
             staticdata, args.static,
             platform=args.platform,
+            jobs=args.jobs or os.cpu_count(),
+            watch=not args.no_watch,
+            tree_shake=not args.no_tree_shake,
             onefile=args.onefile,
             minify=args.minify)
         server.setCert(args.cert, args.keyfile)
@@ -250,6 +307,9 @@ class AstCLI(CLI):
         subparser.add_argument('--paths', default=None)
         subparser.add_argument('--env', type=str, action='append', default=[])
         subparser.add_argument('--platform', type=str, default=None)
+        subparser.add_argument('--function', type=str, default=None,
+            help="print the parsed ast for the named functions and methods. "
+                 "function bodies are only parsed when needed")
         subparser.add_argument('index_js')
 
     def execute(self, args):
@@ -262,10 +322,36 @@ class AstCLI(CLI):
         with open(jspath) as rf:
             text = rf.read()
 
+        if args.function:
+            parser = Parser()
+            parser.lazy_functions = True
+            ast = parser.parse(Lexer().lex(text))
+            for token in self.find_functions(ast, args.function):
+                print(token.toString(3))
+            return
+
         ast = vmGetAst(text)
 
         print(ast.toString(3))
 
+    def find_functions(self, ast, name):
+        """
+        yield functions and methods with the given name. the body of a
+        function is only parsed if it contains a function with the name
+        """
+        function_types = (Token.T_FUNCTION, Token.T_ASYNC_FUNCTION,
+            Token.T_GENERATOR, Token.T_ASYNC_GENERATOR, Token.T_METHOD)
+        stack = [ast]
+        while stack:
+            token = stack.pop()
+            if token.type in function_types and token.children and \
+                    token.children[0].value == name:
+                yield token
+            elif isinstance(token, LazyToken) and not token.isParsed():
+                if not any(tok.value == name for tok in token.unparsedTokens()):
+                    continue
+            stack.extend(reversed(token.children))
+
 class DisCLI(CLI):
     """ print disassembly for a js file
 
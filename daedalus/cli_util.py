@@ -3,6 +3,8 @@ import os
 import sys
 
 from .builder import Builder
+from .cache import AstCache
+from .trace import Tracer, span
 from .webview import export_webchannel_js
 
 def makedirs(path):
@@ -43,7 +45,20 @@ def copy_favicon(builder, outdir, verbose=False):
         with open(out_favicon, "wb") as wb:
             wb.write(rb.read())
 
-def build(outdir, index_js, staticdir=None, staticdata=None, paths=None, platform=None, minify=False, onefile=False, htmlname="index.html", sourcemap=False, webroot="/"):
+def list_deps(index_js, paths=None, platform=None):
+    """
+    print the module graph starting with index_js, without parsing
+    """
+
+    builder = Builder(paths or [], {}, platform=platform)
+    for modname, index_path, files, module_imports in builder.scanDependencies(index_js):
+        print("%s %s" % (modname, index_path))
+        for path in files[1:]:
+            print("    include %s" % path)
+        for name in module_imports.keys():
+            print("    import %s" % name)
+
+def build(outdir, index_js, staticdir=None, staticdata=None, paths=None, platform=None, minify=False, onefile=False, htmlname="index.html", sourcemap=False, webroot="/", cache_dir=None, cache=True, transform_timings=False, verify_deps=False, jobs=1, trace=None, tree_shake=True, shake_report=False, scope_hoist=False, const_fold=True):
     # TODO: add verbose mode: show files copied and js files loaded
     verbose=True
 
@@ -63,7 +78,39 @@ def build(outdir, index_js, staticdir=None, staticdata=None, paths=None, platfor
     builder.webroot = webroot
     builder.lexer_opts = {"preserve_documentation": not minify}
     builder.quiet = not verbose
-    css, js, html = builder.build(index_js, minify=minify, onefile=onefile, sourcemap=sourcemap)
+    builder.cache = AstCache(cache_dir) if cache else None
+    builder.transform_timings = {} if transform_timings else None
+    builder.verify_scan = verify_deps
+    builder.jobs = jobs
+    # the builder is only used once, the module asts do not need to be copied
+    builder.copy_ast = False
+    builder.tracer = Tracer() if trace else None
+    builder.tree_shake = tree_shake
+    builder.scope_hoist = scope_hoist
+    builder.fold_constants = const_fold
+
+    with span(builder.tracer, "build"):
+        if onefile:
+            css, js, html = builder.build(index_js, minify=minify, onefile=onefile, sourcemap=sourcemap)
+        else:
+            # the javascript is written one module at a time
+            makedirs(os.path.join(outdir, 'static'))
+            with open(js_path_output, "w") as wf:
+                css, js, html = builder.build(index_js, minify=minify, sourcemap=sourcemap, output=wf)
+                if builder.error:
+                    wf.seek(0)
+                    wf.truncate()
+
+    if shake_report:
+        for modname, names in sorted(builder.shake_report.items()):
+            sys.stderr.write("%s: removed %d declarations\n" % (modname, len(names)))
+            for name in names:
+                sys.stderr.write("    %s\n" % name)
+
+    if builder.tracer is not None:
+        builder.tracer.save(trace)
+        sys.stderr.write(builder.tracer.summary() + "\n")
+        sys.stderr.write("trace written to %s\n" % trace)
 
     if sourcemap:
 
@@ -83,11 +130,6 @@ def build(outdir, index_js, staticdir=None, staticdata=None, paths=None, platfor
         wf.write(html)
 
     if not onefile:
-        makedirs(os.path.join(outdir, 'static'))
-
-        with open(js_path_output, "w") as wf:
-            wf.write(js)
-
         with open(css_path_output, "w") as wf:
             wf.write(css)
 
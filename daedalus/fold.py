@@ -0,0 +1,223 @@
+
+"""
+replace references to the static data of a module with the value
+
+The static data given to the builder, such as daedalus.build_platform,
+is defined as constants in the scope of each module. A reference to a
+static value by name, by an imported name, or as an attribute of the
+module object (daedalus.build_platform) is replaced by the value.
+
+TransformConstEval is then applied to each file which was modified, to
+fold comparisons and remove the branches of if statements and ternary
+expressions which are not taken. Declarations which are only used by a
+removed branch are then removed by tree shaking.
+
+Only strings, numbers, booleans and null are replaced. A file is copied
+before it is modified, so that the ast of the file is not changed.
+"""
+
+import json
+import math
+
+from .token import Token
+from .transform import TransformIdentityScope, TransformConstEval, \
+    UndefinedRef, copyTracked
+from .treeshake import getNames
+
+def isLiteral(value):
+    """
+    returns true if the value can be replaced by a literal
+    """
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return value is None or isinstance(value, (str, int, bool))
+
+def literalToken(value, token):
+    """
+    returns a literal token for the value, at the position of the token
+
+    a negative number is returned as a grouping, (-1), so that it is
+    not joined to a preceding operator
+    """
+    text = json.dumps(value)
+    if value is None or isinstance(value, bool):
+        type_ = Token.T_KEYWORD
+    elif isinstance(value, str):
+        type_ = Token.T_STRING
+    elif text.startswith("-"):
+        number = Token(Token.T_NUMBER, token.line, token.index, text[1:])
+        prefix = Token(Token.T_PREFIX, token.line, token.index, "-", [number])
+        tok = Token(Token.T_GROUPING, token.line, token.index, "()", [prefix])
+        for child in (tok, prefix, number):
+            child.file = token.file
+        return tok
+    else:
+        type_ = Token.T_NUMBER
+    tok = Token(type_, token.line, token.index, text)
+    tok.file = token.file
+    return tok
+
+def _replace(token, value):
+    """
+    replace the token with a literal, in place
+    """
+    literal = literalToken(value, token)
+    token.type = literal.type
+    token.value = literal.value
+    token.children = literal.children
+    token.ref = None
+
+def _isStore(token, parent):
+    """
+    returns true if the token is assigned to
+    """
+    if parent is None:
+        return False
+    if parent.type == Token.T_ASSIGN:
+        return parent.children[0] is token
+    if parent.type == Token.T_PREFIX:
+        return parent.value in ("++", "--", "delete")
+    return parent.type in (Token.T_POSTFIX, Token.T_UNPACK_SEQUENCE,
+        Token.T_UNPACK_OBJECT)
+
+class ConstantFolder(object):
+    """
+    fold the static data of each module into the files which use it
+    """
+
+    def __init__(self, order):
+        """
+        order: the modules of the program
+        """
+        super(ConstantFolder, self).__init__()
+        self.name2mod = {mod.name(): mod for mod in order}
+
+    def _values(self, modname):
+        """
+        returns the static values of a module which can be folded
+        """
+        mod = self.name2mod.get(modname, None)
+        if mod is None:
+            return {}
+        return {name: value for name, value in mod.static_values.items()
+            if isLiteral(value)}
+
+    def scope(self, mod):
+        """
+        returns the static values in the scope of the module, and the
+        module objects which can be used by name. name => module name
+        """
+        constants = self._values(mod.name())
+
+        # the first part of a module name is a global variable, and the
+        # last part of an imported module is an argument of the module
+        modules = {name: name for name in self.name2mod if '.' not in name}
+        for other in mod.module_imports:
+            modules[other.split('.')[-1]] = other
+
+        for other, names in mod.module_imports.items():
+            values = self._values(other)
+            for src, dst in names.items():
+                modules.pop(dst, None)
+                if src in values:
+                    constants[dst] = values[src]
+                else:
+                    constants.pop(dst, None)
+
+        for name in constants:
+            modules.pop(name, None)
+
+        # names defined by a file of the module
+        for jsf in mod.files.values():
+            for name in jsf.exports:
+                constants.pop(name, None)
+                modules.pop(name, None)
+
+        return constants, modules
+
+    def foldModule(self, mod):
+        """
+        returns a dictionary of file path => (ast, key, folded ast) for
+        each file of the module. the folded ast is None when the file
+        does not use the static data. the previous result of the module
+        is reused for a file when the ast and the scope are the same
+        """
+        constants, modules = self.scope(mod)
+        key = (sorted(constants.items(), key=repr),
+            sorted((name, sorted(self._values(other).items(), key=repr))
+                for name, other in modules.items()))
+
+        folded = {}
+        for path, jsf in mod.files.items():
+            previous = mod.folded.get(path, None)
+            if previous is not None and previous[0] is jsf.ast and previous[1] == key:
+                folded[path] = previous
+            else:
+                folded[path] = (jsf.ast, key, self.foldFile(jsf.ast, constants, modules))
+        return folded
+
+    def foldFile(self, ast, constants, modules):
+        """
+        returns a copy of the ast with the static values replaced, or
+        None when the file does not use a static value
+        """
+        names = getNames(ast)
+        if not any(name in names for name in constants) and \
+                not any(name in names for name in modules):
+            return None
+
+        copy, output, mapping = copyTracked(ast)
+
+        xform = TransformIdentityScope()
+        xform.disable_warnings = True
+        xform.transform(copy)
+
+        count = 0
+        stack = [(copy, None)]
+        while stack:
+            token, parent = stack.pop()
+            for child in token.children:
+                stack.append((child, token))
+
+            if token.ref is None or id(token) not in mapping:
+                continue
+
+            out_tok, out_parent = mapping[id(token)]
+            # const variables are resolved by TransformConstEval
+            out_tok.ref = token.ref
+
+            if not isinstance(token.ref, UndefinedRef):
+                continue
+
+            label = token.ref.label
+            if label in constants:
+                # a shorthand property is not replaced
+                if out_parent is not None and out_parent.type == Token.T_OBJECT:
+                    continue
+                if not _isStore(out_tok, out_parent):
+                    _replace(out_tok, constants[label])
+                    count += 1
+
+            elif label in modules and parent is not None and \
+                    parent.type == Token.T_GET_ATTR and parent.children[0] is token and \
+                    id(parent) in mapping:
+                # module.name
+                attr = parent.children[1]
+                values = self._values(modules[label])
+                out_attr, out_grandparent = mapping[id(parent)]
+                if attr.type == Token.T_ATTR and attr.value in values and \
+                        not _isStore(out_attr, out_grandparent):
+                    _replace(out_attr, values[attr.value])
+                    count += 1
+
+        if count:
+            TransformConstEval(fold_branches=True).transform(output)
+
+        # the references are assigned again when the program is scoped
+        stack = [output]
+        while stack:
+            token = stack.pop()
+            token.ref = None
+            stack.extend(token.children)
+
+        return output if count else None
@@ -86,6 +86,103 @@ class Formatter(object):
         self.indent_width = int(opts.get('indent', 2))
         self.max_columns = int(opts.get('columns', 80 if self.pretty_print else 500))
 
+        self.format_actions = {
+            Token.T_MODULE: self._format_module,
+            Token.T_BLOCK: self._format_block,
+            Token.T_CLASS_BLOCK: self._format_class_block,
+            Token.T_OBJECT: self._format_object,
+            Token.T_UNPACK_OBJECT: self._format_object,
+            Token.T_LIST: self._format_list,
+            Token.T_TUPLE: self._format_list,
+            Token.T_RECORD: self._format_list,
+            Token.T_GROUPING: self._format_list,
+            Token.T_ARGLIST: self._format_list,
+            Token.T_BLOCK_LABEL: self._format_block_label,
+            Token.T_UNPACK_SEQUENCE: self._format_unpack_sequence,
+            Token.T_LAMBDA: self._format_lambda,
+            Token.T_BINARY: self._format_binary,
+            Token.T_GET_ATTR: self._format_binary,
+            Token.T_LOGICAL_OR: self._format_binary,
+            Token.T_LOGICAL_AND: self._format_binary,
+            Token.T_INSTANCE_OF: self._format_binary,
+            Token.T_NULLISH_COALESCING: self._format_binary,
+            Token.T_ASSIGN: self._format_assign,
+            Token.T_NULLISH_ASSIGN: self._format_assign,
+            Token.T_TERNARY: self._format_ternary,
+            Token.T_PREFIX: self._format_prefix,
+            Token.T_SPREAD: self._format_prefix,
+            Token.T_YIELD: self._format_prefix,
+            Token.T_YIELD_FROM: self._format_prefix,
+            Token.T_POSTFIX: self._format_postfix,
+            Token.T_COMMA: self._format_comma,
+            Token.T_TEXT: self._format_text,
+            Token.T_GLOBAL_VAR: self._format_text,
+            Token.T_LOCAL_VAR: self._format_text,
+            Token.T_FREE_VAR: self._format_text,
+            Token.T_REGEX: self._format_regex,
+            Token.T_NUMBER: self._format_number,
+            Token.T_TAGGED_TEMPLATE: self._format_tagged_template,
+            Token.T_TEMPLATE_EXPRESSION: self._format_template_expression,
+            Token.T_TEMPLATE_STRING: self._format_template_string,
+            Token.T_STRING: self._format_string,
+            Token.T_KEYWORD: self._format_keyword,
+            Token.T_STATIC_PROPERTY: self._format_static_property,
+            Token.T_PUBLIC_STATIC_PROPERTY: self._format_public_static_property,
+            Token.T_PRIVATE_STATIC_PROPERTY: self._format_private_static_property,
+            Token.T_PUBLIC_PROPERTY: self._format_public_property,
+            Token.T_PRIVATE_PROPERTY: self._format_private_property,
+            Token.T_OPTIONAL_CHAINING: self._format_optional_chaining,
+            Token.T_ATTR: self._format_attr,
+            Token.T_DOCUMENTATION: self._format_documentation,
+            Token.T_NEWLINE: self._format_newline,
+            Token.T_VAR: self._format_var,
+            Token.T_INTERFACE: self._format_interface,
+            Token.T_TYPE: self._format_type,
+            Token.T_CLASS: self._format_class,
+            Token.T_FUNCTION: self._format_function,
+            Token.T_METHOD: self._format_method,
+            Token.T_GENERATOR: self._format_generator,
+            Token.T_FUNCTIONCALL: self._format_functioncall,
+            Token.T_ANONYMOUS_FUNCTION: self._format_anonymous_function,
+            Token.T_ANONYMOUS_GENERATOR: self._format_anonymous_generator,
+            Token.T_ASYNC_FUNCTION: self._format_async_function,
+            Token.T_ASYNC_GENERATOR: self._format_async_generator,
+            Token.T_ASYNC_ANONYMOUS_FUNCTION: self._format_async_anonymous_function,
+            Token.T_ASYNC_ANONYMOUS_GENERATOR: self._format_async_anonymous_generator,
+            Token.T_IMPORT_JS_MODULE: self._format_import_js_module,
+            Token.T_IMPORT_JS_MODULE_AS: self._format_import_js_module_as,
+            Token.T_IMPORT: self._format_import,
+            Token.T_IMPORT_MODULE: self._format_import_module,
+            Token.T_INCLUDE: self._format_include,
+            Token.T_EXPORT: self._format_export,
+            Token.T_EXPORT_DEFAULT: self._format_export_default,
+            Token.T_SUBSCR: self._format_subscr,
+            Token.T_BRANCH: self._format_branch,
+            Token.T_FOR: self._format_for,
+            Token.T_FOR_IN: self._format_for_in,
+            Token.T_FOR_OF: self._format_for_of,
+            Token.T_FOR_AWAIT_OF: self._format_for_await_of,
+            Token.T_DOWHILE: self._format_dowhile,
+            Token.T_WHILE: self._format_while,
+            Token.T_SWITCH: self._format_switch,
+            Token.T_CASE: self._format_case,
+            Token.T_DEFAULT: self._format_default,
+            Token.T_BREAK: self._format_break,
+            Token.T_CONTINUE: self._format_break,
+            Token.T_SWITCH_BREAK: self._format_break,
+            Token.T_RETURN: self._format_return,
+            Token.T_NEW: self._format_new,
+            Token.T_THROW: self._format_throw,
+            Token.T_TRY: self._format_try,
+            Token.T_CATCH: self._format_try,
+            Token.T_FINALLY: self._format_try,
+            Token.T_EMPTY_TOKEN: self._format_empty_token,
+            Token.T_CLOSURE: self._format_empty_token,
+            Token.T_DELETE_VAR: self._format_empty_token,
+            Token.T_SAVE_VAR: self._format_empty_token,
+            Token.T_RESTORE_VAR: self._format_empty_token,
+        }
+
     def format(self, mod):
 
         self.tokens = []
@@ -229,572 +326,620 @@ class Formatter(object):
 
             if not visit:
                 out.append((depth, token, state, _text))
-            elif token.type == Token.T_MODULE:
-                insert = False
-                if self.pretty_print and len(token.children) > 0 and not isctrlflow(token.children[-1]):
-                    seq.append((depth + 1, Token.T_SPECIAL, ";"))
-                for child in reversed(token.children):
-
-                    if insert and isctrlflow(child):
-                        seq.append((depth + 1, Token.T_NEWLINE, "\n"))
-                    elif insert:
-                        seq.append((depth + 1, Token.T_NEWLINE, "\n"))
-                        seq.append((depth + 1, Token.T_SPECIAL, ";"))
-                    seq.append((depth + 1, None, child))
-                    insert = True
-            elif token.type == Token.T_BLOCK:
-                seq.append((depth, Token.T_SPECIAL, token.value[1]))
-                seq.append((depth, Token.T_NEWLINE, "\n"))
-                first = True
-                if self.pretty_print and len(token.children) > 0 and not isctrlflow(token.children[-1]):
-                    seq.append((depth + 1, Token.T_SPECIAL, ";"))
-                for child in reversed(token.children):
-                    if child.type in (Token.T_CASE, Token.T_DEFAULT) or first:
-                        insert = False
-                    else:
-                        insert = True
-
-                    if insert and isctrlflow(child):
-                        seq.append((depth + 1, Token.T_NEWLINE, "\n"))
-                    elif insert:
-                        seq.append((depth + 1, Token.T_NEWLINE, "\n"))
-                        seq.append((depth + 1, Token.T_SPECIAL, ";"))
-
-                    seq.append((depth + 1, None, child))
-
-                    first = False
-
-                seq.append((depth, Token.T_NEWLINE, "\n"))
-                seq.append((depth, Token.T_SPECIAL, token.value[0]))
-            elif token.type == Token.T_CLASS_BLOCK:
-                # assumes all children are function definitions
-                # which do not need a semicolon
-                seq.append((depth, Token.T_SPECIAL, token.value[1]))
-                seq.append((depth, Token.T_NEWLINE, "\n"))
-                first = True
-                for child in reversed(token.children):
-                    if child.type in (Token.T_CASE, Token.T_DEFAULT) or first:
-                        insert = False
-                    else:
-                        insert = True
-
-                    if insert:
-                        seq.append((depth + 1, Token.T_NEWLINE, "\n"))
-
-                    seq.append((depth + 1, None, child))
-
-                    first = False
-
-                seq.append((depth, Token.T_NEWLINE, "\n"))
-                seq.append((depth, Token.T_SPECIAL, token.value[0]))
-            elif token.type == Token.T_OBJECT or token.type == Token.T_UNPACK_OBJECT:
-                seq.append((depth, Token.T_OBJECT, token.value[1]))
-                insert = False
-                for child in reversed(token.children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ","))
-                    seq.append((depth + 1, None, child))
-                    insert = True
-                seq.append((depth, Token.T_OBJECT, token.value[0]))
-            elif token.type in (Token.T_OBJECT, Token.T_LIST, Token.T_TUPLE, Token.T_RECORD, Token.T_GROUPING, Token.T_ARGLIST):
-                # commas are implied between clauses
-                if len(token.value)!=2:
-                    token.value = '[]'
-                    print("TODO: warning %s" % token.type)
-                seq.append((depth, Token.T_SPECIAL, token.value[1]))
-                insert = False
-                for child in reversed(token.children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ","))
-                    seq.append((depth + 1, None, child))
-                    insert = True
-
-                if token.type in (Token.T_TUPLE, Token.T_RECORD):
-                    seq.append((depth, Token.T_SPECIAL, "#" + token.value[0]))
-                else:
-                    seq.append((depth, Token.T_SPECIAL, token.value[0]))
-            elif token.type == Token.T_BLOCK_LABEL:
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, ":"))
-                seq.append((depth, Token.T_TEXT, token.value))
-            elif token.type == Token.T_UNPACK_SEQUENCE:
-                # commas are implied between clauses
-                seq.append((depth, Token.T_SPECIAL, token.value[1]))
-                insert = False
-                for child in reversed(token.children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ","))
-                    seq.append((depth + 1, None, child))
-                    insert = True
-                seq.append((depth, Token.T_SPECIAL, token.value[0]))
-            elif token.type == Token.T_LAMBDA:
-                seq.append((depth, None, token.children[2]))
-
-                if token.value.isalpha():
-                    seq.append((depth, Token.T_KEYWORD, token.value))
-                else:
-                    seq.append((depth, token.type, token.value))
-                seq.append((depth, None, token.children[1]))
-            elif token.type in (Token.T_BINARY, Token.T_GET_ATTR, Token.T_LOGICAL_OR, Token.T_LOGICAL_AND, Token.T_INSTANCE_OF, Token.T_NULLISH_COALESCING):
-                seq.append((depth, None, token.children[1]))
+            else:
+                fn = self.format_actions.get(token.type, None)
+                if fn is None:
+                    raise FormatError(token, "token not supported: %s" % token.type)
+                fn(seq, out, depth, token)
 
-                if token.value.isalpha():
-                    seq.append((depth, Token.T_KEYWORD, token.value))
-                else:
-                    seq.append((depth, token.type, token.value))
-                seq.append((depth, None, token.children[0]))
-            elif token.type == Token.T_ASSIGN or token.type == Token.T_NULLISH_ASSIGN:
-                seq.append((depth, None, token.children[1]))
+        return out
 
-                if token.value.isalpha():
-                    seq.append((depth, Token.T_KEYWORD, token.value))
-                else:
-                    seq.append((depth, token.type, token.value))
-                seq.append((depth, None, token.children[0]))
-            elif token.type == Token.T_TERNARY:
-                seq.append((depth, None, token.children[2]))
-                seq.append((depth, Token.T_SPECIAL, ":"))
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, Token.T_SPECIAL, "?"))
-                seq.append((depth, None, token.children[0]))
-            elif token.type in (Token.T_PREFIX, Token.T_SPREAD, Token.T_YIELD, Token.T_YIELD_FROM):
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_POSTFIX:
-                seq.append((depth, token.type, token.value))
-                seq.append((depth, None, token.children[0]))
-            elif token.type == Token.T_COMMA:
-                if len(token.children) == 0:
-                    raise FormatError(token, "no children")
-                else:
-                    first = True
-                    for child in reversed(token.children):
-                        if not first:
-                            seq.append((depth, Token.T_SPECIAL, ","))
-                        seq.append((depth, None, child))
-                        first = False
-            elif token.type in (Token.T_TEXT, Token.T_GLOBAL_VAR, Token.T_LOCAL_VAR, Token.T_FREE_VAR):
-
-                out.append((depth, token, token.type, token.value))
-            elif token.type == Token.T_REGEX:
-
-                out.append((depth, token, token.type, token.value))
-            elif token.type == Token.T_NUMBER:
-                num = token.value.replace("_", "")
-                out.append((depth, token, token.type, num))
-            elif token.type == Token.T_TAGGED_TEMPLATE:
-                lhs,rhs = token.children
-                seq.append((depth, None, rhs))
-                seq.append((depth, None, lhs))
-            elif token.type == Token.T_TEMPLATE_EXPRESSION:
-                seq.append((depth, Token.T_SPECIAL, '}'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, '${'))
-            elif token.type == Token.T_TEMPLATE_STRING:
-                # the value of a template string is the original unparsed value
-                # the children represent the parsed and transformed value
-                # children are either T_STRING or T_TEMPLATE_EXPRESSION
-                seq.append((depth, Token.T_SPECIAL, '`'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, '`'))
-            elif token.type == Token.T_STRING:
-
-                out.append((depth, token, token.type, token.value))
-            elif token.type == Token.T_KEYWORD:
-
-                if token.value == "static" and len(token.children)>0:
-                    #raise FormatError(token, "deprecated")
-                    print("warn: deprecated use of static")
-                    print(token.toString(2))
-                    seq.append((depth, Token.T_SPECIAL, ';'))
-                    for child in reversed(token.children):
-                        seq.append((depth, None, child))
-                    seq.append((depth, Token.T_SPECIAL, ' '))
-
-                out.append((depth, token, token.type, token.value))
-            elif token.type == Token.T_STATIC_PROPERTY:
-                seq.append((depth, None, ';'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, None, 'static'))
-
-            elif token.type == Token.T_PUBLIC_STATIC_PROPERTY:
-                seq.append((depth, None, ';'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, None, 'static'))
-
-            elif token.type == Token.T_PRIVATE_STATIC_PROPERTY:
-                seq.append((depth, None, ';'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, None, 'static'))
-
-            elif token.type == Token.T_PUBLIC_PROPERTY:
-                seq.append((depth, None, ';'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-
-            elif token.type == Token.T_PRIVATE_PROPERTY:
-                seq.append((depth, None, ';'))
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-
-
-            elif token.type == Token.T_OPTIONAL_CHAINING:
-                if len(token.children) == 2:
-                    lhs, rhs = token.children
-                    seq.append((depth, None, rhs))
-                    seq.append((depth, Token.T_SPECIAL, '?.'))
-                    seq.append((depth, None, lhs))
-                elif len(token.children) == 1 and token.children[0].type == Token.T_SUBSCR:
-                    child = token.children[0]
-                    seq.append((depth, Token.T_SPECIAL, "]"))
-                    for gc in reversed(child.children[1:]):
-                        seq.append((depth, None, gc))
-                    seq.append((depth, Token.T_SPECIAL, "["))
-                    seq.append((depth, Token.T_SPECIAL, '?.'))
-                    seq.append((depth, None, child.children[0]))
-                elif len(token.children) == 1 and token.children[0].type == Token.T_FUNCTIONCALL:
-                    child = token.children[0]
-                    seq.append((depth, None, child.children[1]))
-                    seq.append((depth, Token.T_SPECIAL, '?.'))
-                    seq.append((depth, None, child.children[0]))
-                else:
-                    raise FormatError(token, "not supported")
-            elif token.type == Token.T_ATTR:
-
-                out.append((depth, token, token.type, token.value))
-            elif token.type == Token.T_DOCUMENTATION:
-                parts = token.value.splitlines()
-                for part in parts:
-                    out.append((depth, token, token.type, part))
-                    out.append((depth, None, Token.T_NEWLINE, "\n"))
-            elif token.type == Token.T_NEWLINE:
-
-                raise FormatError(token, "unexpected")
-            elif token.type == Token.T_VAR:
-                first = True
-                for child in reversed(token.children):
-                    if not first:
-                        seq.append((depth + 1, Token.T_SPECIAL, ","))
-                    seq.append((depth, None, child))
-
-                    first = False
-                if token.value == "constexpr":
-                    token.value = "const"
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_INTERFACE:
-                # no specification yet for how to export types in javascript
-                # since the right hand side is a mapping of {property:type_spec}
-                # I am choosing to not serialize it at all, but still export a name
-                
-                seq.append((depth, None, 'undefined'))
-                seq.append((depth, None, '='))
-                seq.append((depth, None, child.children[0]))
-                seq.append((depth, token.type, 'const'))
-            elif token.type == Token.T_TYPE:
-
-                # no specification yet for how to export types in javascript
-                # since the right hand side is a mapping of {property:type_spec}
-                # I am choosing to not serialize it at all, but still export a name
-                first = True
-                if len(token.children) > 1:
-                    raise FormatError(token, "declaring more than one type not yet supported")
-
-                for child in reversed(token.children):
-
-                    if child.type != Token.T_ASSIGN or child.value != "=":
-                        raise FormatError(token, "type declartion must bind a name")
-
-                    seq.append((depth, None, 'undefined'))
-                    seq.append((depth, None, '='))
-                    seq.append((depth, None, child.children[0]))
-
-                seq.append((depth, token.type, 'const'))
-
-            elif token.type == Token.T_INTERFACE:
-                # nothing to do
-                pass
-            elif token.type == Token.T_CLASS:
-                seq.append((depth, None, token.children[2]))
-                if len(token.children[1].children) > 0:
-                    if self.pretty_print:
-                        seq.append((depth, Token.T_TEXT, " "))
-                    seq.append((depth, None, token.children[1].children[0]))
-                    seq.append((depth, Token.T_KEYWORD, "extends"))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_FUNCTION:
-                seq.append((depth, None, token.children[2]))
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, False, token.type, token))
-            elif token.type == Token.T_METHOD:
-                seq.append((depth, None, token.children[2]))
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                if token.value:
-                    seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_GENERATOR:
-                seq.append((depth, None, token.children[2]))
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_FUNCTIONCALL:
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-            elif token.type == Token.T_ANONYMOUS_FUNCTION:
-                for child in reversed(token.children[1:]):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function"))
-            elif token.type == Token.T_ANONYMOUS_GENERATOR:
-                for child in reversed(token.children[1:]):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function*"))
-            elif token.type == Token.T_ASYNC_FUNCTION:
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function"))
-                seq.append((depth, Token.T_KEYWORD, "async"))
-            elif token.type == Token.T_ASYNC_GENERATOR:
-                for child in reversed(token.children):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function*"))
-                seq.append((depth, Token.T_KEYWORD, "async"))
-            elif token.type == Token.T_ASYNC_ANONYMOUS_FUNCTION:
-                for child in reversed(token.children[1:]):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function"))
-                seq.append((depth, Token.T_KEYWORD, "async"))
-            elif token.type == Token.T_ASYNC_ANONYMOUS_GENERATOR:
-                for child in reversed(token.children[1:]):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_KEYWORD, "function*"))
-                seq.append((depth, Token.T_KEYWORD, "async"))
-            elif token.type == Token.T_IMPORT_JS_MODULE:
-                seq.append((depth, Token.T_SPECIAL, token.value))
-                seq.append((depth, Token.T_SPECIAL, 'from '))
-                seq.append((depth, Token.T_SPECIAL, '} '))
-                tmp = False
-                for child in reversed(token.children):
-                    if tmp:
-                        seq.append((depth, Token.T_SPECIAL, ', '))
-                    if child.type == Token.T_KEYWORD:
-                        lhs, rhs = child.children
-                        seq.append((depth, Token.T_SPECIAL, rhs.value))
-                        seq.append((depth, Token.T_SPECIAL, child.value))
-                        seq.append((depth, Token.T_SPECIAL, lhs.value))
-                    else:
-                        seq.append((depth, Token.T_SPECIAL, child.value))
-                    tmp = True
-
-                seq.append((depth, Token.T_SPECIAL, ' {'))
-                seq.append((depth, Token.T_SPECIAL, 'import'))
-            elif token.type == Token.T_IMPORT_JS_MODULE_AS:
-                seq.append((depth, Token.T_SPECIAL, token.value))
-                seq.append((depth, Token.T_SPECIAL, 'from '))
-                alias = token.children[0]
-                seq.append((depth, Token.T_SPECIAL, alias.value))
-                seq.append((depth, Token.T_SPECIAL, ' * as '))
-                seq.append((depth, Token.T_SPECIAL, 'import'))
-            elif token.type == Token.T_IMPORT:
-                # the builder uses the information and removes the ast node
-                sys.stdout.write("import not implemented\n")
-            elif token.type == Token.T_IMPORT_MODULE:
-                # the builder uses the information and removes the ast node
-                sys.stdout.write("import module not implemented\n")
-            elif token.type == Token.T_INCLUDE:
-                # the builder uses the information and removes the ast node
-                sys.stdout.write("include not implemented\n")
-            elif token.type == Token.T_EXPORT:
-                # TODO: support export from syntax
-                # when minifying, serialize export. the builder
-                # will remove the export keyword when building
-                insert = False
-                for child in reversed(token.children[1].children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ","))
-                    seq.append((depth, None, child))
-                    insert = True
-                seq.append((depth, Token.T_SPECIAL, 'export'))
-            elif token.type == Token.T_EXPORT_DEFAULT:
-                # TODO: support export from syntax
-                # when minifying, serialize export. the builder
-                # will remove the export keyword when building
+    def _format_module(self, seq, out, depth, token):
+        insert = False
+        if self.pretty_print and len(token.children) > 0 and not isctrlflow(token.children[-1]):
+            seq.append((depth + 1, Token.T_SPECIAL, ";"))
+        for child in reversed(token.children):
+
+            if insert and isctrlflow(child):
+                seq.append((depth + 1, Token.T_NEWLINE, "\n"))
+            elif insert:
+                seq.append((depth + 1, Token.T_NEWLINE, "\n"))
+                seq.append((depth + 1, Token.T_SPECIAL, ";"))
+            seq.append((depth + 1, None, child))
+            insert = True
+
+    def _format_block(self, seq, out, depth, token):
+        seq.append((depth, Token.T_SPECIAL, token.value[1]))
+        seq.append((depth, Token.T_NEWLINE, "\n"))
+        first = True
+        if self.pretty_print and len(token.children) > 0 and not isctrlflow(token.children[-1]):
+            seq.append((depth + 1, Token.T_SPECIAL, ";"))
+        for child in reversed(token.children):
+            if child.type in (Token.T_CASE, Token.T_DEFAULT) or first:
                 insert = False
-                for child in reversed(token.children[1].children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ","))
-                    seq.append((depth, None, child))
-                    insert = True
-                seq.append((depth, Token.T_SPECIAL, 'default'))
-                seq.append((depth, Token.T_SPECIAL, 'export'))
-            elif token.type == Token.T_SUBSCR:
-                seq.append((depth, Token.T_SPECIAL, "]"))
-                for child in reversed(token.children[1:]):
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, "["))
-                seq.append((depth, None, token.children[0]))
-            elif token.type == Token.T_BRANCH:
-                if len(token.children) == 3:
-                    if not isctrlflow(token.children[2]):
-                        seq.append((depth, Token.T_SPECIAL, ';'))
-                    seq.append((depth, None, token.children[2]))
-
-                    # note: for source maps, else doesnt exist
-                    # tok = Token(Token.T_KEYWORD, token.line, token.index, "else", file=token.file)
-                    # seq.append((depth, False, Token.T_KEYWORD, tok))
-
-                    seq.append((depth, Token.T_KEYWORD, "else"))
-                if not isctrlflow(token.children[1]):
-                    seq.append((depth, Token.T_SPECIAL, ';'))
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, False, token.type, token))
-            elif token.type == Token.T_FOR:
-                if len(token.children) == 1:
-                    sys.stderr.write("error: line: %d col: %d" % (token.line, token.index))
-                    args = token.children[0]
-                else:
-                    args = token.children[0]
-                    block = token.children[1]
-                    if not isctrlflow(block):
-                        seq.append((depth, Token.T_SPECIAL, ";"))
-                    seq.append((depth, None, block))
-                # this arglist is special, if there are multiple clauses
-                # separate them by semicolons instead of commas
-
-                if self.pretty_print:
-                    seq.append((depth, Token.T_NEWLINE, "\n"))
-
-                seq.append((depth, Token.T_SPECIAL, ')'))
+            else:
+                insert = True
+
+            if insert and isctrlflow(child):
+                seq.append((depth + 1, Token.T_NEWLINE, "\n"))
+            elif insert:
+                seq.append((depth + 1, Token.T_NEWLINE, "\n"))
+                seq.append((depth + 1, Token.T_SPECIAL, ";"))
+
+            seq.append((depth + 1, None, child))
+
+            first = False
+
+        seq.append((depth, Token.T_NEWLINE, "\n"))
+        seq.append((depth, Token.T_SPECIAL, token.value[0]))
+
+    def _format_class_block(self, seq, out, depth, token):
+        # assumes all children are function definitions
+        # which do not need a semicolon
+        seq.append((depth, Token.T_SPECIAL, token.value[1]))
+        seq.append((depth, Token.T_NEWLINE, "\n"))
+        first = True
+        for child in reversed(token.children):
+            if child.type in (Token.T_CASE, Token.T_DEFAULT) or first:
                 insert = False
-                for child in reversed(args.children):
-                    if insert:
-                        seq.append((depth, Token.T_SPECIAL, ";"))
-                    seq.append((depth, None, child))
-                    insert = True
-                seq.append((depth, Token.T_SPECIAL, '('))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_FOR_IN:
-                varexpr, iterable, block = token.children
-                if not isctrlflow(block):
-                    seq.append((depth, Token.T_SPECIAL, ";"))
-                seq.append((depth, None, block))
-                seq.append((depth, Token.T_SPECIAL, ')'))
-                seq.append((depth, None, iterable))
-                seq.append((depth, Token.T_KEYWORD, 'in'))
-                seq.append((depth, None, varexpr))
-                seq.append((depth, Token.T_SPECIAL, '('))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_FOR_OF:
-                varexpr, iterable, block = token.children
-                if not isctrlflow(block):
-                    seq.append((depth, Token.T_SPECIAL, ";"))
-                seq.append((depth, None, block))
-                seq.append((depth, Token.T_SPECIAL, ')'))
-                seq.append((depth, None, iterable))
-                seq.append((depth, Token.T_KEYWORD, 'of'))
-                seq.append((depth, None, varexpr))
-                seq.append((depth, Token.T_SPECIAL, '('))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_FOR_AWAIT_OF:
-                varexpr, iterable, block = token.children
-                if not isctrlflow(block):
-                    seq.append((depth, Token.T_SPECIAL, ";"))
-                seq.append((depth, None, block))
-                seq.append((depth, Token.T_SPECIAL, ')'))
-                seq.append((depth, None, iterable))
-                seq.append((depth, Token.T_KEYWORD, 'of'))
-                seq.append((depth, None, varexpr))
-                seq.append((depth, Token.T_SPECIAL, '('))
-                seq.append((depth, Token.T_KEYWORD, 'await'))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_DOWHILE:
-                seq.append((depth, None, token.children[1]))
-                if self.pretty_print:
-                    seq.append((depth, Token.T_TEXT, " "))
-                seq.append((depth, Token.T_KEYWORD, "while"))
-                if self.pretty_print:
-                    seq.append((depth, Token.T_TEXT, " "))
-                seq.append((depth, None, token.children[0]))
-                if self.pretty_print:
-                    seq.append((depth, Token.T_TEXT, " "))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_WHILE:
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_SWITCH:
-                seq.append((depth, None, token.children[1]))
-                seq.append((depth, None, token.children[0]))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_CASE:
-                _case, *_rest = token.children
-                #first = True
-                for child in reversed(_rest):
-                    #if not first:
-                    seq.append((depth, Token.T_SPECIAL, ";"))
-                    #first  = False
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, ":"))
-                seq.append((depth, None, _case))
-                if self.pretty_print:
-                    seq.append((depth, Token.T_SPECIAL, " "))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_DEFAULT:
-                #first = True
-                for child in reversed(token.children):
-                    #if not first:
-                    seq.append((depth, Token.T_SPECIAL, ";"))
-                    #first  = False
-                    seq.append((depth, None, child))
-                seq.append((depth, Token.T_SPECIAL, ":"))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_BREAK or token.type == Token.T_CONTINUE or token.type == Token.T_SWITCH_BREAK:
-
-                # a break statement may be followed by an identifer
-                # other constructs and continue are support by accident
-                for child in reversed(token.children):
-                    seq.append((depth, child.type, child.value))
-
-                out.append((depth,token, token.type, token.value))
-            elif token.type == Token.T_RETURN:
-                for child in reversed(token.children):  # length is zero or one
-                    seq.append((depth, None, child))
-                seq.append((depth, False, token.type, token))
-            elif token.type == Token.T_NEW:
-                for child in reversed(token.children):  # length is zero or one
-                    seq.append((depth, None, child))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_THROW:
-                for child in reversed(token.children):  # length is zero or one
-                    seq.append((depth, None, child))
-                seq.append((depth, token.type, token.value))
-            elif token.type in (Token.T_TRY, Token.T_CATCH, Token.T_FINALLY):
-                # note that try will have one or more children
-                # while catch always has 2 and finally always has 1
-                for child in reversed(token.children):  # length is zero or one
-                    seq.append((depth, None, child))
-                seq.append((depth, token.type, token.value))
-            elif token.type == Token.T_EMPTY_TOKEN:
-                pass
-            elif token.type == Token.T_CLOSURE:
-                pass # compiler only
-            elif token.type == Token.T_DELETE_VAR:
-                pass # compiler only
-            elif token.type == Token.T_SAVE_VAR:
-                pass # compiler only
-            elif token.type == Token.T_RESTORE_VAR:
-                pass # compiler only
             else:
-                raise FormatError(token, "token not supported: %s" % token.type)
+                insert = True
+
+            if insert:
+                seq.append((depth + 1, Token.T_NEWLINE, "\n"))
+
+            seq.append((depth + 1, None, child))
+
+            first = False
+
+        seq.append((depth, Token.T_NEWLINE, "\n"))
+        seq.append((depth, Token.T_SPECIAL, token.value[0]))
+
+    def _format_object(self, seq, out, depth, token):
+        seq.append((depth, Token.T_OBJECT, token.value[1]))
+        insert = False
+        for child in reversed(token.children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ","))
+            seq.append((depth + 1, None, child))
+            insert = True
+        seq.append((depth, Token.T_OBJECT, token.value[0]))
+
+    def _format_list(self, seq, out, depth, token):
+        # commas are implied between clauses
+        if len(token.value)!=2:
+            token.value = '[]'
+            print("TODO: warning %s" % token.type)
+        seq.append((depth, Token.T_SPECIAL, token.value[1]))
+        insert = False
+        for child in reversed(token.children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ","))
+            seq.append((depth + 1, None, child))
+            insert = True
+
+        if token.type in (Token.T_TUPLE, Token.T_RECORD):
+            seq.append((depth, Token.T_SPECIAL, "#" + token.value[0]))
+        else:
+            seq.append((depth, Token.T_SPECIAL, token.value[0]))
+
+    def _format_block_label(self, seq, out, depth, token):
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, ":"))
+        seq.append((depth, Token.T_TEXT, token.value))
+
+    def _format_unpack_sequence(self, seq, out, depth, token):
+        # commas are implied between clauses
+        seq.append((depth, Token.T_SPECIAL, token.value[1]))
+        insert = False
+        for child in reversed(token.children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ","))
+            seq.append((depth + 1, None, child))
+            insert = True
+        seq.append((depth, Token.T_SPECIAL, token.value[0]))
+
+    def _format_lambda(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+
+        if token.value.isalpha():
+            seq.append((depth, Token.T_KEYWORD, token.value))
+        else:
+            seq.append((depth, token.type, token.value))
+        seq.append((depth, None, token.children[1]))
 
-        return out
+    def _format_binary(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[1]))
+
+        if token.value.isalpha():
+            seq.append((depth, Token.T_KEYWORD, token.value))
+        else:
+            seq.append((depth, token.type, token.value))
+        seq.append((depth, None, token.children[0]))
+
+    def _format_assign(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[1]))
+
+        if token.value.isalpha():
+            seq.append((depth, Token.T_KEYWORD, token.value))
+        else:
+            seq.append((depth, token.type, token.value))
+        seq.append((depth, None, token.children[0]))
+
+    def _format_ternary(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+        seq.append((depth, Token.T_SPECIAL, ":"))
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, Token.T_SPECIAL, "?"))
+        seq.append((depth, None, token.children[0]))
+
+    def _format_prefix(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, token.value))
+
+    def _format_postfix(self, seq, out, depth, token):
+        seq.append((depth, token.type, token.value))
+        seq.append((depth, None, token.children[0]))
+
+    def _format_comma(self, seq, out, depth, token):
+        if len(token.children) == 0:
+            raise FormatError(token, "no children")
+        else:
+            first = True
+            for child in reversed(token.children):
+                if not first:
+                    seq.append((depth, Token.T_SPECIAL, ","))
+                seq.append((depth, None, child))
+                first = False
+
+    def _format_text(self, seq, out, depth, token):
+        out.append((depth, token, token.type, token.value))
+
+    def _format_regex(self, seq, out, depth, token):
+        out.append((depth, token, token.type, token.value))
+
+    def _format_number(self, seq, out, depth, token):
+        num = token.value.replace("_", "")
+        out.append((depth, token, token.type, num))
+
+    def _format_tagged_template(self, seq, out, depth, token):
+        lhs,rhs = token.children
+        seq.append((depth, None, rhs))
+        seq.append((depth, None, lhs))
+
+    def _format_template_expression(self, seq, out, depth, token):
+        seq.append((depth, Token.T_SPECIAL, '}'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, '${'))
+
+    def _format_template_string(self, seq, out, depth, token):
+        # the value of a template string is the original unparsed value
+        # the children represent the parsed and transformed value
+        # children are either T_STRING or T_TEMPLATE_EXPRESSION
+        seq.append((depth, Token.T_SPECIAL, '`'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, '`'))
+
+    def _format_string(self, seq, out, depth, token):
+        out.append((depth, token, token.type, token.value))
+
+    def _format_keyword(self, seq, out, depth, token):
+        if token.value == "static" and len(token.children)>0:
+            #raise FormatError(token, "deprecated")
+            print("warn: deprecated use of static")
+            print(token.toString(2))
+            seq.append((depth, Token.T_SPECIAL, ';'))
+            for child in reversed(token.children):
+                seq.append((depth, None, child))
+            seq.append((depth, Token.T_SPECIAL, ' '))
+
+        out.append((depth, token, token.type, token.value))
+
+    def _format_static_property(self, seq, out, depth, token):
+        seq.append((depth, None, ';'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, None, 'static'))
+
+    def _format_public_static_property(self, seq, out, depth, token):
+        seq.append((depth, None, ';'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, None, 'static'))
+
+    def _format_private_static_property(self, seq, out, depth, token):
+        seq.append((depth, None, ';'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, None, 'static'))
+
+    def _format_public_property(self, seq, out, depth, token):
+        seq.append((depth, None, ';'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+
+    def _format_private_property(self, seq, out, depth, token):
+        seq.append((depth, None, ';'))
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+
+    def _format_optional_chaining(self, seq, out, depth, token):
+        if len(token.children) == 2:
+            lhs, rhs = token.children
+            seq.append((depth, None, rhs))
+            seq.append((depth, Token.T_SPECIAL, '?.'))
+            seq.append((depth, None, lhs))
+        elif len(token.children) == 1 and token.children[0].type == Token.T_SUBSCR:
+            child = token.children[0]
+            seq.append((depth, Token.T_SPECIAL, "]"))
+            for gc in reversed(child.children[1:]):
+                seq.append((depth, None, gc))
+            seq.append((depth, Token.T_SPECIAL, "["))
+            seq.append((depth, Token.T_SPECIAL, '?.'))
+            seq.append((depth, None, child.children[0]))
+        elif len(token.children) == 1 and token.children[0].type == Token.T_FUNCTIONCALL:
+            child = token.children[0]
+            seq.append((depth, None, child.children[1]))
+            seq.append((depth, Token.T_SPECIAL, '?.'))
+            seq.append((depth, None, child.children[0]))
+        else:
+            raise FormatError(token, "not supported")
+
+    def _format_attr(self, seq, out, depth, token):
+        out.append((depth, token, token.type, token.value))
+
+    def _format_documentation(self, seq, out, depth, token):
+        parts = token.value.splitlines()
+        for part in parts:
+            out.append((depth, token, token.type, part))
+            out.append((depth, None, Token.T_NEWLINE, "\n"))
+
+    def _format_newline(self, seq, out, depth, token):
+        raise FormatError(token, "unexpected")
+
+    def _format_var(self, seq, out, depth, token):
+        first = True
+        for child in reversed(token.children):
+            if not first:
+                seq.append((depth + 1, Token.T_SPECIAL, ","))
+            seq.append((depth, None, child))
+
+            first = False
+        if token.value == "constexpr":
+            token.value = "const"
+        seq.append((depth, token.type, token.value))
+
+    def _format_interface(self, seq, out, depth, token):
+        # no specification yet for how to export types in javascript
+        # since the right hand side is a mapping of {property:type_spec}
+        # I am choosing to not serialize it at all, but still export a name
+
+        seq.append((depth, None, 'undefined'))
+        seq.append((depth, None, '='))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, 'const'))
+
+    def _format_type(self, seq, out, depth, token):
+        # no specification yet for how to export types in javascript
+        # since the right hand side is a mapping of {property:type_spec}
+        # I am choosing to not serialize it at all, but still export a name
+        first = True
+        if len(token.children) > 1:
+            raise FormatError(token, "declaring more than one type not yet supported")
+
+        for child in reversed(token.children):
+
+            if child.type != Token.T_ASSIGN or child.value != "=":
+                raise FormatError(token, "type declartion must bind a name")
+
+            seq.append((depth, None, 'undefined'))
+            seq.append((depth, None, '='))
+            seq.append((depth, None, child.children[0]))
+
+        seq.append((depth, token.type, 'const'))
+
+    def _format_class(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+        if len(token.children[1].children) > 0:
+            if self.pretty_print:
+                seq.append((depth, Token.T_TEXT, " "))
+            seq.append((depth, None, token.children[1].children[0]))
+            seq.append((depth, Token.T_KEYWORD, "extends"))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, token.value))
+
+    def _format_function(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, False, token.type, token))
+
+    def _format_method(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        if token.value:
+            seq.append((depth, token.type, token.value))
+
+    def _format_generator(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[2]))
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, token.value))
+
+    def _format_functioncall(self, seq, out, depth, token):
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+
+    def _format_anonymous_function(self, seq, out, depth, token):
+        for child in reversed(token.children[1:]):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function"))
+
+    def _format_anonymous_generator(self, seq, out, depth, token):
+        for child in reversed(token.children[1:]):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function*"))
+
+    def _format_async_function(self, seq, out, depth, token):
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function"))
+        seq.append((depth, Token.T_KEYWORD, "async"))
+
+    def _format_async_generator(self, seq, out, depth, token):
+        for child in reversed(token.children):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function*"))
+        seq.append((depth, Token.T_KEYWORD, "async"))
+
+    def _format_async_anonymous_function(self, seq, out, depth, token):
+        for child in reversed(token.children[1:]):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function"))
+        seq.append((depth, Token.T_KEYWORD, "async"))
+
+    def _format_async_anonymous_generator(self, seq, out, depth, token):
+        for child in reversed(token.children[1:]):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_KEYWORD, "function*"))
+        seq.append((depth, Token.T_KEYWORD, "async"))
+
+    def _format_import_js_module(self, seq, out, depth, token):
+        seq.append((depth, Token.T_SPECIAL, token.value))
+        seq.append((depth, Token.T_SPECIAL, 'from '))
+        seq.append((depth, Token.T_SPECIAL, '} '))
+        tmp = False
+        for child in reversed(token.children):
+            if tmp:
+                seq.append((depth, Token.T_SPECIAL, ', '))
+            if child.type == Token.T_KEYWORD:
+                lhs, rhs = child.children
+                seq.append((depth, Token.T_SPECIAL, rhs.value))
+                seq.append((depth, Token.T_SPECIAL, child.value))
+                seq.append((depth, Token.T_SPECIAL, lhs.value))
+            else:
+                seq.append((depth, Token.T_SPECIAL, child.value))
+            tmp = True
+
+        seq.append((depth, Token.T_SPECIAL, ' {'))
+        seq.append((depth, Token.T_SPECIAL, 'import'))
+
+    def _format_import_js_module_as(self, seq, out, depth, token):
+        seq.append((depth, Token.T_SPECIAL, token.value))
+        seq.append((depth, Token.T_SPECIAL, 'from '))
+        alias = token.children[0]
+        seq.append((depth, Token.T_SPECIAL, alias.value))
+        seq.append((depth, Token.T_SPECIAL, ' * as '))
+        seq.append((depth, Token.T_SPECIAL, 'import'))
+
+    def _format_import(self, seq, out, depth, token):
+        # the builder uses the information and removes the ast node
+        sys.stdout.write("import not implemented\n")
+
+    def _format_import_module(self, seq, out, depth, token):
+        # the builder uses the information and removes the ast node
+        sys.stdout.write("import module not implemented\n")
+
+    def _format_include(self, seq, out, depth, token):
+        # the builder uses the information and removes the ast node
+        sys.stdout.write("include not implemented\n")
+
+    def _format_export(self, seq, out, depth, token):
+        # TODO: support export from syntax
+        # when minifying, serialize export. the builder
+        # will remove the export keyword when building
+        insert = False
+        for child in reversed(token.children[1].children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ","))
+            seq.append((depth, None, child))
+            insert = True
+        seq.append((depth, Token.T_SPECIAL, 'export'))
+
+    def _format_export_default(self, seq, out, depth, token):
+        # TODO: support export from syntax
+        # when minifying, serialize export. the builder
+        # will remove the export keyword when building
+        insert = False
+        for child in reversed(token.children[1].children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ","))
+            seq.append((depth, None, child))
+            insert = True
+        seq.append((depth, Token.T_SPECIAL, 'default'))
+        seq.append((depth, Token.T_SPECIAL, 'export'))
+
+    def _format_subscr(self, seq, out, depth, token):
+        seq.append((depth, Token.T_SPECIAL, "]"))
+        for child in reversed(token.children[1:]):
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, "["))
+        seq.append((depth, None, token.children[0]))
+
+    def _format_branch(self, seq, out, depth, token):
+        if len(token.children) == 3:
+            if not isctrlflow(token.children[2]):
+                seq.append((depth, Token.T_SPECIAL, ';'))
+            seq.append((depth, None, token.children[2]))
+
+            # note: for source maps, else doesnt exist
+            # tok = Token(Token.T_KEYWORD, token.line, token.index, "else", file=token.file)
+            # seq.append((depth, False, Token.T_KEYWORD, tok))
+
+            seq.append((depth, Token.T_KEYWORD, "else"))
+        if not isctrlflow(token.children[1]):
+            seq.append((depth, Token.T_SPECIAL, ';'))
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, False, token.type, token))
+
+    def _format_for(self, seq, out, depth, token):
+        if len(token.children) == 1:
+            sys.stderr.write("error: line: %d col: %d" % (token.line, token.index))
+            args = token.children[0]
+        else:
+            args = token.children[0]
+            block = token.children[1]
+            if not isctrlflow(block):
+                seq.append((depth, Token.T_SPECIAL, ";"))
+            seq.append((depth, None, block))
+        # this arglist is special, if there are multiple clauses
+        # separate them by semicolons instead of commas
+
+        if self.pretty_print:
+            seq.append((depth, Token.T_NEWLINE, "\n"))
+
+        seq.append((depth, Token.T_SPECIAL, ')'))
+        insert = False
+        for child in reversed(args.children):
+            if insert:
+                seq.append((depth, Token.T_SPECIAL, ";"))
+            seq.append((depth, None, child))
+            insert = True
+        seq.append((depth, Token.T_SPECIAL, '('))
+        seq.append((depth, token.type, token.value))
+
+    def _format_for_in(self, seq, out, depth, token):
+        varexpr, iterable, block = token.children
+        if not isctrlflow(block):
+            seq.append((depth, Token.T_SPECIAL, ";"))
+        seq.append((depth, None, block))
+        seq.append((depth, Token.T_SPECIAL, ')'))
+        seq.append((depth, None, iterable))
+        seq.append((depth, Token.T_KEYWORD, 'in'))
+        seq.append((depth, None, varexpr))
+        seq.append((depth, Token.T_SPECIAL, '('))
+        seq.append((depth, token.type, token.value))
+
+    def _format_for_of(self, seq, out, depth, token):
+        varexpr, iterable, block = token.children
+        if not isctrlflow(block):
+            seq.append((depth, Token.T_SPECIAL, ";"))
+        seq.append((depth, None, block))
+        seq.append((depth, Token.T_SPECIAL, ')'))
+        seq.append((depth, None, iterable))
+        seq.append((depth, Token.T_KEYWORD, 'of'))
+        seq.append((depth, None, varexpr))
+        seq.append((depth, Token.T_SPECIAL, '('))
+        seq.append((depth, token.type, token.value))
+
+    def _format_for_await_of(self, seq, out, depth, token):
+        varexpr, iterable, block = token.children
+        if not isctrlflow(block):
+            seq.append((depth, Token.T_SPECIAL, ";"))
+        seq.append((depth, None, block))
+        seq.append((depth, Token.T_SPECIAL, ')'))
+        seq.append((depth, None, iterable))
+        seq.append((depth, Token.T_KEYWORD, 'of'))
+        seq.append((depth, None, varexpr))
+        seq.append((depth, Token.T_SPECIAL, '('))
+        seq.append((depth, Token.T_KEYWORD, 'await'))
+        seq.append((depth, token.type, token.value))
+
+    def _format_dowhile(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[1]))
+        if self.pretty_print:
+            seq.append((depth, Token.T_TEXT, " "))
+        seq.append((depth, Token.T_KEYWORD, "while"))
+        if self.pretty_print:
+            seq.append((depth, Token.T_TEXT, " "))
+        seq.append((depth, None, token.children[0]))
+        if self.pretty_print:
+            seq.append((depth, Token.T_TEXT, " "))
+        seq.append((depth, token.type, token.value))
+
+    def _format_while(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, token.value))
+
+    def _format_switch(self, seq, out, depth, token):
+        seq.append((depth, None, token.children[1]))
+        seq.append((depth, None, token.children[0]))
+        seq.append((depth, token.type, token.value))
+
+    def _format_case(self, seq, out, depth, token):
+        _case, *_rest = token.children
+        #first = True
+        for child in reversed(_rest):
+            #if not first:
+            seq.append((depth, Token.T_SPECIAL, ";"))
+            #first  = False
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, ":"))
+        seq.append((depth, None, _case))
+        if self.pretty_print:
+            seq.append((depth, Token.T_SPECIAL, " "))
+        seq.append((depth, token.type, token.value))
+
+    def _format_default(self, seq, out, depth, token):
+        #first = True
+        for child in reversed(token.children):
+            #if not first:
+            seq.append((depth, Token.T_SPECIAL, ";"))
+            #first  = False
+            seq.append((depth, None, child))
+        seq.append((depth, Token.T_SPECIAL, ":"))
+        seq.append((depth, token.type, token.value))
+
+    def _format_break(self, seq, out, depth, token):
+        # a break statement may be followed by an identifer
+        # other constructs and continue are support by accident
+        for child in reversed(token.children):
+            seq.append((depth, child.type, child.value))
+
+        out.append((depth,token, token.type, token.value))
+
+    def _format_return(self, seq, out, depth, token):
+        for child in reversed(token.children):  # length is zero or one
+            seq.append((depth, None, child))
+        seq.append((depth, False, token.type, token))
+
+    def _format_new(self, seq, out, depth, token):
+        for child in reversed(token.children):  # length is zero or one
+            seq.append((depth, None, child))
+        seq.append((depth, token.type, token.value))
+
+    def _format_throw(self, seq, out, depth, token):
+        for child in reversed(token.children):  # length is zero or one
+            seq.append((depth, None, child))
+        seq.append((depth, token.type, token.value))
+
+    def _format_try(self, seq, out, depth, token):
+        # note that try will have one or more children
+        # while catch always has 2 and finally always has 1
+        for child in reversed(token.children):  # length is zero or one
+            seq.append((depth, None, child))
+        seq.append((depth, token.type, token.value))
+
+    def _format_empty_token(self, seq, out, depth, token):
+        # compiler only tokens, and tokens which stand for no token
+        # are not formatted
+        pass
 
 def main():  # pragma: no cover
 
@@ -0,0 +1,331 @@
+
+"""
+concatenate every module into a single function scope
+
+By default each module, and each file of a module, is wrapped in a
+function which returns an object of the exported names. Imported names
+are read from that object when the module is initialized.
+
+A scope hoisted program instead places the top level statements of
+every file in one function, in the order the modules are initialized.
+An imported name is replaced by the name of the declaration in the
+module which exports it. A top level name which collides with a name in
+another file, or with an undefined global used by any file, is renamed.
+
+The scope of each file is found by applying TransformIdentityScope to
+a copy of the file. A name which refers to a top level declaration of
+the file is given the hoisted name of the declaration, and a name which
+is undefined in the file is resolved using the exports of the other
+files in the module and the imported names.
+
+The exports of each module are still assigned to the global module
+object, so that code which uses a module by name continues to work.
+"""
+
+import json
+
+from .lexer import Lexer
+from .parser import Parser
+from .token import Token
+from .transform import TransformIdentityScope, UndefinedRef, copyTracked
+
+class HoistPart(object):
+    """
+    the static data or a file of a module
+    """
+
+    def __init__(self, ast, exports, copy_output):
+        super(HoistPart, self).__init__()
+
+        self.exports = exports
+
+        copy, self.ast, mapping = copyTracked(ast, copy_output)
+
+        xform = TransformIdentityScope()
+        xform.disable_warnings = True
+        xform.transform(copy)
+
+        scope = xform.global_scope
+        # the top level names, in the order they are defined
+        self.names = list(scope.fnscope)
+        self.names.extend(name for name in scope.blscope[0] if name not in scope.fnscope)
+        names = set(self.names)
+
+        # list of (token, parent, label) for each name which refers to
+        # a top level declaration
+        self.defined = []
+        # list of (token, parent, label) for each undefined name
+        self.undefined = []
+        # every identifier in the part
+        self.identifiers = set()
+
+        stack = [copy]
+        while stack:
+            token = stack.pop()
+            stack.extend(token.children)
+            ref = token.ref
+            if ref is None or id(token) not in mapping:
+                continue
+            out_tok, parent = mapping[id(token)]
+            self.identifiers.add(ref.label)
+            if isinstance(ref, UndefinedRef):
+                self.undefined.append((out_tok, parent, ref.label))
+            elif ref.isGlobal() and ref.label in names:
+                self.defined.append((out_tok, parent, ref.label))
+
+def _rename(token, parent, name):
+    """
+    rename a token, keeping the key of a shorthand property
+    """
+    if parent is not None and parent.type in (Token.T_OBJECT, Token.T_UNPACK_OBJECT):
+        # {x} => {x: x$1}
+        index = next(i for i, child in enumerate(parent.children) if child is token)
+        key = Token(Token.T_TEXT, token.line, token.index, token.value)
+        key.file = token.file
+        parent.children[index] = Token(Token.T_BINARY, token.line, token.index, ":",
+            [key, token])
+    token.value = name
+
+class ScopeHoister(object):
+    """
+    build a program containing every module in a single function scope
+    """
+
+    def __init__(self, order, copy_output=True, lexer_opts=None):
+        """
+        order: the modules of the program, sorted so that each module
+            follows the modules it imports
+        copy_output: when false, the file asts are modified
+        """
+        super(ScopeHoister, self).__init__()
+        self.order = order
+        self.copy_output = copy_output
+        self.lexer_opts = lexer_opts or {}
+
+    def _parts(self, mod):
+        """
+        returns the HoistPart for the static data and each file of a module
+        """
+        parts = []
+        if mod.static_data:
+            parts.append(HoistPart(mod.static_data, sorted(mod.static_exports), self.copy_output))
+        for ast, exports in mod.getParts():
+            parts.append(HoistPart(ast, exports, self.copy_output))
+        return parts
+
+    def build(self):
+        """
+        returns the ast of the program
+        """
+
+        modules = [(mod, self._parts(mod)) for mod in self.order]
+
+        module_names = {mod.name().split('.')[0] for mod in self.order}
+
+        # the names which are in the scope of each module, outside of the files
+        scopes = {}
+        for mod, parts in modules:
+            labels = set()
+            for part in parts:
+                labels.update(part.exports)
+            for names in mod.getImports().values():
+                labels.update(names.values())
+            scopes[mod.name()] = labels
+
+        # names which are not defined by the program must not be renamed
+        reserved = set(module_names)
+        identifiers = set(module_names)
+        for mod, parts in modules:
+            labels = scopes[mod.name()]
+            for part in parts:
+                identifiers.update(part.identifiers)
+                for _, _, label in part.undefined:
+                    if label not in labels:
+                        reserved.add(label)
+
+        # parts which must be given a name which is not used anywhere
+        # in the program. (id(part), label)
+        unique = set()
+        while True:
+            hoisted = self._assign(modules, reserved, identifiers, unique)
+            conflicts = self._resolve(modules, hoisted, identifiers)
+            if not conflicts:
+                break
+            unique.update(conflicts)
+
+        return self._assemble(modules, hoisted)
+
+    def _assign(self, modules, reserved, identifiers, unique):
+        """
+        returns a dictionary (id(part), label) => name for every top level
+        declaration
+        """
+        taken = set(reserved)
+        hoisted = {}
+        for mod, parts in modules:
+            for part in parts:
+                for label in part.names:
+                    key = (id(part), label)
+                    if label not in taken and key not in unique:
+                        name = label
+                    else:
+                        index = 1
+                        name = "%s$%d" % (label, index)
+                        while name in taken or name in identifiers:
+                            index += 1
+                            name = "%s$%d" % (label, index)
+                    taken.add(name)
+                    hoisted[key] = name
+        return hoisted
+
+    def _resolve(self, modules, hoisted, identifiers):
+        """
+        find the name which replaces each label in the scope of each
+        module, and the hoisted name of each export
+
+        returns the set of declarations whose hoisted name would be
+        shadowed in a file which uses the declaration by another label
+        """
+        self.scopes = {}
+        self.exports = {}
+        self.aliases = {}
+        conflicts = set()
+        taken = set(hoisted.values())
+
+        def alias(label, modname):
+            # a unique name for a value read from a module object
+            name = "%s$%s" % (label, modname.replace('.', '$'))
+            index = 1
+            while name in taken or name in identifiers:
+                index += 1
+                name = "%s$%s$%d" % (label, modname.replace('.', '$'), index)
+            taken.add(name)
+            return name
+
+        for mod, parts in modules:
+            modname = mod.name()
+            scope = {}
+            owners = {}
+            aliases = []
+
+            # names exported by a file of the module
+            for part in parts:
+                names = set(part.names)
+                for label in part.exports:
+                    if label in names and label not in scope:
+                        scope[label] = hoisted[(id(part), label)]
+                        owners[label] = (id(part), label)
+
+            # names imported from other modules. an import which is not
+            # exported by the module is read from the module object
+            imports = mod.getImports()
+            for other, names in imports.items():
+                other_exports = self.exports.get(other, {})
+                for src, dst in names.items():
+                    if dst in scope:
+                        continue
+                    if src in other_exports:
+                        scope[dst] = other_exports[src][0]
+                        owners[dst] = other_exports[src][1]
+                    else:
+                        scope[dst] = alias(dst, modname)
+                        aliases.append((scope[dst], other, src))
+
+            # the last part of the name of an imported module refers
+            # to the module object
+            for other in imports:
+                label = other.split('.')[-1]
+                if '.' in other and label not in scope:
+                    if any(label == name for part in parts for _, _, name in part.undefined):
+                        scope[label] = alias(label, modname)
+                        aliases.append((scope[label], other, None))
+
+            self.scopes[modname] = scope
+            self.aliases[modname] = aliases
+            self.exports[modname] = {label: (scope[label], owners.get(label, None))
+                for label in mod.getExports() if label in scope}
+
+            for part in parts:
+                for _, _, label in part.undefined:
+                    name = scope.get(label, label)
+                    # an inner declaration of the file would shadow the name
+                    if name != label and name in part.identifiers and owners.get(label):
+                        conflicts.add(owners[label])
+
+        return conflicts
+
+    def _assemble(self, modules, hoisted):
+
+        def TOKEN(type, value, *children):
+            return Token(type, 1, 0, value, children)
+
+        body = [TOKEN('T_STRING', '"use strict"')]
+        structure = {}
+        for mod, parts in modules:
+            modname = mod.name()
+            scope = self.scopes[modname]
+
+            # values which are read from the object of another module
+            for name, other, src in self.aliases[modname]:
+                tok = _module_token(TOKEN, other)
+                if src is not None:
+                    tok = TOKEN('T_GET_ATTR', '.', tok, TOKEN('T_ATTR', src))
+                body.append(TOKEN('T_VAR', 'const',
+                    TOKEN('T_ASSIGN', '=', TOKEN('T_TEXT', name), tok)))
+
+            for part in parts:
+                for token, parent, label in part.defined:
+                    name = hoisted[(id(part), label)]
+                    if name != label:
+                        _rename(token, parent, name)
+                for token, parent, label in part.undefined:
+                    name = scope.get(label, label)
+                    if name != label:
+                        _rename(token, parent, name)
+                body.extend(part.ast.children)
+
+            # assign the exports to the module object
+            exports = self.exports[modname]
+            tok_exports = [TOKEN('T_BINARY', ':',
+                    TOKEN('T_STRING', repr(label)),
+                    TOKEN('T_TEXT', exports[label][0]))
+                for label in sorted(exports)]
+            body.append(TOKEN('T_FUNCTIONCALL', '',
+                TOKEN('T_GET_ATTR', '.',
+                    TOKEN('T_TEXT', 'Object'),
+                    TOKEN('T_TEXT', 'assign')),
+                TOKEN('T_ARGLIST', '()',
+                    _module_token(TOKEN, modname),
+                    TOKEN('T_OBJECT', '{}', *tok_exports))))
+
+            struct = structure
+            for part in modname.split('.'):
+                struct = struct.setdefault(part, {})
+
+        # create the module objects before the program is run
+        program = []
+        for key, struct in structure.items():
+            source = '%s = %s' % (key, json.dumps(struct))
+            tokens = Lexer(self.lexer_opts).lex(source)
+            program.extend(Parser().parse(tokens).children)
+
+        tok_fundef = TOKEN('T_ANONYMOUS_FUNCTION', 'function',
+            TOKEN('T_TEXT', 'Anonymous'),
+            TOKEN('T_ARGLIST', '()'),
+            Token(Token.T_BLOCK, 1, 0, "{}", body))
+
+        program.append(TOKEN('T_FUNCTIONCALL', '',
+            TOKEN('T_GROUPING', '()', tok_fundef),
+            TOKEN('T_ARGLIST', '()')))
+
+        return Token(Token.T_MODULE, 0, 0, "", program)
+
+def _module_token(TOKEN, modname):
+    """
+    returns an expression for the global object of a module
+    """
+    parts = modname.split('.')
+    tok = TOKEN('T_TEXT', parts[0])
+    for part in parts[1:]:
+        tok = TOKEN('T_GET_ATTR', '.', tok, TOKEN('T_ATTR', part))
+    return tok
@@ -0,0 +1,113 @@
+
+"""
+a builder which keeps the module graph and the output of each module
+between builds
+
+The first build discovers, scopes and formats every module. Later
+builds reload only the files which have been modified, and a module
+is scoped and formatted again only when one of its files has changed.
+The formatted source and source map of each module are joined to
+produce the output.
+
+The output of each module depends only on the ast of that module when
+the identity scope is used, and is the same as the output of formatting
+the whole program. A minified build renames variables across the whole
+program, and is compiled by Builder every time.
+"""
+
+import os
+import sys
+import time
+
+from .builder import Builder
+
+class IncrementalBuilder(Builder):
+    def __init__(self, search_paths, static_data, platform=None):
+        super(IncrementalBuilder, self).__init__(search_paths, static_data, platform)
+
+        self.root_path = None
+        # the compiled units refer to the module asts, which must not
+        # be modified by the scope transform
+        self.copy_ast = True
+        # id of a module ast => CompiledUnit
+        self.units = {}
+        # the number of units compiled by the last build
+        self.compiled_count = 0
+
+    def discover(self, path):
+        """
+        load all imported modules and files starting with the given file
+
+        the modules found by a previous build are reused, only
+        modified files are loaded again
+        """
+
+        if self.root_module is None or path != self.root_path:
+            self.units = {}
+            jsm = super(IncrementalBuilder, self).discover(path)
+            self.root_path = path
+            return jsm
+
+        if self.jobs > 1:
+            self.preloadModified()
+
+        self._discover(self.root_module)
+
+        self._fix_export_star()
+
+        self.preloaded.clear()
+
+        return self.root_module
+
+    def preloadModified(self):
+        """
+        parse the files which have been modified since the last build,
+        using a pool of self.jobs worker processes
+
+        the dependencies are not scanned again. a file which is included
+        for the first time is parsed when it is loaded. a single modified
+        file is also parsed when it is loaded, which is faster than
+        starting the worker processes
+        """
+        tasks = []
+        for jf in self.files.values():
+            try:
+                mtime = os.stat(jf.source_path).st_mtime
+            except OSError:
+                continue
+            if jf.ast is None or jf.mtime < mtime:
+                tasks.append(self._preloadTask(jf.path, jf.name, jf.source_type))
+
+        if len(tasks) > 1:
+            self._preloadTasks(tasks)
+
+    def _compile(self, units, minify, output=None):
+
+        if minify:
+            self.units = {}
+            return super(IncrementalBuilder, self)._compile(units, minify, output)
+
+        t1 = time.time()
+
+        compiled = []
+        cache = {}
+        self.compiled_count = 0
+        for unit in units:
+            if not unit.children:
+                continue
+            part = self.units.get(id(unit), None)
+            if part is None or part.ast is not unit:
+                part = self._compileUnit(unit)
+                self.compiled_count += 1
+            cache[id(unit)] = part
+            compiled.append(part)
+        self.units = cache
+
+        js, srcmap = self._join(compiled, output)
+
+        t2 = time.time()
+        if not self.quiet:
+            sys.stderr.write("%10s %.2f compiled %d of %d modules\n" % (
+                '', t2 - t1, self.compiled_count, len(compiled)))
+
+        return js, srcmap
@@ -2,6 +2,9 @@
 
 # TODO: better support for regex
 import sys
+import re
+import bisect
+import codecs
 
 from .token import Token, TokenError
 import cProfile
@@ -9,6 +12,10 @@ import cProfile
 class LexError(TokenError):
     pass
 
+class _FastLexFallback(Exception):
+    """ raised by the regex engine when the input is malformed """
+    pass
+
 # special characters that never combine with other characters
 chset_special1 = "{}[](),~;:#"
 # special characters that may combine with other special characters
@@ -77,14 +84,176 @@ operators2_extra = set(["?", "==", "!=", "**",
 # if an operator is not in this list, then it is a syntax error
 operators3 = operators1 | operators2 | operators2_extra
 
+# token types for which the value is interned. Identifiers, keywords and
+# operators are repeated many times in a module and share a single string
+interned_types = {Token.T_TEXT, Token.T_KEYWORD, Token.T_SPECIAL}
+
+# character classes used by the regex engine. The classes are derived from
+# the character sets above so that both engines agree on token boundaries.
+chset_text_stop = "\n/\\'\"`" + chset_special1 + chset_special2 + "."
+
+re_text = re.compile("[^%s\\x00-\\x20]+" % re.escape(chset_text_stop))
+re_newline = re.compile(r"\n")
+re_number = re.compile("(?:[eE][+\\-%(s)s]?|[%(s)s])*" % {"s": re.escape(chset_number)})
+re_regex = re.compile(r"[^\\/]*(?:\\.[^\\/]*)*/", re.DOTALL)
+re_string = {
+    "'": re.compile(r"[^\\\n']*"),
+    '"': re.compile(r'[^\\\n"]*'),
+    '`': re.compile(r"[^\\`]*"),
+}
+
+# the master regex used by the regex engine. white space is skipped and
+# then one of the groups below is matched. the last group matches any
+# character which requires special processing, after which the scanner
+# is restarted. the lexer dispatches on the index of the matched group.
+_G_LABEL = 1
+_G_SPECIAL1 = 2
+_G_NEWLINE = 3
+_G_NUMBER = 4
+_G_STRING = 5
+_G_OPERATOR = 6
+_G_DOT = 7
+_G_QUESTION = 8
+_G_COMMENT = 9
+_G_OTHER = 10
+
+re_master = re.compile(
+    r"[\x00-\x09\x0b-\x20]*(?:"
+    # a label, which does not begin with a number
+    r"([^%(stop)s0-9\x00-\x20][^%(stop)s\x00-\x20]*)|"
+    # special characters which are always a single token
+    r"([%(special1)s])|"
+    # one or more newlines
+    r"(\n[\x00-\x20]*)|"
+    # a number
+    r"([0-9]%(number)s)|"
+    # a string which does not contain an escaped newline or utf32 escape
+    r"('[^'\\\n]*(?:\\[^\nU][^'\\\n]*)*'|"
+    r'"[^"\\\n]*(?:\\[^\nU][^"\\\n]*)*"|'
+    r"`[^`\\]*(?:\\[^\nU][^`\\]*)*`)|"
+    # an operator which is not followed by another special character
+    r"([+\-&|^=<>%%!@])(?![%(special2)s])|"
+    # attribute access
+    r"(\.)(?![.0-9])|"
+    # the ternary operator
+    r"(\?)(?=[^.?])|"
+    # a single line comment
+    r"(//[^\n]*)|"
+    r"(.)|\Z)" % {
+        "stop": re.escape(chset_text_stop),
+        "special1": re.escape(chset_special1),
+        "special2": re.escape(chset_special2),
+        "number": re_number.pattern,
+    }, re.DOTALL)
+
+def utf32_to_utf16(utf32):
+    """ rewrite an 8 digit utf32 escape sequence as utf-16 surrogate pairs
+
+    returns the escape sequence without the leading slash
+    """
+    tmp = chr(int(utf32, 16)).encode("utf-16")[2:]
+    if len(tmp) == 2:
+        a,b = tmp
+        return "u%04X" % (b<<8|a)
+    else:
+        a,b,c,d = tmp
+        # already put the first slash
+        return "u%04X\\u%04X" % (b<<8|a, d<<8|c)
+
+# character kinds used by the regex engine to dispatch on the first
+# character of a run which is not a label, white space or newline
+_K_DIGIT = 0
+_K_STRING = 1
+_K_SLASH = 2
+_K_BACKSLASH = 3
+_K_SPECIAL2 = 4
+_K_STAR = 5
+_K_QUESTION = 6
+_K_DOT = 7
+
+_fast_dispatch = {c: _K_SPECIAL2 for c in chset_special2}
+_fast_dispatch.update({c: _K_DIGIT for c in chset_number_base})
+_fast_dispatch.update({c: _K_STRING for c in "'\"`"})
+_fast_dispatch.update({
+    '/': _K_SLASH,
+    '\\': _K_BACKSLASH,
+    '*': _K_STAR,
+    '?': _K_QUESTION,
+    '.': _K_DOT,
+})
+
+def template_segments(text):
+    """
+    split the body of a template string, without the enclosing back ticks,
+    into literal text and substitution expressions.
+
+    returns a list of (is_expression, offset, text)
+    """
+    segments = []
+    index = 0
+    state = 0
+    start = 0
+    stack = 0
+    while index < len(text):
+        c = text[index]
+
+        if state == 2:
+            if c == '{':
+                stack += 1
+
+            elif c == '}':
+                if stack == 0:
+                    state = 0
+                    segments.append((1, start, text[start:index]))
+                    start = index + 1
+                else:
+                    stack -= 1
+
+        else:
+            if c == '\\':
+                index += 1
+            elif state == 0:
+
+                if c == '$':
+                    state = 1
+
+            elif state == 1:
+
+                if c == '{':
+                    state = 2
+                    segments.append((0, start, text[start:index-1]))
+                    start = index + 1
+
+        index += 1
+
+    segments.append((0, start, text[start:index]))
+
+    return segments
+
 def char_reader(f):
     # convert a file like object into a character generator
+    # files opened in binary mode, and mmap objects, are decoded as utf-8
+    decoder = None
     buf = f.read(1024)
     while buf:
+        if not isinstance(buf, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            buf = decoder.decode(buf)
         for c in buf:
             yield c
         buf = f.read(1024)
 
+def read_text(seq):
+    # convert a file like object, bytes or a sequence of characters to a string
+    if hasattr(seq, 'read'):
+        seq = seq.read()
+    if isinstance(seq, (bytes, bytearray)):
+        seq = seq.decode("utf-8")
+    elif not isinstance(seq, str):
+        seq = ''.join(seq)
+    return seq
+
 class LexerBase(object):
     """
     base class for a generic look-ahead-by-N lexer
@@ -131,7 +300,11 @@ class LexerBase(object):
             self.g = char_reader(seq)
             self.g_iter = True
         else:
-            self.g = list(seq)
+            if isinstance(seq, (bytes, bytearray)):
+                seq = seq.decode("utf-8")
+            # strings are indexed directly, instead of copying
+            # each character into a list
+            self.g = seq if isinstance(seq, str) else list(seq)
             self.g_iter = False
             self.g_idx = 0
             self.g_len = len(self.g)
@@ -217,11 +390,15 @@ class LexerBase(object):
     def _push(self):
         """ push a new token """
 
+        value = self._gettok()
+        if self._type in interned_types:
+            value = sys.intern(value)
+
         self._prev_token = Token(
             self._type,
             self._initial_line,
             self._initial_index,
-            self._gettok()
+            value
         )
         self.tokens.append(self._prev_token)
         self._type = self._default_type
@@ -242,6 +419,12 @@ class LexerBase(object):
 class Lexer(LexerBase):
     """
     read tokens from a file or string
+
+    options:
+        preserve_documentation: emit T_DOCUMENTATION tokens for /** */ comments
+        engine: "default" to read the input one character at a time, or
+            "regex" to match runs of characters using precompiled
+            regular expressions. Both engines produce identical tokens.
     """
     debug = False
 
@@ -251,11 +434,32 @@ class Lexer(LexerBase):
         if not opts:
             opts = {}
         self.preserve_documentation = opts.get('preserve_documentation', False)
+        self.engine = opts.get('engine', 'default')
+
+        if self.engine not in ('default', 'regex'):
+            raise ValueError("unknown lexer engine: %s" % self.engine)
 
         #if Lexer.debug and 'template_string' not in opts:
         #    print("lexer opts", opts, self.preserve_documentation)
 
     def lex(self, seq):
+        """ return a list of all tokens in the given input
+
+        :param seq: a string, a file like object or an mmap
+        """
+
+        if self.engine == 'regex':
+            seq = read_text(seq)
+            try:
+                self.tokens = []
+                for batch in self._lex_fast(seq):
+                    self.tokens.extend(batch)
+                self._lex_templates(self.tokens)
+                return self.tokens
+            except _FastLexFallback:
+                # the input is malformed. use the default engine to
+                # produce the same error that it would have raised
+                pass
 
         self._init(seq, Token.T_TEXT)
 
@@ -269,8 +473,105 @@ class Lexer(LexerBase):
             tok = Token("", self._line, self._index, "")
             raise LexError(tok, "Unexpected End of Sequence")
 
+        self._lex_templates(self.tokens)
         return self.tokens
 
+    def _lex_templates(self, tokens):
+        """
+        lex the substitutions of every template string in tokens
+
+        the children of a template string are T_STRING tokens for the
+        literal text and T_TEMPLATE_EXPRESSION tokens, which contain the
+        tokens of a substitution. the parser parses the substitutions
+        along with the rest of the module
+        """
+        for token in tokens:
+            if token.type == Token.T_TEMPLATE_STRING:
+                token.children = self._lex_template(token)
+
+    def _lex_template(self, token):
+
+        children = []
+        for is_expr, offset, text in template_segments(token.value[1:-1]):
+            if not text:
+                continue
+            # TODO: technically, these are STRING_LITERALS, not STRINGS
+            # the values are not quoted - they get used in slightly
+            # different ways by the VM (which needs a STRING) and the formatter
+            # (which assumes a literal)
+            type_ = Token.T_TEMPLATE_EXPRESSION if is_expr else Token.T_STRING
+            tok = Token(type_, 1, 0, text)
+            if is_expr:
+                lexer = Lexer({"engine": self.engine})
+                # TODO: column offset may not be perfect
+                lexer._first_token = (token.line, token.index + offset + 1)
+                tok.children = lexer.lex(text)
+            children.append(tok)
+        return children
+
+    def iter_tokens(self, seq, batch_size=1024):
+        """ yield tokens as they are produced
+
+        Unlike lex, the complete list of tokens is never held by the lexer.
+        A file like object or an mmap is read incrementally by the default
+        engine, and is read into a single string by the regex engine. In
+        neither case is the input converted into a list of characters.
+
+        :param seq: a string, a file like object or an mmap
+        :param batch_size: the number of tokens to produce before
+            yielding them to the caller
+        """
+
+        count = 0
+        if self.engine == 'regex':
+            seq = read_text(seq)
+            try:
+                for batch in self._lex_fast(seq, batch_size):
+                    count += len(batch)
+                    self._lex_templates(batch)
+                    yield from batch
+                return
+            except _FastLexFallback:
+                # the input is malformed. use the default engine to
+                # produce the same error that it would have raised
+                pass
+
+        self._init(seq, Token.T_TEXT)
+
+        try:
+            while True:
+
+                try:
+                    c = self._getch()
+                except StopIteration:
+                    break
+
+                self._lex_char(c)
+
+                if len(self.tokens) > batch_size:
+                    # the last two tokens may still be modified
+                    # by the lexer and cannot be yielded yet
+                    batch = self.tokens[:-2]
+                    del self.tokens[:-2]
+                    self._lex_templates(batch)
+                    for token in batch:
+                        if count:
+                            count -= 1
+                        else:
+                            yield token
+
+            self._maybe_push()
+        except StopIteration:
+            tok = Token("", self._line, self._index, "")
+            raise LexError(tok, "Unexpected End of Sequence")
+
+        self._lex_templates(self.tokens)
+        for token in self.tokens:
+            if count:
+                count -= 1
+            else:
+                yield token
+
     def _lex(self):
 
         while True:
@@ -280,123 +581,128 @@ class Lexer(LexerBase):
             except StopIteration:
                 break
 
-            if c == '\n':
-                self._maybe_push()
-                self._push_endl()
+            self._lex_char(c)
 
-            elif c == '/':
-                self._lex_comment()
+        self._maybe_push()
 
-            elif c == '\\':
-                c = self._peekch()
+    def _lex_char(self, c):
+        """ process the next character read from the input stream """
 
-                if c != '\n':
-                    raise self._error("expected newline after '\\'. found '%s'" % c)
+        if c == '\n':
+            self._maybe_push()
+            self._push_endl()
 
-                self._getch()  # consume the newline
+        elif c == '/':
+            self._lex_comment()
 
-            elif c == '\'' or c == '\"' or c == '`':
-                self._lex_string(c)
+        elif c == '\\':
+            c = self._peekch()
 
-            elif c in chset_special1:
-                self._maybe_push()
-                self._putch(c)
-                self._type = Token.T_SPECIAL
-                self._push()
+            if c != '\n':
+                raise self._error("expected newline after '\\'. found '%s'" % c)
 
-            elif c == '*':
-                self._maybe_push()
+            self._getch()  # consume the newline
 
-                # generator keywords mix special charactes and alpha characters
-                # this allows for space between the *, which would normally
-                # be a syntax error
+        elif c == '\'' or c == '\"' or c == '`':
+            self._lex_string(c)
 
-                if len(self.tokens) and self.tokens[-1].value in ('function', 'yield'):
-                    self.tokens[-1].value += c
-                else:
-                    self._putch(c)
-                    self._lex_special2()
+        elif c in chset_special1:
+            self._maybe_push()
+            self._putch(c)
+            self._type = Token.T_SPECIAL
+            self._push()
 
-            elif c == '?':
-                # collect optional chaining operator when a . follows ?
-                # otherwise collect the ternary operator
-                self._maybe_push()
-                self._type = Token.T_SPECIAL
-                self._putch(c)
-                #try:
-                nc = self._peekch()
-                #except StopIteration:
-                #    nc = None
+        elif c == '*':
+            self._maybe_push()
 
-                if nc:
-                    if nc == '.':
-                        self._putch(self._getch())
-                    elif nc == '?':
-                        # collect ?. or ??
-                        self._putch(self._getch())
-                        nc = self._peekch()
-                        if nc == '=':
-                            self._putch(self._getch())
-                    self._push()
-                #else:
-                #    self._push()
+            # generator keywords mix special charactes and alpha characters
+            # this allows for space between the *, which would normally
+            # be a syntax error
 
-            elif c in chset_special2:
-                self._maybe_push()
+            if len(self.tokens) and self.tokens[-1].value in ('function', 'yield'):
+                self.tokens[-1].value += c
+            else:
                 self._putch(c)
                 self._lex_special2()
 
-            elif c == '.':
-                self._maybe_push()
-                self._putch(c)
-
-                try:
+        elif c == '?':
+            # collect optional chaining operator when a . follows ?
+            # otherwise collect the ternary operator
+            self._maybe_push()
+            self._type = Token.T_SPECIAL
+            self._putch(c)
+            #try:
+            nc = self._peekch()
+            #except StopIteration:
+            #    nc = None
+
+            if nc:
+                if nc == '.':
+                    self._putch(self._getch())
+                elif nc == '?':
+                    # collect ?. or ??
+                    self._putch(self._getch())
                     nc = self._peekch()
-                except StopIteration:
-                    nc = None
+                    if nc == '=':
+                        self._putch(self._getch())
+                self._push()
+            #else:
+            #    self._push()
 
-                _pyimport_flag = False
-                if self.tokens and \
-                    self.tokens[-1].type == Token.T_TEXT and \
-                    self.tokens[-1].value == "pyimport":
-                    _pyimport_flag = True
+        elif c in chset_special2:
+            self._maybe_push()
+            self._putch(c)
+            self._lex_special2()
 
-                if (nc and nc == '.') or _pyimport_flag:
-                    self._type = Token.T_SPECIAL
-                    while True:
-                        try:
-                            nc = self._peekch()
-                        except StopIteration:
-                            nc = None
+        elif c == '.':
+            self._maybe_push()
+            self._putch(c)
 
-                        if nc != ".":
-                            break
+            try:
+                nc = self._peekch()
+            except StopIteration:
+                nc = None
 
-                        self._putch(self._getch())
+            _pyimport_flag = False
+            if self.tokens and \
+                self.tokens[-1].type == Token.T_TEXT and \
+                self.tokens[-1].value == "pyimport":
+                _pyimport_flag = True
 
-                    if _pyimport_flag:
-                        self._type = Token.T_SPECIAL_IMPORT
+            if (nc and nc == '.') or _pyimport_flag:
+                self._type = Token.T_SPECIAL
+                while True:
+                    try:
+                        nc = self._peekch()
+                    except StopIteration:
+                        nc = None
 
-                    self._push()
-                elif nc and nc in chset_number_base:
-                    self._lex_number()
-                else:
-                    self._type = Token.T_SPECIAL
-                    self._push()
+                    if nc != ".":
+                        break
 
-            elif not self._tok and c in chset_number_base:
-                self._maybe_push()
-                self._putch(c)
-                self._lex_number()
+                    self._putch(self._getch())
 
-            elif c == ' ' or c == '\t' or ord(c) < 0x20:
-                # ignore white space and ASCII control codes
-                # newline was already processed above
-                self._maybe_push()
+                if _pyimport_flag:
+                    self._type = Token.T_SPECIAL_IMPORT
+
+                self._push()
+            elif nc and nc in chset_number_base:
+                self._lex_number()
             else:
-                self._putch(c)
+                self._type = Token.T_SPECIAL
+                self._push()
 
-        self._maybe_push()
+        elif not self._tok and c in chset_number_base:
+            self._maybe_push()
+            self._putch(c)
+            self._lex_number()
+
+        elif c == ' ' or c == '\t' or ord(c) < 0x20:
+            # ignore white space and ASCII control codes
+            # newline was already processed above
+            self._maybe_push()
+        else:
+            self._putch(c)
 
     def _lex_special2(self):
         """
@@ -480,14 +786,7 @@ class Lexer(LexerBase):
                         utf32 = None
                     if len(utf32) != 8:
                         raise self._error("expected utf32 sequence")
-                    tmp = chr(int(utf32, 16)).encode("utf-16")[2:]
-                    if len(tmp) == 2:
-                        a,b = tmp
-                        utf32 = "u%04X" % (b<<8|a)
-                    else:
-                        a,b,c,d = tmp
-                        # already put the first slash
-                        utf32 = "u%04X\\u%04X" % (b<<8|a, d<<8|c)
+                    utf32 = utf32_to_utf16(utf32)
                     for c in utf32:
                         self._putch(c)
                 else:
@@ -714,6 +1013,425 @@ class Lexer(LexerBase):
             self._error("unknown operator")
         super()._push()
 
+    def _lex_fast(self, text, batch_size=0):
+        """ tokenize a string using the regex engine, yielding lists of tokens
+
+        Runs of characters (labels, numbers, white space, strings,
+        comments and regular expressions) are matched in bulk using
+        precompiled regular expressions. The lexer dispatches on the
+        group matched by the master regex, or on the first character
+        for runs which require special processing. The logic mirrors
+        _lex so that the produced tokens, including line and column
+        information, are identical to the default engine. This includes
+        the positions of tokens which start with '/', which the default
+        engine records after peeking at the following character.
+
+        :param batch_size: if non-zero, yield tokens once more than
+            this number of tokens have been produced. Otherwise a
+            single list containing all tokens is yielded.
+
+        raises _FastLexFallback if the input cannot be tokenized
+        """
+
+        T_TEXT = Token.T_TEXT
+        T_SPECIAL = Token.T_SPECIAL
+        T_NEWLINE = Token.T_NEWLINE
+        T_KEYWORD = Token.T_KEYWORD
+
+        dispatch = _fast_dispatch
+        intern = sys.intern
+        re_text_match = re_text.match
+        re_number_match = re_number.match
+        keywords = reserved_words
+
+        tokens = []
+        append = tokens.append
+        n = len(text)
+        first_line, first_index = self._first_token
+        flush = batch_size or sys.maxsize
+
+        # the positions of every newline in the input, with a sentinel.
+        # `nl_index` is the number of newlines before the current position
+        # and `line_base` is the position where the current line begins
+        newlines = [m.start() for m in re_newline.finditer(text)]
+        newlines.append(n + 1)
+        nl_index = 0
+        nl_next = newlines[0]
+        line_base = -first_index - 1
+
+        def loc(p):
+            """ return the (line, column) of the character at position p """
+            nonlocal nl_index, nl_next, line_base
+            if p < nl_next:
+                if nl_index == 0 or p >= line_base:
+                    return first_line + nl_index, p - line_base
+                # the position is behind the current line
+                i = bisect.bisect_left(newlines, p + 1)
+                base = newlines[i - 1] + 1 if i else -first_index - 1
+                return first_line + i, p - base
+            while nl_next <= p:
+                nl_index += 1
+                line_base = nl_next + 1
+                nl_next = newlines[nl_index]
+            return first_line + nl_index, p - line_base
+
+        # the current token, which may be extended across multiple runs
+        tok = []
+        tok_type = T_TEXT
+        tok_line = -1
+        tok_index = -1
+
+        def push():
+            nonlocal tok, tok_type, tok_line, tok_index
+            t = ''.join(tok)
+            if tok_type == T_TEXT and t in keywords:
+                tok_type = T_KEYWORD
+            if tok_type == T_SPECIAL and t not in operators3:
+                raise _FastLexFallback()
+            if tok_type in interned_types:
+                t = intern(t)
+            append(Token(tok_type, tok_line, tok_index, t))
+            tok = []
+            tok_type = T_TEXT
+            tok_line = -1
+            tok_index = -1
+
+        def push_endl(p):
+            nonlocal tok_type
+            if tokens and tokens[-1].type == T_NEWLINE:
+                return
+            append(Token(T_NEWLINE, loc(p)[0], 0, ""))
+            tok_type = T_TEXT
+
+        def prev():
+            i = len(tokens) - 1
+            while i >= 0:
+                if tokens[i].type != T_NEWLINE:
+                    return tokens[i]
+                i -= 1
+            return None
+
+        def special2(q):
+            """ break a sequence of special characters into operators """
+            nonlocal tok_type, tok_line, tok_index
+            tok_type = T_SPECIAL
+            while True:
+                nc = text[q] if q < n else None
+                if nc is not None and nc in chset_special2:
+                    if nc == "/":
+                        return q
+                    if ''.join(tok) + nc not in operators3:
+                        push()
+                        tok_type = T_SPECIAL
+                    if not tok:
+                        tok_line, tok_index = loc(q)
+                    tok.append(nc)
+                    q += 1
+                    if ''.join(tok) in operators2:
+                        push()
+                        tok_type = T_SPECIAL
+                else:
+                    if tok:
+                        push()
+                    tok_type = T_TEXT
+                    return q
+
+        pos = 0
+        scan = re_master.scanner(text).match
+        while True:
+            if len(tokens) > flush:
+                # the last two tokens may still be modified
+                # by the lexer and cannot be yielded yet
+                batch = tokens[:-2]
+                del tokens[:-2]
+                yield batch
+
+            m = scan()
+            group = m.lastindex
+            if group is None:
+                # end of input
+                break
+            start, end = m.span(group)
+            if tok and start != pos:
+                # white space terminates the current token
+                push()
+
+            if group == _G_LABEL:
+                if tok:
+                    tok.append(text[start:end])
+                elif end < n and text[end] == '\\':
+                    # the label may be continued on the next line
+                    tok_line, tok_index = loc(start)
+                    tok.append(text[start:end])
+                else:
+                    if start >= nl_next:
+                        tok_line, tok_index = loc(start)
+                    else:
+                        tok_line, tok_index = first_line + nl_index, start - line_base
+                    value = intern(text[start:end])
+                    if tok_type == T_TEXT:
+                        type_ = T_KEYWORD if value in keywords else T_TEXT
+                        append(Token(type_, tok_line, tok_index, value))
+                    else:
+                        tok.append(value)
+                        push()
+                pos = end
+                continue
+
+            if group == _G_SPECIAL1 or group == _G_OPERATOR:
+                if tok:
+                    push()
+                if start >= nl_next:
+                    line, index = loc(start)
+                else:
+                    line, index = first_line + nl_index, start - line_base
+                append(Token(T_SPECIAL, line, index, text[start]))
+                tok_type = T_TEXT
+                pos = end
+                continue
+
+            if group == _G_NEWLINE:
+                if tok:
+                    push()
+                push_endl(start)
+                pos = end
+                continue
+
+            if group == _G_NUMBER and not tok:
+                line, index = loc(start)
+                append(Token(Token.T_NUMBER, line, index, text[start:end]))
+                tok_type = T_TEXT
+                pos = end
+                continue
+
+            if group == _G_STRING:
+                if tok:
+                    push()
+                c = text[start]
+                prev_tok = prev()
+                if prev_tok and \
+                   prev_tok.value and \
+                   prev_tok.value[-1] == c:
+                    # merge consecutive strings of the same type
+                    prev_tok.value = prev_tok.value[:-1] + text[start + 1:end]
+                else:
+                    line, index = loc(start)
+                    type_ = Token.T_TEMPLATE_STRING if c == '`' else Token.T_STRING
+                    append(Token(type_, line, index, text[start:end]))
+                tok_type = T_TEXT
+                pos = end
+                continue
+
+            if group == _G_DOT or group == _G_QUESTION:
+                if tok:
+                    push()
+                line, index = loc(start)
+                type_ = T_SPECIAL
+                if group == _G_DOT and tokens and \
+                   tokens[-1].type == T_TEXT and \
+                   tokens[-1].value == "pyimport":
+                    type_ = Token.T_SPECIAL_IMPORT
+                append(Token(type_, line, index, text[start]))
+                tok_type = T_TEXT
+                pos = end
+                continue
+
+            if group == _G_COMMENT:
+                if tok:
+                    push()
+                pos = end
+                continue
+
+            # slow path: characters which may begin a run of
+            # special characters or that depend on the previous token.
+            pos = start
+            c = text[pos]
+            kind = dispatch[c]
+
+            if kind == _K_DIGIT:
+                # digits continue the current token
+                end = re_text_match(text, pos).end()
+                tok.append(text[pos:end])
+                pos = end
+
+            elif kind == _K_STRING:
+                if tok:
+                    push()
+                line, index = loc(pos)
+                body = re_string[c]
+                parts = [c]
+                q = pos + 1
+                while True:
+                    m = body.match(text, q)
+                    parts.append(m.group())
+                    q = m.end()
+                    if q >= n:
+                        raise _FastLexFallback()
+                    nc = text[q]
+                    if nc == c:
+                        parts.append(c)
+                        q += 1
+                        break
+                    elif nc == '\n':
+                        raise _FastLexFallback()
+                    # an escape sequence
+                    if q + 1 >= n:
+                        raise _FastLexFallback()
+                    nc = text[q + 1]
+                    if nc == '\n':
+                        q += 2
+                    elif nc == 'U':
+                        if q + 10 > n:
+                            raise _FastLexFallback()
+                        try:
+                            parts.append('\\' + utf32_to_utf16(text[q + 2:q + 10]))
+                        except ValueError:
+                            raise _FastLexFallback()
+                        q += 10
+                    else:
+                        parts.append(text[q:q + 2])
+                        q += 2
+                value = ''.join(parts)
+                prev_tok = prev()
+                if prev_tok and \
+                   prev_tok.value and \
+                   prev_tok.value[-1] == c:
+                    # merge consecutive strings of the same type
+                    prev_tok.value = prev_tok.value[:-1] + value[1:]
+                else:
+                    type_ = Token.T_TEMPLATE_STRING if c == '`' else Token.T_STRING
+                    append(Token(type_, line, index, value))
+                tok_type = T_TEXT
+                pos = q
+
+            elif kind == _K_SLASH:
+                if tok:
+                    push()
+                if pos + 1 >= n:
+                    raise _FastLexFallback()
+                nc = text[pos + 1]
+                if nc == '/':
+                    q = text.find('\n', pos + 2)
+                    if q < 0:
+                        pos = n
+                    else:
+                        push_endl(q)
+                        pos = q + 1
+                elif nc == '=':
+                    tok_line, tok_index = loc(pos + 1)
+                    tok.append('/')
+                    pos = special2(pos + 1)
+                elif nc == '*':
+                    if pos + 2 >= n:
+                        raise _FastLexFallback()
+                    if text[pos + 2] == '*' and self.preserve_documentation:
+                        q = text.find('*/', pos + 2)
+                        if q < 0:
+                            raise _FastLexFallback()
+                        line, index = loc(pos + 2)
+                        append(Token(Token.T_DOCUMENTATION, line, index, text[pos:q + 2]))
+                        tok_type = T_TEXT
+                    else:
+                        q = text.find('*/', pos + 1)
+                        if q < 0:
+                            raise _FastLexFallback()
+                    pos = q + 2
+                elif not Token.basicType(prev()):
+                    m = re_regex.match(text, pos + 1)
+                    if m is None:
+                        raise _FastLexFallback()
+                    tok_line, tok_index = loc(pos + 1)
+                    tok.append(text[pos:m.end()])
+                    tok_type = Token.T_REGEX
+                    pos = m.end()
+                else:
+                    line, index = loc(pos + 1)
+                    append(Token(T_SPECIAL, line, index, '/'))
+                    tok_type = T_TEXT
+                    pos += 1
+
+            elif kind == _K_BACKSLASH:
+                # a line continuation
+                if pos + 1 >= n or text[pos + 1] != '\n':
+                    raise _FastLexFallback()
+                pos += 2
+
+            elif kind == _K_STAR:
+                if tok:
+                    push()
+                if tokens and tokens[-1].value in ('function', 'yield'):
+                    tokens[-1].value += c
+                    pos += 1
+                else:
+                    tok_line, tok_index = loc(pos)
+                    tok.append(c)
+                    pos = special2(pos + 1)
+
+            elif kind == _K_QUESTION:
+                if tok:
+                    push()
+                if pos + 1 >= n:
+                    raise _FastLexFallback()
+                line, index = loc(pos)
+                nc = text[pos + 1]
+                if nc == '.':
+                    value = '?.'
+                elif nc == '?':
+                    if pos + 2 >= n:
+                        raise _FastLexFallback()
+                    value = '??=' if text[pos + 2] == '=' else '??'
+                else:
+                    value = '?'
+                append(Token(T_SPECIAL, line, index, value))
+                tok_type = T_TEXT
+                pos += len(value)
+
+            elif kind == _K_SPECIAL2:
+                if tok:
+                    push()
+                tok_line, tok_index = loc(pos)
+                tok.append(c)
+                pos = special2(pos + 1)
+
+            else:  # _K_DOT
+                if tok:
+                    push()
+                line, index = loc(pos)
+                nc = text[pos + 1] if pos + 1 < n else None
+                pyimport = tokens and \
+                    tokens[-1].type == T_TEXT and \
+                    tokens[-1].value == "pyimport"
+                if nc == '.' or pyimport:
+                    q = pos + 1
+                    while q < n and text[q] == '.':
+                        q += 1
+                    value = text[pos:q]
+                    if pyimport:
+                        type_ = Token.T_SPECIAL_IMPORT
+                    elif value not in operators3:
+                        raise _FastLexFallback()
+                    else:
+                        type_ = T_SPECIAL
+                    pos = q
+                elif nc is not None and nc in chset_number_base:
+                    end = re_number_match(text, pos + 1).end()
+                    value = text[pos:end]
+                    type_ = Token.T_NUMBER
+                    pos = end
+                else:
+                    value = '.'
+                    type_ = T_SPECIAL
+                    pos += 1
+                append(Token(type_, line, index, value))
+                tok_type = T_TEXT
+
+            scan = re_master.scanner(text, pos).match
+
+        if tok:
+            push()
+
+        yield tokens
+
 Lexer.reserved_words = {*reserved_words, *reserved_words_extra}
 
 
@@ -12,10 +12,11 @@ imports are complicated
 """
 import sys
 import ast
-from .lexer import Lexer, Token, TokenError, reserved_types
+from .lexer import Lexer, Token, TokenError, reserved_types, template_segments
 from .transform import TransformGrouping, \
     TransformFlatten, TransformOptionalChaining, \
-    TransformMagicConstants, TransformRemoveSemicolons, TransformBase
+    TransformMagicConstants, TransformRemoveSemicolons, TransformBase, \
+    TransformPipeline
 import traceback
 
 class ParseError(TokenError):
@@ -34,10 +35,16 @@ def prefix_count(text, char):
     return count
 
 class TransformTemplateString(TransformBase):
+    """
+    parse the substitutions of template strings which were not lexed
+    by the Lexer. see Lexer._lex_templates and ParserBase.group_template
+    """
+
+    visit_types = {Token.T_TEMPLATE_STRING}
 
     def visit(self, token, parent):
 
-        if token.type == Token.T_TEMPLATE_STRING:
+        if token.type == Token.T_TEMPLATE_STRING and not token.children:
             segments = self.parse_string(token)
 
             tokens = []
@@ -65,54 +72,20 @@ class TransformTemplateString(TransformBase):
         """
         parse a template string and get the text and expression segments
         """
-        segments = []
-        text = token.value[1:-1]
-        index=0
-        state = 0
-        start = 0
-        stack = 0
-        while index < len(text):
-            c = text[index]
-
-            if state == 2:
-                if c == '{':
-                    stack += 1
-
-                elif c == '}':
-                    if stack == 0:
-                        state = 0
-                        segments.append((1, start, text[start:index]))
-                        start = index + 1
-                    else:
-                        stack -= 1
-
-            else:
-                if c == '\\':
-                    index += 1
-                elif state == 0:
-
-                    if c == '$':
-                        state = 1
-
-                elif state == 1:
-
-                    if c == '{':
-                        state = 2
-                        segments.append((0, start, text[start:index-1]))
-                        start = index + 1
-
-            index += 1
-
-        segments.append((0, start, text[start:index]))
-
-        return segments
+        return template_segments(token.value[1:-1])
 
 class ParserBase(object):
 
+    # names of precedence callbacks which ignore tokens that are not
+    # one of the operators given for the precedence level
+    operator_callbacks = set()
+
     def __init__(self):
         super(ParserBase, self).__init__()
 
         self.precedence = []
+        self._scan_source = None
+        self._scan_table = []
 
         self.token_input_grouping_type = Token.T_SPECIAL
         self.token_output_grouping_type = Token.T_GROUPING
@@ -120,33 +93,140 @@ class ParserBase(object):
 
     def parse(self, tokens):
 
+        children = self.group(tokens)
+
+        mod = Token(self.token_ast_type, 0, 0, "", children)
+        self.scan(mod)
+
+        return mod
+
+    def group(self, tokens):
+        """
+        group the tokens between matching brackets and scan each group.
+        returns the sequence of tokens which are not inside of any group
+        """
+
         pairs = {
             '(': ')',
             '[': ']',
             '{': '}',
         }
-
-        # iterate in reverse looking for the opening symbol
-        # then perform a forward scan to find it's matching pair
-        index = len(tokens) - 1
-        while index >= 0:
-            token = tokens[index]
-            if token.type == self.token_input_grouping_type and token.value in pairs:
-                self.grouping(tokens, index, token.value, pairs[token.value])
-                self.scan(token)
-            if token.type == self.token_input_grouping_type and token.value == "<":
-                self.group_generic(tokens, index)
-            index -= 1
-
         closers = set(pairs.values())
+
+        input_type = self.token_input_grouping_type
+        output_type = self.token_output_grouping_type
+
+        # group tokens in a single forward pass. each opening symbol pushes
+        # the sequence being built onto the stack and starts a new sequence
+        # for its children. the matching closing symbol completes the group
+        # and appends it to the enclosing sequence. nested groups are always
+        # complete, and scanned, before the group which contains them.
+        # generics are resolved, right to left, once the sequence
+        # containing them is complete
+        stack = []
+        children = []
+        generics = []
+        # the iterator is shared with _group_span, which consumes
+        # the tokens of a deferred group
+        tokens = iter(tokens)
         for token in tokens:
+            if token.type == input_type:
+                value = token.value
+                if value in pairs:
+                    if self.defer_group(children, token):
+                        span = self._group_span(token, tokens, pairs[value])
+                        children.append(self.deferred_group(token, span))
+                        continue
+                    stack.append((token, children, generics))
+                    children = []
+                    generics = []
+                    continue
+                elif value in closers and stack:
+                    current, parent, parent_generics = stack.pop()
+                    close = pairs[current.value]
+                    if value != close:
+                        raise ParseError(current, "matching %s not found" % close)
+                    for index in reversed(generics):
+                        self.group_generic(children, index)
+                    current.type = output_type
+                    current.value += close
+                    current.children = children
+                    self.scan(current)
+                    children = parent
+                    generics = parent_generics
+                    children.append(current)
+                    continue
+                elif value == "<":
+                    generics.append(len(children))
+            elif token.type == Token.T_TEMPLATE_STRING and token.children:
+                self.group_template(token)
+            children.append(token)
+
+        if stack:
+            current = stack[-1][0]
+            raise ParseError(current, "matching %s not found" % pairs[current.value])
+
+        for index in reversed(generics):
+            self.group_generic(children, index)
+
+        for token in children:
             if token.type == Token.T_SPECIAL and token.value in closers:
                 raise ParseError(token, "unopened grouping")
 
-        mod = Token(self.token_ast_type, 0, 0, "", tokens)
-        self.scan(mod)
+        return children
 
-        return mod
+    def group_template(self, token):
+        """
+        parse the substitutions of a template string, which were lexed
+        along with the template string. each substitution is parsed as
+        if it were a module
+        """
+        for child in token.children:
+            if child.type == Token.T_TEMPLATE_EXPRESSION:
+                child.children = self.group(child.children)
+                child.type = self.token_ast_type
+                self.scan(child)
+                child.type = Token.T_TEMPLATE_EXPRESSION
+
+    def _group_span(self, current, tokens, close):
+        """
+        consume tokens from the iterator up to the bracket which closes
+        current. the tokens are returned without grouping them
+        """
+        input_type = self.token_input_grouping_type
+        span = []
+        depth = 1
+        for token in tokens:
+            if token.type == input_type:
+                if token.value in ("(", "[", "{"):
+                    depth += 1
+                elif token.value in (")", "]", "}"):
+                    depth -= 1
+                    if depth == 0:
+                        if token.value != close:
+                            break
+                        return span
+            span.append(token)
+        raise ParseError(current, "matching %s not found" % close)
+
+    def defer_group(self, children, token):
+        """
+        return True if the group opened by token should not be parsed
+        until it is used. children is the enclosing sequence, up to token
+        """
+        return False
+
+    def deferred_group(self, token, span):
+        """
+        return a token for a group which has not been parsed.
+        span is the tokens between the brackets, which have not been
+        grouped. by default the group is parsed immediately
+        """
+        token.type = self.token_output_grouping_type
+        token.value += {"(": ")", "[": "]", "{": "}"}[token.value]
+        token.children = self.group(span)
+        self.scan(token)
+        return token
 
     def group_generic(self, tokens, index):
         # https://www.typescriptlang.org/docs/handbook/2/generics.html
@@ -229,13 +309,11 @@ class ParserBase(object):
         grp = tokens[index]
         grp.type = Token.T_GENERIC
         grp.value = "<>"
-        tokens.pop(success)
-        for i in reversed(range(index+1, success)):
-            grp.children.insert(0, tokens.pop(i))
+        grp.children[:0] = tokens[index+1:success]
 
         # TODO: should grp be added as a child of index-1?
 
-        tokens.pop(index)
+        del tokens[index:success+1]
 
     def grouping(self, tokens, index, open, close):
         current = tokens[index]
@@ -273,17 +351,83 @@ class ParserBase(object):
         the precedence decides how tokens combine together
         """
 
-        for direction, callback, operators in self.precedence:
+        if self._scan_source is not self.precedence:
+            self._scan_table = self._build_scan_table()
+            self._scan_source = self.precedence
 
-            i = 0
-            while i < len(token.children):
+        for direction, callback, operators, trigger in self._scan_table:
 
-                if direction < 0:
-                    j = len(token.children) - i - 1
+            if trigger is not None:
+                # the callback only consumes tokens with a value found
+                # in the set of operators. skip the level entirely
+                # when no token would be consumed
+                for child in token.children:
+                    if child.value in trigger:
+                        break
                 else:
-                    j = i
+                    continue
+
+            if direction == 0:
+                # the callback processes the entire sequence in one call
+                callback(token, token.children, 0, operators)
+            else:
+                self._scan_level(token, direction, callback, operators, trigger)
+
+    def _scan_level(self, token, direction, callback, operators, trigger=None):
+        """
+        apply the callback for a single precedence level to each token
+        """
+
+        i = 0
+        while i < len(token.children):
 
-                i += callback(token, token.children, j, operators)
+            if direction < 0:
+                j = len(token.children) - i - 1
+            else:
+                j = i
+
+            if trigger is not None and token.children[j].value not in trigger:
+                i += 1
+                continue
+
+            i += callback(token, token.children, j, operators)
+
+    def _build_scan_table(self):
+        """
+        precompute the table used by scan for each precedence level
+
+        operator_callbacks names the callbacks which return 1 for any
+        token with a value that is not in the list of operators. For
+        those levels a set of the operators is used to avoid calling
+        the callback for every token.
+        """
+
+        table = []
+        for direction, callback, operators in self.precedence:
+            trigger = None
+            if operators and callback.__name__ in self.operator_callbacks:
+                trigger = frozenset(operators)
+            table.append((direction, callback, operators, trigger))
+        return table
+
+# precedence callbacks which combine a binary operator with the tokens
+# immediately before and after it. the pratt engine merges consecutive
+# precedence levels which use these callbacks
+_binary_callbacks = {"visit_binary", "visit_math_mul"}
+
+# token types assigned by visit_binary, by operator
+_binary_types = {
+    'instanceof': Token.T_INSTANCE_OF,
+    '&&': Token.T_LOGICAL_AND,
+    '||': Token.T_LOGICAL_OR,
+    '??': Token.T_NULLISH_COALESCING,
+}
+
+# token classes used by visit_binary_climb
+_K_OPERAND = 0
+_K_OPERATOR = 1
+_K_SEPARATOR = 2
+_K_NEWLINE = 3
 
 def xform_apply_file(mod, filepath):
 
@@ -293,6 +437,49 @@ def xform_apply_file(mod, filepath):
         seq.extend(child.children)
         child.file = filepath
 
+_token_children = Token.children
+
+class LazyToken(Token):
+    """
+    a function body which is parsed the first time its children are used
+
+    the unparsed tokens of the body are kept with the parser which
+    created them. the result of accessing the children is the same as
+    if the body had been parsed along with the rest of the module
+    """
+
+    # stages of a LazyToken, which are set by the parser
+    PARSE = 0     # the module is being parsed: group and scan the body
+    HIDDEN = 1    # the module is being transformed: the body is empty
+    COMPLETE = 2  # parse and transform the body
+
+    __slots__ = ('_lazy',)
+
+    def __init__(self, parser, span, type, line=0, index=0, value="", file=None):
+        super(LazyToken, self).__init__(type, line, index, value, None, file)
+        self._lazy = [parser, span, LazyToken.PARSE]
+
+    @property
+    def children(self):
+        lazy = self._lazy
+        if lazy is not None:
+            if lazy[2] == LazyToken.HIDDEN:
+                return ()
+            lazy[0].parse_lazy(self)
+        return _token_children.__get__(self)
+
+    @children.setter
+    def children(self, children):
+        _token_children.__set__(self, children)
+        self._lazy = None
+
+    def isParsed(self):
+        return self._lazy is None
+
+    def unparsedTokens(self):
+        """ return the tokens of the body, or an empty list once parsed """
+        return self._lazy[1] if self._lazy is not None else []
+
 class Parser(ParserBase):
 
     W_BRANCH_FALSE = 1
@@ -306,6 +493,20 @@ class Parser(ParserBase):
     W_GROUPING = 9
     W_ELSE_UNSAFE = 10
 
+    operator_callbacks = {
+        "visit_mutable_prefix",
+        "visit_unary_postfix",
+        "visit_unary_prefix",
+        "visit_prefix",
+        "visit_unary",
+        "visit_generic_lambda",
+        "visit_binary",
+        "visit_math_mul",
+        "visit_colon",
+        "visit_import_as",
+        "visit_comma",
+    }
+
     def __init__(self):
         super(Parser, self).__init__()
 
@@ -385,27 +586,174 @@ class Parser(ParserBase):
         self.feat_xform_optional_chaining = True
         #self.feat_xform_null_coalescing = True
 
+        # 'default': apply each precedence level in turn
+        # 'pratt': combine the binary operator precedence levels in a
+        #          single precedence climbing pass
+        self.engine = "default"
+
+        # when true, the bodies of functions and methods are parsed the
+        # first time the children of the body are accessed. see LazyToken
+        self.lazy_functions = False
+        self._lazy_tokens = []
+
+        # additional transforms applied after the parser transforms, in
+        # the same traversals when possible. see TransformPipeline
+        self.transforms = []
+
+        # a dictionary to accumulate the time spent in each transform
+        self.transform_timings = None
+
         self._offset = 0  # used by consume in the negative direction
 
+    def _build_scan_table(self):
+        """
+        the pratt engine replaces each run of consecutive binary operator
+        precedence levels with a single call to visit_binary_climb
+        """
+
+        table = super()._build_scan_table()
+
+        if self.engine == "default":
+            return table
+
+        if self.engine != "pratt":
+            raise ValueError("unknown parser engine: %s" % self.engine)
+
+        merged = []
+        group = []
+        for entry in table + [None]:
+            if entry is not None and entry[1].__name__ in _binary_callbacks:
+                group.append(entry)
+                continue
+
+            if len(group) > 1:
+                operators = {}
+                for prec, (direction, callback, ops, _) in enumerate(group):
+                    for op in ops:
+                        if op not in operators:
+                            operators[op] = (prec, direction < 0, callback.__name__)
+                trigger = frozenset(operators)
+                merged.append((0, self.visit_binary_climb, (group, operators), trigger))
+            else:
+                merged.extend(group)
+            group = []
+
+            if entry is not None:
+                merged.append(entry)
+
+        return merged
+
     def parse(self, tokens, source_file=None):
 
+        self._lazy_tokens = []
+
         mod = super().parse(tokens)
 
-        TransformGrouping().transform(mod)
-        TransformRemoveSemicolons().transform(mod)
-        TransformFlatten().transform(mod)
+        self._transform_lazy(mod)
+
+        return mod
+
+    def _transform(self, mod):
+
+        xforms = [
+            TransformGrouping(),
+            TransformRemoveSemicolons(),
+            TransformFlatten(),
+        ]
         if self.feat_xform_optional_chaining:
-            TransformOptionalChaining().transform(mod)
+            xforms.append(TransformOptionalChaining())
         #if self.feat_xform_null_coalescing:
-        #    TransformNullCoalescing().transform(mod)
-        TransformMagicConstants().transform(mod)
+        #    xforms.append(TransformNullCoalescing())
+        xforms.append(TransformMagicConstants())
 
         # the template transform is last because it recursively uses the parser
-        TransformTemplateString().transform(mod)
+        xforms.append(TransformTemplateString())
 
+        xforms.extend(self.transforms)
 
+        TransformPipeline(xforms, self.transform_timings).transform(mod)
 
-        return mod
+    def _transform_lazy(self, mod):
+        """
+        apply the transforms to mod, excluding the deferred function
+        bodies created while parsing mod. the bodies are transformed
+        when they are parsed
+        """
+
+        lazy_tokens = self._lazy_tokens
+        self._lazy_tokens = []
+
+        for token in lazy_tokens:
+            if token._lazy is not None:
+                token._lazy[2] = LazyToken.HIDDEN
+
+        self._transform(mod)
+
+        for token in lazy_tokens:
+            if token._lazy is not None:
+                token._lazy[2] = LazyToken.COMPLETE
+
+    def defer_group(self, children, token):
+
+        if not self.lazy_functions or token.value != "{":
+            return False
+
+        # function () { ... }, or a function or method with a name:
+        # function name() { ... } or name() { ... }
+        # a newline between the arguments and the body is not supported
+        n = len(children)
+        if n < 2:
+            return False
+        arglist = children[-1]
+        if arglist.type != Token.T_GROUPING or arglist.value != "()":
+            return False
+        name = children[-2]
+        if name.type == Token.T_TEXT:
+            return True
+        return name.type == Token.T_KEYWORD and name.value in ("function", "function*")
+
+    def deferred_group(self, token, span):
+
+        group = LazyToken(self, span, self.token_output_grouping_type,
+            token.line, token.index, "{}", token.file)
+        self._lazy_tokens.append(group)
+        return group
+
+    def parse_lazy(self, token):
+        """
+        parse the body of a LazyToken
+
+        while the module is being parsed only the grouping and scan
+        are performed, the module transforms are applied to the body
+        when the module is transformed. once the module is complete
+        the body is parsed and transformed.
+        """
+
+        _, span, stage = token._lazy
+
+        # the body may be parsed from within a precedence callback
+        offset = self._offset
+
+        outer_tokens = self._lazy_tokens
+        if stage == LazyToken.COMPLETE:
+            self._lazy_tokens = []
+
+        children = self.group(span)
+
+        # scan the body as it was found by group
+        type_, value = token.type, token.value
+        token.children = children
+        token.type = self.token_output_grouping_type
+        token.value = "{}"
+        self.scan(token)
+        token.type = type_
+        token.value = value
+
+        if stage == LazyToken.COMPLETE:
+            self._transform_lazy(token)
+            self._lazy_tokens = outer_tokens
+
+        self._offset = offset
 
     def warn(self, token, type, message=None):
         """
@@ -517,6 +865,7 @@ class Parser(ParserBase):
 
     def consume_keyword(self, tokens, token, index, direction, maybe=False):
         # TODO: this should be changed to only accept keywords
+        self._offset = 0
         index_tok1 = index + direction
         while 0 <= index_tok1 < len(tokens):
             tok1 = tokens[index_tok1]
@@ -527,6 +876,9 @@ class Parser(ParserBase):
                 break
             elif tok1.type == Token.T_NEWLINE:
                 tokens.pop(index_tok1)
+                if direction < 0:
+                    self._offset += direction
+                    index_tok1 += direction
             else:
                 return tokens.pop(index_tok1)
 
@@ -1185,6 +1537,142 @@ class Parser(ParserBase):
 
         return self._offset
 
+    def visit_binary_climb(self, parent, tokens, index, operators):
+        """
+        combine the binary operators of several consecutive precedence
+        levels in a single pass using precedence climbing
+
+        operators is a pair (levels, table). levels is the list of
+        precedence levels that were merged, and table maps an operator
+        to its precedence, associativity and the callback for that level.
+
+        The result is identical to applying visit_binary and
+        visit_math_mul for each level in turn: the operands of an operator
+        are the tokens immediately before and after it, which have already
+        been reduced by the higher precedence levels. When the sequence is
+        not a well formed series of operands and operators, the levels are
+        applied in turn instead, which also raises the same errors.
+        """
+
+        levels, table = operators
+
+        # classify each token as an operand, operator, separator or newline
+        kinds = []
+        prev_kind = _K_SEPARATOR
+        prev_tok = None
+        newline = False
+        for tok in tokens:
+            type_ = tok.type
+            if type_ == Token.T_NEWLINE:
+                kinds.append(_K_NEWLINE)
+                newline = True
+                continue
+
+            value = tok.value
+            kind = _K_OPERAND
+            if type_ == Token.T_SPECIAL and (value == ';' or value == ','):
+                kind = _K_SEPARATOR
+            elif (type_ == Token.T_SPECIAL or type_ == Token.T_KEYWORD) and value in table:
+                kind = _K_OPERATOR
+                if value == '*' and prev_kind != _K_SEPARATOR:
+                    # javascript style module imports: import * as alias
+                    is_mul = table[value][2] == "visit_math_mul"
+                    if prev_tok.type == Token.T_KEYWORD and prev_tok.value == 'import' or \
+                       is_mul and prev_tok.value == 'export':
+                        kind = _K_OPERAND
+
+            if kind == _K_OPERATOR:
+                if prev_kind != _K_OPERAND:
+                    return self._visit_binary_levels(parent, levels)
+                if table[value][2] == "visit_math_mul" and prev_tok.type == Token.T_KEYWORD:
+                    return self._visit_binary_levels(parent, levels)
+            elif prev_kind == _K_OPERATOR:
+                if kind != _K_OPERAND:
+                    return self._visit_binary_levels(parent, levels)
+                _, right, callback = table[prev_tok.value]
+                if callback == "visit_math_mul" and type_ == Token.T_KEYWORD:
+                    return self._visit_binary_levels(parent, levels)
+                if right and newline:
+                    # scanning right to left, a newline removed from the
+                    # rhs of an operator causes the next token to be skipped
+                    return self._visit_binary_levels(parent, levels)
+
+            kinds.append(kind)
+            prev_kind = kind
+            prev_tok = tok
+            newline = False
+
+        if prev_kind == _K_OPERATOR:
+            return self._visit_binary_levels(parent, levels)
+
+        output = []
+        newlines = []
+        operands = []
+        stack = []
+        prev_kind = _K_SEPARATOR
+
+        def reduce():
+            op = stack.pop()
+            rhs = operands.pop()
+            lhs = operands.pop()
+            op.children.append(lhs)
+            op.children.append(rhs)
+            op.type = _binary_types.get(op.value, Token.T_BINARY) \
+                if table[op.value][2] == "visit_binary" else Token.T_BINARY
+            operands.append(op)
+
+        for tok, kind in zip(tokens, kinds):
+
+            if kind == _K_NEWLINE:
+                newlines.append(tok)
+                continue
+
+            if kind == _K_OPERATOR:
+                # newlines between an operator and the operand are removed
+                newlines = []
+                prec, right, _ = table[tok.value]
+                while stack:
+                    top = table[stack[-1].value][0]
+                    if top < prec or (top == prec and not right):
+                        reduce()
+                    else:
+                        break
+                stack.append(tok)
+
+            elif prev_kind == _K_OPERATOR:
+                # the rhs of the previous operator
+                newlines = []
+                operands.append(tok)
+
+            else:
+                # the token does not continue the current expression
+                while stack:
+                    reduce()
+                output.extend(operands)
+                output.extend(newlines)
+                operands = []
+                newlines = []
+                if kind == _K_OPERAND:
+                    operands.append(tok)
+                else:
+                    output.append(tok)
+
+            prev_kind = kind
+
+        while stack:
+            reduce()
+        output.extend(operands)
+        output.extend(newlines)
+
+        tokens[:] = output
+
+        return 1
+
+    def _visit_binary_levels(self, parent, levels):
+        for direction, callback, operators, trigger in levels:
+            self._scan_level(parent, direction, callback, operators, trigger)
+        return 1
+
     def visit_colon(self, parent, tokens, index, operators):
         """
         parse colon separated pairs,
@@ -0,0 +1,393 @@
+
+"""
+find the import and export declarations of a source file without parsing
+
+the source is tokenized using the regex engine of the lexer, and only
+the statements at the top level of the file which begin with import,
+from, include, export, $import or $include are examined. the result
+has the same form as getModuleImportExport, which requires the complete
+ast. this allows the module graph to be discovered before any file is
+parsed.
+
+the scanner does not validate the syntax of a file. a file which can
+not be parsed may produce a result, the error is reported when the
+file is loaded.
+"""
+
+import ast
+
+from .lexer import Lexer
+from .token import Token
+from .transform import TransformError
+
+_open = ("(", "[", "{")
+_close = (")", "]", "}")
+
+class ImportExportScanner(object):
+
+    def __init__(self):
+        super(ImportExportScanner, self).__init__()
+
+        self.tokens = []
+        self.imports = {}
+        self.module_imports = {}
+        self.exports = []
+
+    def scan(self, source):
+        """
+        returns:
+            imports         - a dictionary for file_path => dict of included names
+            module_imports  - a dictionary for module_name => dict of included names
+            exports         - list of exported names
+        """
+
+        self.tokens = Lexer({"engine": "regex"}).lex(source)
+        self.imports = {}
+        self.module_imports = {}
+        self.exports = []
+
+        tokens = self.tokens
+        depth = 0
+        start = True
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            type_ = token.type
+            value = token.value
+
+            if type_ == Token.T_NEWLINE:
+                start = depth == 0
+                i += 1
+                continue
+
+            if type_ == Token.T_SPECIAL:
+                if value in _open:
+                    depth += 1
+                elif value in _close:
+                    depth -= 1
+                # a statement also ends with a block, such as the
+                # body of a function, class or if statement
+                start = depth == 0 and value in (";", "}")
+                i += 1
+                continue
+
+            if start:
+                start = False
+                if type_ == Token.T_KEYWORD:
+                    if value == "import":
+                        i = self._import(i)
+                        continue
+                    if value == "export":
+                        i = self._export(i)
+                        continue
+                elif type_ == Token.T_TEXT:
+                    if value == "from":
+                        i = self._from(i)
+                        continue
+                    if value == "include":
+                        i = self._include(i + 1)
+                        continue
+                    if value in ("$include", "$import") and self._special(i + 1, "("):
+                        i = self._call(i)
+                        continue
+
+            start = False
+            i += 1
+
+        return self.imports, self.module_imports, self.exports
+
+    def _get(self, index):
+        if index < len(self.tokens):
+            return self.tokens[index]
+        return None
+
+    def _special(self, index, value):
+        token = self._get(index)
+        return token is not None and token.type == Token.T_SPECIAL and token.value == value
+
+    def _text(self, index, value=None):
+        token = self._get(index)
+        return token is not None and token.type == Token.T_TEXT and \
+            (value is None or token.value == value)
+
+    def _string(self, index):
+        token = self._get(index)
+        if token is not None and token.type == Token.T_STRING:
+            return ast.literal_eval(token.value)
+        return None
+
+    def _name(self, index):
+        """
+        returns the index after a dotted name, or a string, and the name
+        """
+        name = self._string(index)
+        if name is not None:
+            return index + 1, name
+
+        if not self._text(index):
+            return index, None
+
+        parts = [self.tokens[index].value]
+        index += 1
+        while self._special(index, ".") and self._text(index + 1):
+            parts.append(self.tokens[index + 1].value)
+            index += 2
+        return index, ".".join(parts)
+
+    def _group(self, index):
+        """
+        returns the index after a bracketed group which starts at index,
+        and the tokens inside the group, excluding the outer brackets
+        """
+        depth = 0
+        start = index
+        while index < len(self.tokens):
+            token = self.tokens[index]
+            if token.type == Token.T_SPECIAL:
+                if token.value in _open:
+                    depth += 1
+                elif token.value in _close:
+                    depth -= 1
+                    if depth == 0:
+                        return index + 1, self.tokens[start + 1:index]
+            index += 1
+        return index, self.tokens[start + 1:index]
+
+    def _fromlist(self, tokens):
+        """
+        returns a list of (import_name, target_name) for the
+        contents of {a, b as c, d: e}
+        """
+        fromlist = []
+        item = []
+        for token in tokens + [None]:
+            if token is not None and token.type == Token.T_NEWLINE:
+                continue
+            if token is None or (token.type == Token.T_SPECIAL and token.value == ","):
+                if len(item) == 1:
+                    fromlist.append((item[0].value, item[0].value))
+                elif len(item) == 3:
+                    fromlist.append((item[0].value, item[2].value))
+                item = []
+            else:
+                item.append(token)
+        return fromlist
+
+    def _module(self, token, name, fromlist):
+        """ record an import of a module, or of a file by relative path """
+
+        if name.startswith("."):
+            if not (name.endswith(".js") or name.endswith(".ts")):
+                raise TransformError(token, "must import relative path with js extension")
+            self.imports.setdefault(name, {}).update(dict(fromlist))
+        else:
+            if name.startswith("@"):
+                _, name = name.split("/", 1)
+                name = name.replace("/", ".")
+            self.module_imports.setdefault(name, {}).update(dict(fromlist))
+
+    def _import(self, index):
+        """
+        import module foo.bar [with {...}]
+        import {...} from 'path'
+        """
+        token = self.tokens[index]
+        index += 1
+
+        if self._special(index, "{"):
+            index, group = self._group(index)
+            if self._text(index, "from"):
+                path = self._string(index + 1)
+                if path is not None:
+                    self._module(token, path, self._fromlist(group))
+                    return index + 2
+            return index
+
+        if not self._text(index, "module"):
+            # import foo.bar is not a module import
+            return index
+
+        index, name = self._name(index + 1)
+        if name is None:
+            return index
+
+        fromlist = []
+        with_ = self._get(index)
+        if with_ is not None and with_.type == Token.T_KEYWORD and \
+           with_.value == "with" and self._special(index + 1, "{"):
+            index, group = self._group(index + 1)
+            fromlist = self._fromlist(group)
+        self._module(token, name, fromlist)
+        return index
+
+    def _from(self, index):
+        """
+        from module foo.bar import {...}
+        """
+        token = self.tokens[index]
+        index += 1
+
+        if not self._text(index, "module"):
+            # from foo.bar import {...} is not a module import
+            return index
+
+        index, name = self._name(index + 1)
+        import_ = self._get(index)
+        if name is None or import_ is None or \
+           import_.type != Token.T_KEYWORD or import_.value != "import" or \
+           not self._special(index + 1, "{"):
+            return index
+
+        index, group = self._group(index + 1)
+        self._module(token, name, self._fromlist(group))
+        return index
+
+    def _include(self, index):
+        """
+        include 'path'
+        """
+        path = self._string(index)
+        if path is None:
+            return index
+        self.imports[path] = {}
+        return index + 1
+
+    def _call(self, index):
+        """
+        $include('path')
+        $import('name' [, {...}])
+        """
+        token = self.tokens[index]
+        end, _ = self._group(index + 1)
+        name = self._string(index + 2)
+        if name is None:
+            return end
+
+        if token.value == "$include":
+            self.imports[name] = {}
+        else:
+            fromlist = []
+            if self._special(index + 3, ",") and self._special(index + 4, "{"):
+                _, group = self._group(index + 4)
+                fromlist = self._fromlist(group)
+            self._module(token, name, fromlist)
+        return end
+
+    def _export(self, index):
+        """
+        export [default] <declaration>
+        export {...} from 'path'
+        export * from 'path'
+        """
+        token = self.tokens[index]
+        index += 1
+
+        default = self._get(index)
+        if default is not None and default.type == Token.T_KEYWORD and default.value == 'default':
+            index += 1
+
+        if self._special(index, "*"):
+            if not self._text(index + 1, "from"):
+                return index + 1
+            name = self._string(index + 2)
+            if name is None:
+                return index + 2
+            if name.startswith("@"):
+                _, modname = name.split("/", 1)
+                modname = modname.replace("/", ".")
+                self.module_imports[modname] = {"*": "*"}
+                self.exports.append(modname + "/*")
+            elif not name.startswith("."):
+                raise TransformError(self.tokens[index + 2], "must export relative path")
+            else:
+                self.imports[name] = {}
+            return index + 3
+
+        if self._special(index, "{"):
+            end, group = self._group(index)
+            if self._text(end, "from"):
+                name = self._string(end + 1)
+                if name is None:
+                    return end + 1
+                if not name.startswith("@"):
+                    raise TransformError(token, "export from not implemented")
+                _, modname = name.split("/", 1)
+                modname = modname.replace("/", ".")
+                self.module_imports[modname] = dict(self._fromlist(group))
+                self.exports.append(modname + "/*")
+                return end + 2
+
+        keyword = self._get(index)
+        if keyword is not None and keyword.type == Token.T_KEYWORD:
+            if keyword.value == "async":
+                index += 1
+                keyword = self._get(index)
+                if keyword is None:
+                    return index
+            if keyword.value in ("function", "class", "interface"):
+                index += 1
+                if self._special(index, "*"):
+                    index += 1
+                if self._text(index):
+                    self.exports.append(self.tokens[index].value)
+                    index += 1
+                return index
+            if keyword.value in ("const", "let", "var"):
+                index += 1
+        elif self._text(index, "type") and self._text(index + 1):
+            self.exports.append(self.tokens[index + 1].value)
+            return index + 2
+
+        return self._export_bindings(index)
+
+    def _export_bindings(self, index):
+        """
+        collect the names from a list of bindings
+            a, b = 1, {c, d} = e
+        """
+        tokens = self.tokens
+        binding = True
+        depth = 0
+        while index < len(tokens):
+            token = tokens[index]
+
+            if depth == 0 and binding and token.type != Token.T_NEWLINE:
+                if token.type == Token.T_TEXT:
+                    self.exports.append(token.value)
+                elif token.type == Token.T_SPECIAL and token.value in ("{", "["):
+                    index, group = self._group(index)
+                    for child in group:
+                        if child.type == Token.T_TEXT and child.value != "as":
+                            self.exports.append(child.value)
+                    binding = False
+                    continue
+                binding = False
+                index += 1
+                continue
+
+            if token.type == Token.T_SPECIAL:
+                if token.value in _open:
+                    depth += 1
+                elif token.value in _close:
+                    depth -= 1
+                    if depth < 0:
+                        break
+                elif depth == 0 and token.value == ",":
+                    binding = True
+                elif depth == 0 and token.value == ";":
+                    break
+            elif token.type == Token.T_NEWLINE and depth == 0:
+                # a statement ends at a new line, unless the list continues
+                if not self._special(index - 1, ",") and not self._special(index + 1, ","):
+                    break
+
+            index += 1
+
+        return index
+
+def scanImportExport(source):
+    """
+    returns the imports, module_imports and exports of a source file
+    without parsing the file. see getModuleImportExport
+    """
+    return ImportExportScanner().scan(source)
@@ -0,0 +1,408 @@
+
+"""
+compact binary serialization for an ast and its metadata
+
+the format stores a single record, a tuple of values. every string is
+stored once in a string table and is referenced by index. integers are
+stored as unsigned LEB128 varints, with zigzag encoding for signed
+values. tokens are stored in preorder, each node followed by its
+children, and each node records the number of children.
+
+    file   := magic version string_table record
+    string_table := varint(count) (varint(nbytes) utf8)*
+    record := varint(count) (varint(offset))* value*
+    value  := tag payload
+
+    token  := varint(type) varint(value) varint(line) varint(index)
+              varint(file) varint(flags) [varint(original_value)]
+              [varint(ref_attr)] varint(nchildren) token*
+
+string index zero is reserved for None. the line of each token is stored
+relative to the line of the previous token. the offsets of each value in
+the record are stored up front, so that a value can be decoded without
+decoding the values before it. a Reader can be constructed from a
+memory map, in which case only the pages which are read are loaded.
+"""
+
+import mmap
+
+from .token import Token
+
+MAGIC = b"DAST"
+VERSION = 1
+
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_STR = 4
+TAG_LIST = 5
+TAG_TUPLE = 6
+TAG_DICT = 7
+TAG_TOKEN = 8
+
+F_MAYBE_ILLEGAL = 0x01
+F_ORIGINAL_VALUE = 0x02
+F_REF_ATTR = 0x04
+
+class SerializeError(Exception):
+    pass
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+def _unzigzag(value):
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+class Writer(object):
+    """
+    encode a record, which is a tuple of values
+
+    values may be None, bool, int, str, list, tuple, dict or Token
+    """
+
+    def __init__(self):
+        super(Writer, self).__init__()
+
+        self.strings = {None: 0}
+        self.string_list = []
+
+    def _string(self, value):
+        index = self.strings.get(value, None)
+        if index is None:
+            if not isinstance(value, str):
+                raise SerializeError("expected string: %r" % (value,))
+            index = len(self.strings)
+            self.strings[value] = index
+            self.string_list.append(value)
+        return index
+
+    def _count_strings(self, record):
+        """
+        add every string in the record to the string table, ordered by
+        the number of uses. the most common strings, which include the
+        token types, are encoded using a single byte
+        """
+
+        counts = {}
+        stack = list(record)
+        while stack:
+            value = stack.pop()
+            if isinstance(value, str):
+                counts[value] = counts.get(value, 0) + 1
+            elif isinstance(value, (list, tuple)):
+                stack.extend(value)
+            elif isinstance(value, dict):
+                stack.extend(value.keys())
+                stack.extend(value.values())
+            elif isinstance(value, Token):
+                for attr in (value.type, value.value, value.file, value.original_value):
+                    if isinstance(attr, str):
+                        counts[attr] = counts.get(attr, 0) + 1
+                stack.extend(value.children)
+
+        for value in sorted(counts, key=lambda value: -counts[value]):
+            self._string(value)
+
+    def _varint(self, out, value):
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def _value(self, out, value):
+
+        if value is None:
+            out.append(TAG_NONE)
+        elif value is True:
+            out.append(TAG_TRUE)
+        elif value is False:
+            out.append(TAG_FALSE)
+        elif isinstance(value, int):
+            out.append(TAG_INT)
+            self._varint(out, _zigzag(value))
+        elif isinstance(value, str):
+            out.append(TAG_STR)
+            self._varint(out, self._string(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(TAG_LIST if isinstance(value, list) else TAG_TUPLE)
+            self._varint(out, len(value))
+            for item in value:
+                self._value(out, item)
+        elif isinstance(value, dict):
+            out.append(TAG_DICT)
+            self._varint(out, len(value))
+            for key, item in value.items():
+                self._value(out, key)
+                self._value(out, item)
+        elif isinstance(value, Token):
+            out.append(TAG_TOKEN)
+            self._token(out, value)
+        else:
+            raise SerializeError("unsupported type: %s" % type(value).__name__)
+
+    def _token(self, out, root):
+
+        varint = self._varint
+        string = self._string
+
+        line = 0
+        stack = [root]
+        while stack:
+            token = stack.pop()
+
+            if token.ref is not None:
+                raise SerializeError("token references can not be serialized")
+
+            flags = 0
+            if hasattr(token, '_maybe_illegal'):
+                flags |= F_MAYBE_ILLEGAL
+            if token.original_value is not None:
+                flags |= F_ORIGINAL_VALUE
+            if token.ref_attr:
+                flags |= F_REF_ATTR
+
+            varint(out, string(token.type))
+            varint(out, string(token.value))
+            # lines are stored relative to the previous token
+            varint(out, _zigzag(token.line - line))
+            line = token.line
+            varint(out, _zigzag(token.index))
+            varint(out, string(token.file))
+            out.append(flags)
+            if flags & F_ORIGINAL_VALUE:
+                varint(out, string(token.original_value))
+            if flags & F_REF_ATTR:
+                varint(out, token.ref_attr)
+            varint(out, len(token.children))
+
+            stack.extend(reversed(token.children))
+
+    def dumps(self, record):
+
+        self._count_strings(record)
+
+        values = []
+        for value in record:
+            out = bytearray()
+            self._value(out, value)
+            values.append(out)
+
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+
+        self._varint(out, len(self.string_list))
+        for value in self.string_list:
+            data = value.encode("utf-8")
+            self._varint(out, len(data))
+            out.extend(data)
+
+        # value offsets are relative to the end of the offset table
+        self._varint(out, len(values))
+        offset = 0
+        for data in values:
+            self._varint(out, offset)
+            offset += len(data)
+        for data in values:
+            out.extend(data)
+
+        return bytes(out)
+
+class Reader(object):
+    """
+    decode a record from a bytes like object
+
+    the string table is decoded when the reader is constructed. each value
+    in the record is decoded the first time it is accessed
+    """
+
+    def __init__(self, data):
+        super(Reader, self).__init__()
+
+        self.data = data
+
+        if data[:4] != MAGIC:
+            raise SerializeError("invalid header")
+        if data[4] != VERSION:
+            raise SerializeError("unsupported version: %d" % data[4])
+
+        pos = 5
+        count, pos = self._varint(pos)
+        strings = [None]
+        for i in range(count):
+            nbytes, pos = self._varint(pos)
+            strings.append(str(data[pos:pos+nbytes], "utf-8"))
+            pos += nbytes
+        self.strings = strings
+
+        count, pos = self._varint(pos)
+        offsets = []
+        for i in range(count):
+            offset, pos = self._varint(pos)
+            offsets.append(offset)
+        self.offsets = [pos + offset for offset in offsets]
+
+        self.values = [None] * count
+        self.decoded = [False] * count
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if not self.decoded[index]:
+            self.values[index], _ = self._value(self.offsets[index])
+            self.decoded[index] = True
+        return self.values[index]
+
+    def __iter__(self):
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+    def _varint(self, pos):
+        data = self.data
+        value = 0
+        shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value, pos
+            shift += 7
+
+    def _value(self, pos):
+        data = self.data
+        tag = data[pos]
+        pos += 1
+
+        if tag == TAG_NONE:
+            return None, pos
+        elif tag == TAG_TRUE:
+            return True, pos
+        elif tag == TAG_FALSE:
+            return False, pos
+        elif tag == TAG_INT:
+            value, pos = self._varint(pos)
+            return _unzigzag(value), pos
+        elif tag == TAG_STR:
+            value, pos = self._varint(pos)
+            return self.strings[value], pos
+        elif tag == TAG_LIST or tag == TAG_TUPLE:
+            count, pos = self._varint(pos)
+            items = []
+            for i in range(count):
+                item, pos = self._value(pos)
+                items.append(item)
+            return (items if tag == TAG_LIST else tuple(items)), pos
+        elif tag == TAG_DICT:
+            count, pos = self._varint(pos)
+            items = {}
+            for i in range(count):
+                key, pos = self._value(pos)
+                items[key], pos = self._value(pos)
+            return items, pos
+        elif tag == TAG_TOKEN:
+            return self._token(pos)
+        else:
+            raise SerializeError("invalid tag %d at %d" % (tag, pos - 1))
+
+    def _token(self, pos):
+        # the common case of a single byte varint is decoded inline
+        data = self.data
+        strings = self.strings
+        varint = self._varint
+        new_token = Token
+
+        stack = []
+        root = None
+        line = 0
+        while True:
+
+            b = data[pos]
+            if b < 0x80:
+                type_ = strings[b]
+                pos += 1
+            else:
+                b, pos = varint(pos)
+                type_ = strings[b]
+
+            b = data[pos]
+            if b < 0x80:
+                value = strings[b]
+                pos += 1
+            else:
+                b, pos = varint(pos)
+                value = strings[b]
+
+            b = data[pos]
+            if b < 0x80:
+                pos += 1
+            else:
+                b, pos = varint(pos)
+            line += (b >> 1) if not b & 1 else -((b + 1) >> 1)
+
+            b = data[pos]
+            if b < 0x80:
+                pos += 1
+            else:
+                b, pos = varint(pos)
+            index = (b >> 1) if not b & 1 else -((b + 1) >> 1)
+
+            token = new_token(type_, line, index, value)
+
+            b = data[pos]
+            if b < 0x80:
+                token.file = strings[b]
+                pos += 1
+            else:
+                b, pos = varint(pos)
+                token.file = strings[b]
+
+            flags = data[pos]
+            pos += 1
+            if flags:
+                if flags & F_MAYBE_ILLEGAL:
+                    token._maybe_illegal = True
+                if flags & F_ORIGINAL_VALUE:
+                    b, pos = varint(pos)
+                    token.original_value = strings[b]
+                if flags & F_REF_ATTR:
+                    token.ref_attr, pos = varint(pos)
+
+            b = data[pos]
+            if b < 0x80:
+                nchildren = b
+                pos += 1
+            else:
+                nchildren, pos = varint(pos)
+
+            if stack:
+                top = stack[-1]
+                top[0].append(token)
+                top[1] -= 1
+                if top[1] == 0:
+                    stack.pop()
+            else:
+                root = token
+
+            if nchildren:
+                stack.append([token.children, nchildren])
+            elif not stack:
+                return root, pos
+
+def dumps(record):
+    """ return the bytes for a record, which is a tuple of values """
+    return Writer().dumps(record)
+
+def loads(data):
+    """ decode every value in a record """
+    return tuple(Reader(data))
+
+def load(path):
+    """
+    return a Reader for a file containing a record
+
+    the file is memory mapped, and values are decoded when accessed
+    """
+    with open(path, "rb") as rb:
+        return Reader(mmap.mmap(rb.fileno(), 0, access=mmap.ACCESS_READ))
@@ -13,7 +13,8 @@ from collections import defaultdict
 
 from time import gmtime, strftime
 
-from .builder import Builder
+from .incremental import IncrementalBuilder
+from .watcher import FileWatcher
 
 def path_join_safe(root_directory: str, filename: str) -> str:
     """
@@ -403,23 +404,68 @@ class Server(object):
 
 class SampleResource(Resource):
 
-    def __init__(self, index_js, search_path, static_data, static_path, platform=None, **opts):
+    def __init__(self, index_js, search_path, static_data, static_path, platform=None, jobs=1, watch=True, tree_shake=True, **opts):
         super(SampleResource, self).__init__()
-        self.builder = Builder(search_path, static_data, platform=platform)
+        # modules which have not changed are not compiled again
+        self.builder = IncrementalBuilder(search_path, static_data, platform=platform)
+        self.builder.jobs = jobs
+        self.builder.tree_shake = tree_shake
         self.index_js = index_js
         self.opts = opts
         self.static_path = static_path
+
+        # when watching, the build is run in a background thread when
+        # a source file changes. otherwise the build is run for every
+        # request for the html
+        self.watcher = FileWatcher(self._build) if watch else None
         self._build()
+        if self.watcher is not None:
+            self.watcher.start()
 
     def _build(self):
-        self.style, self.source, self.html = self.builder.build(self.index_js, sourcemap=True, **self.opts)
+        style, source, html = self.builder.build(self.index_js, sourcemap=True, **self.opts)
         if self.builder.error:
-            self.srcmap_routes = {}
-            self.srcmap = ""
+            srcmap_routes = {}
+            srcmap = ""
         else:
-            self.srcmap_routes, self.srcmap = self.builder.sourcemap
+            srcmap_routes, srcmap = self.builder.sourcemap
         #self.source = "//# sourceMappingURL=/static/index.js.map\n" + self.source
 
+        # requests continue to use the previous output until the build is complete
+        self.style, self.source, self.html = style, source, html
+        self.srcmap_routes, self.srcmap = srcmap_routes, srcmap
+
+        if self.watcher is not None:
+            self.watcher.watch(self._watchPaths(), self._watchDirectories())
+
+    def _watchPaths(self):
+        """
+        returns the files used by the last build
+        """
+        paths = [jsf.source_path for jsf in self.builder.files.values()]
+        for name in ("index.%s.html" % self.builder.platform, "index.html"):
+            try:
+                paths.append(self.builder.find(name))
+            except FileNotFoundError:
+                pass
+        return paths
+
+    def _watchDirectories(self):
+        """
+        returns the directories where a new javascript file may fix
+        the last build, when the build failed: the directories of the
+        files which are included, and the search paths
+        """
+        if not self.builder.error:
+            return []
+        directories = {os.path.abspath(path) for path in self.builder.search_paths}
+        directories.add(os.path.dirname(os.path.abspath(self.index_js)))
+        for jsf in self.builder.files.values():
+            directories.add(os.path.dirname(jsf.source_path))
+        for jsm in self.builder.modules.values():
+            for paths in jsm.import_paths.values():
+                directories.update(os.path.dirname(path) for path in paths)
+        return sorted(directories)
 
     @get("/static/index.css")
     def get_style(self, request, location, matches):
@@ -511,25 +557,30 @@ class SampleResource(Resource):
     @get("/:path*")
     def get_path(self, request, location, matches):
         """
-        rebuild the javascript and html, return the html
+        return the html, rebuilding the javascript and html
+        if source files are not being watched
         """
-        self._build()
+        if self.watcher is None:
+            self._build()
         return Response(payload=self.html)
 
 class SampleServer(Server):
 
-    def __init__(self, host, port, index_js, search_path, static_data=None, static_path="./static", platform=None, **opts):
+    def __init__(self, host, port, index_js, search_path, static_data=None, static_path="./static", platform=None, jobs=1, watch=True, tree_shake=True, **opts):
         super(SampleServer, self).__init__(host, port)
         self.index_js = index_js
         self.search_path = search_path
         self.static_data = static_data
         self.static_path = static_path
         self.platform = platform
+        self.jobs = jobs
+        self.watch = watch
+        self.tree_shake = tree_shake
         self.opts = opts
 
     def buildRouter(self):
         router = Router()
-        res = SampleResource(self.index_js, self.search_path, self.static_data, self.static_path, platform=self.platform, **self.opts)
+        res = SampleResource(self.index_js, self.search_path, self.static_data, self.static_path, platform=self.platform, jobs=self.jobs, watch=self.watch, tree_shake=self.tree_shake, **self.opts)
         router.registerEndpoints(res.endpoints())
         return router
 
@@ -154,6 +154,86 @@ class SourceMap(object):
                 if self.line2file[-1] is None:
                     self.line2file[-1] = (file_index, token.line-1)
 
+    @staticmethod
+    def join(maps):
+        """
+        returns a SourceMap for the output produced by joining the
+        output of each source map with a new line
+
+        the fields of each map are encoded relative to the previous field.
+        when the sources of a map have not been seen in a previous map
+        only the first field needs to be encoded again
+        """
+
+        result = SourceMap()
+        result.mappings = [[]]
+        last = None
+
+        for index, srcmap in enumerate(maps):
+            if last is not None:
+                # the column is reset by the new line
+                last = [0] + last[1:]
+
+            names = sorted(srcmap.sources, key=srcmap.sources.get)
+            contiguous = not any(name in result.sources for name in names)
+            for name in names:
+                if name not in result.sources:
+                    result.sources[name] = len(result.sources)
+            files = [result.sources[name] for name in names]
+
+            lines = srcmap.mappings[1:]
+            first = None
+            if contiguous:
+                lines = list(lines)
+                for i, line in enumerate(lines):
+                    if line:
+                        field = SourceMap.b64decode(line[0])
+                        field[1] = files[field[1]]
+                        first = field
+                        if last is not None:
+                            field = [(a-b) for a,b in zip(field, last)]
+                        lines[i] = [SourceMap.b64encode(field)] + line[1:]
+                        break
+                if srcmap.last_field:
+                    last = list(srcmap.last_field)
+                    last[1] = files[last[1]]
+            else:
+                # decode every field and encode it using the new file index
+                lines = []
+                fields = [0, 0, 0, 0]
+                for line in srcmap.mappings[1:]:
+                    fields[0] = 0
+                    mapping = []
+                    for vlq in line:
+                        fields = [(a+b) for a,b in zip(SourceMap.b64decode(vlq), fields)]
+                        field = list(fields)
+                        field[1] = files[field[1]]
+                        if first is None:
+                            first = field
+                        if last is not None:
+                            delta = [(a-b) for a,b in zip(field, last)]
+                            mapping.append(SourceMap.b64encode(delta))
+                        else:
+                            mapping.append(SourceMap.b64encode(field))
+                        last = field
+                    if last is not None:
+                        last = [0] + last[1:]
+                    lines.append(mapping)
+            result.mappings.extend(lines)
+
+            line2file = [(files[entry[0]], entry[1]) if entry else entry
+                for entry in srcmap.line2file]
+            if index > 0:
+                # the first line of the output follows a new line
+                if line2file and line2file[0] == []:
+                    line2file[0] = (first[1], first[2])
+                else:
+                    line2file.insert(0, None)
+            result.line2file.extend(line2file)
+
+        result.last_field = last
+        return result
+
     def _getNameIndex(self, name):
         if name not in self.names:
             self.names[name] = len(self.names)
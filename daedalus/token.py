@@ -196,8 +196,15 @@ class Token(object):
     T_BLOCK_PUSH = "T_BLOCK_PUSH"
     T_BLOCK_POP = "T_BLOCK_POP"
 
+    # tokens are stored using slots instead of a per instance dictionary.
+    # a large application can contain millions of tokens, and the
+    # dictionary is the majority of the memory used by each token.
+    # `_maybe_illegal` is only set by the parser, for lambda bodies which
+    # may be an illegal object literal, and is otherwise left unassigned
+    __slots__ = ('type', 'line', 'index', 'value', 'children', 'file',
+        'original_value', 'ref', 'ref_attr', '_maybe_illegal')
+
     def __init__(self, type, line=0, index=0, value="", children=None,file=None):
-        super(Token, self).__init__()
         self.type = type
         self.line = line
         self.index = index
@@ -272,7 +279,8 @@ class Token(object):
         tok.children = [c.clone() for c in self.children]
         tok.ref = self.ref
         tok.ref_attr = self.ref_attr
-        tok.__dict__.update(keys)
+        for key, value in keys.items():
+            setattr(tok, key, value)
         return tok
 
     @staticmethod
@@ -0,0 +1,148 @@
+
+"""
+record the time spent in each phase of a build
+
+A Tracer records a span for each phase: loading, lexing and parsing a
+file, ordering the modules, scoping and formatting a module, the source
+map and the html. The spans are saved in the Chrome trace event format,
+which can be opened with https://ui.perfetto.dev or chrome://tracing.
+
+Time which is not a contiguous span, such as the time spent in each ast
+transform while a file is parsed, is added to the totals only.
+"""
+
+import os
+import json
+import time
+import threading
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null_span = _NullSpan()
+
+def span(tracer, name, **args):
+    """
+    returns a context manager which records a span when the tracer
+    is not None
+
+    args: details of the span. a 'file' or 'module' is used to identify
+        the span in the summary
+    """
+    if tracer is None:
+        return _null_span
+    return tracer.span(name, **args)
+
+class _Span(object):
+
+    def __init__(self, tracer, name, args):
+        super(_Span, self).__init__()
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.complete(self.name, self.start,
+            time.perf_counter() - self.start, self.args)
+        return False
+
+class Tracer(object):
+    """
+    collect spans and the total time of each phase
+    """
+
+    def __init__(self):
+        super(Tracer, self).__init__()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        # name => [count, seconds]
+        self.totals = {}
+
+    def span(self, name, **args):
+        """
+        returns a context manager which records the time spent in the block
+        """
+        return _Span(self, name, args)
+
+    def complete(self, name, start, duration, args=None):
+        """
+        record a span
+
+        start: the value of time.perf_counter() when the span started
+        duration: the length of the span in seconds
+        """
+        event = {
+            "name": name,
+            "cat": "build",
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+        self.addTime(name, duration)
+
+    def addTime(self, name, duration, count=1):
+        """
+        add to the total time of a phase without recording a span
+        """
+        total = self.totals.get(name, None)
+        if total is None:
+            self.totals[name] = [count, duration]
+        else:
+            total[0] += count
+            total[1] += duration
+
+    def getTrace(self):
+        """
+        returns the trace as a json object
+        """
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        """
+        write the trace to a json file
+        """
+        with open(path, "w") as wf:
+            json.dump(self.getTrace(), wf)
+
+    def summary(self, count=10):
+        """
+        returns a table of the total time of each phase, followed by the
+        slowest spans which belong to a file or module
+        """
+
+        lines = ["%10s %8s  %s" % ("total (s)", "count", "phase")]
+        totals = sorted(self.totals.items(), key=lambda item: -item[1][1])
+        for name, (n, seconds) in totals[:count]:
+            lines.append("%10.3f %8d  %s" % (seconds, n, name))
+
+        spans = []
+        for event in self.events:
+            args = event.get("args", {})
+            target = args.get("file", None) or args.get("module", None)
+            if target is not None:
+                spans.append((event["dur"] / 1e6, event["name"], target))
+        spans.sort(key=lambda item: -item[0])
+
+        if spans:
+            lines.append("")
+            lines.append("%10s %-8s  %s" % ("time (s)", "phase", "file or module"))
+            for seconds, name, target in spans[:count]:
+                lines.append("%10.3f %-8s  %s" % (seconds, name, target))
+
+        return "\n".join(lines)
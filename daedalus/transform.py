@@ -4,6 +4,7 @@ import sys
 import ast as py_ast
 import operator
 import hashlib
+import time
 from .lexer import Lexer
 from .token import Token, TokenError
 
@@ -18,6 +19,15 @@ def literal_eval(token):
     raise TransformError(token, "syntax error")
 
 class TransformBase(object):
+
+    # token types which visit modifies, or None for any type. the
+    # pipeline only calls visit for tokens with one of these types
+    visit_types = None
+
+    # names of transforms which must be applied to the complete ast
+    # before this transform. see TransformPipeline
+    depends = ()
+
     def __init__(self):
         super(TransformBase, self).__init__()
         self.tokens = []
@@ -42,8 +52,153 @@ class TransformBase(object):
     def visit(self, token, parent):
         raise NotImplementedError()
 
+class TransformPipeline(object):
+    """
+    apply a sequence of transforms using as few traversals as possible
+
+    consecutive transforms are applied in a single depth first traversal,
+    each token is visited by every transform in the order given. a
+    transform which declares a dependency on a transform earlier in the
+    same traversal starts a new traversal, so that it is applied to the
+    complete result of that transform.
+
+    transforms are instances of TransformBase or TransformBaseV3. a
+    TransformBaseV3 finalize is called once every token below the
+    deferred token has been visited by every transform in the traversal
+
+    timings: optional dictionary. when given, the time spent in each
+    transform is added to the entry for the class name, and the time
+    spent walking the ast is added to the entry for 'traversal'
+    """
+
+    def __init__(self, transforms, timings=None):
+        super(TransformPipeline, self).__init__()
+
+        self.stages = TransformPipeline.schedule(transforms)
+        self.timings = timings
+
+    @staticmethod
+    def schedule(transforms):
+        """
+        group the transforms into traversals
+        """
+        stages = []
+        names = set()
+        for xform in transforms:
+            if not stages or any(name in names for name in xform.depends):
+                stages.append([])
+                names = set()
+            stages[-1].append(xform)
+            names.update(cls.__name__ for cls in type(xform).__mro__)
+        return stages
+
+    def transform(self, ast):
+
+        for stage in self.stages:
+            if self.timings is None:
+                self._scan(stage, ast)
+            else:
+                total = sum(self.timings.get(type(xform).__name__, 0.0) for xform in stage)
+                t0 = time.perf_counter()
+                self._scan(stage, ast)
+                elapsed = time.perf_counter() - t0
+                total = sum(self.timings.get(type(xform).__name__, 0.0) for xform in stage) - total
+                self.timings['traversal'] = self.timings.get('traversal', 0.0) + elapsed - total
+
+    def _timed(self, name, fn):
+
+        timings = self.timings
+        clock = time.perf_counter
+
+        def visit(token, parent):
+            t0 = clock()
+            fn(token, parent)
+            timings[name] = timings.get(name, 0.0) + clock() - t0
+
+        return visit
+
+    def _dispatch(self, stage):
+        """
+        returns a table mapping a token type to the list of visit
+        methods for that type, and the list for all other types.
+        each visit method is paired with the index of the transform
+        """
+
+        visitors = []
+        for order, xform in enumerate(stage):
+            visit = xform.visit
+            if self.timings is not None:
+                visit = self._timed(type(xform).__name__, visit)
+            visitors.append((order, visit, xform.visit_types))
+
+        types = set()
+        for _, _, visit_types in visitors:
+            if visit_types is not None:
+                types.update(visit_types)
+
+        table = {}
+        for type_ in types:
+            table[type_] = [(order, visit) for order, visit, visit_types in visitors
+                if visit_types is None or type_ in visit_types]
+        default = [(order, visit) for order, visit, visit_types in visitors
+            if visit_types is None]
+
+        return table, default
+
+    def _scan(self, stage, ast):
+
+        table, default = self._dispatch(stage)
+        timings = self.timings
+
+        stack = [(None, ast, ast)]
+
+        for xform in stage:
+            if hasattr(xform, 'finalize'):
+                # defer pushes onto the shared stack
+                xform.tokens = stack
+
+        while stack:
+            # process tokens from in the order they are discovered. (DFS)
+            finalize, token, parent = stack.pop()
+
+            if finalize is not None:
+                if timings is None:
+                    finalize(token, parent)
+                else:
+                    t0 = time.perf_counter()
+                    finalize(token, parent)
+                    name = type(finalize.__self__).__name__
+                    timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+                continue
+
+            type_ = token.type
+            visitors = table.get(type_, default)
+            index = 0
+            while index < len(visitors):
+                order, visit = visitors[index]
+                visit(token, parent)
+                index += 1
+                if token.type != type_:
+                    # the remaining transforms see the new type
+                    type_ = token.type
+                    visitors = table.get(type_, default)
+                    index = 0
+                    while index < len(visitors) and visitors[index][0] <= order:
+                        index += 1
+
+            for child in reversed(token.children):
+                stack.append((None, child, token))
+
+        for xform in stage:
+            if hasattr(xform, 'finalize'):
+                xform.tokens = []
+
 class TransformRemoveSemicolons(TransformBase):
 
+    # a block label moves the block into the parent of the label after
+    # the parent has been visited
+    depends = ("TransformGrouping",)
+
     def visit(self, token, parent):
 
         i = 0
@@ -70,6 +225,7 @@ class TransformGrouping(TransformBase):
 
             if child.type == Token.T_GROUPING and child.value == "{}":
                 if (token.type == Token.T_MODULE) or \
+                   (token.type == Token.T_TEMPLATE_EXPRESSION) or \
                    (token.type == Token.T_ASYNC_FUNCTION) or \
                    (token.type == Token.T_ANONYMOUS_FUNCTION) or \
                    (token.type == Token.T_ANONYMOUS_GENERATOR) or \
@@ -114,7 +270,7 @@ class TransformGrouping(TransformBase):
                             if parent.type == Token.T_OBJECT:
                                 parent.type = Token.T_BLOCK
 
-                            if parent.type == Token.T_BLOCK or parent.type == Token.T_MODULE:
+                            if parent.type in (Token.T_BLOCK, Token.T_MODULE, Token.T_TEMPLATE_EXPRESSION):
                                 if rhs.type == Token.T_GROUPING:
                                     rhs.type = Token.T_BLOCK
 
@@ -196,6 +352,16 @@ class TransformGrouping(TransformBase):
 
 class TransformFlatten(TransformBase):
 
+    visit_types = {
+        Token.T_OBJECT, Token.T_RECORD, Token.T_ARGLIST, Token.T_LIST,
+        Token.T_TUPLE, Token.T_UNPACK_SEQUENCE, Token.T_UNPACK_OBJECT,
+        Token.T_GROUPING, Token.T_VAR,
+    }
+
+    # a comma is removed before the transforms in the same traversal
+    # visit it. every object must be labeled before flattening
+    depends = ("TransformGrouping", "TransformRemoveSemicolons")
+
     def visit(self, token, parent):
         # TODO: remove square bracket type from this and add T_UNPACK_SEQUENCE
         if token.type == Token.T_GROUPING and not (token.value == "()" or token.value == "[]"):
@@ -259,6 +425,8 @@ class TransformFlatten(TransformBase):
 
 class TransformOptionalChaining(TransformBase):
 
+    visit_types = {Token.T_OPTIONAL_CHAINING}
+
     def visit(self, token, parent):
 
         if token.type != Token.T_OPTIONAL_CHAINING:
@@ -336,6 +504,8 @@ class TransformOptionalChaining(TransformBase):
 
 class TransformMagicConstants(TransformBase):
 
+    visit_types = {Token.T_TEXT}
+
     def visit(self, token, parent):
         """
 
@@ -389,6 +559,11 @@ def shell_format(text, vars):
 
 class TransformExtractStyleSheet(TransformBase):
 
+    visit_types = {Token.T_ASSIGN, Token.T_FUNCTIONCALL}
+
+    # style sheets are extracted after the arguments have been folded
+    depends = ("TransformConstEval",)
+
     def __init__(self, uid):
         super(TransformExtractStyleSheet, self).__init__()
 
@@ -762,13 +937,18 @@ class MinifyRef(Ref):
         self.outLabel = outLabel
         s = 'f' if self.flags & SC_FUNCTION else 'b'
         self.name = "%s.%s@%s%d" % (scname, outLabel, s, counter)
+        # the scope which allocated the label, or None if the label
+        # cannot be reassigned. see LabelAllocator
+        self.scope = None
         #print("construct ref:", self.name)
 
     def identity(self):
         return self.outLabel
 
     def clone(self, scflags):
-        return MinifyRef(self.scname, scflags, self.label, self.outLabel, self.counter+1)
+        ref = MinifyRef(self.scname, scflags, self.label, self.outLabel, self.counter+1)
+        ref.scope = self.scope
+        return ref
 
 class UndefinedRef(Ref):
     def __init__(self, scname, scflags, label, counter):
@@ -817,6 +997,9 @@ class VariableScope(object):
         self.blscope_stale = {}
         self.blscope_tags = [""]
         self.blscope_jump_tokens = [[]]
+        # label -> stack of refs, one for each block scope which
+        # defines the label. the innermost definition is last
+        self.blscope_index = {}
 
         self.blscope_ids = [0,]
         self.blscope_next_id = 1
@@ -837,17 +1020,11 @@ class VariableScope(object):
         in the function scope
         """
 
-        ref = None
-
-        for mapping in reversed(self.blscope):
-            if label in mapping:
-                ref = mapping[label]
-                break
-
-        if ref is None and label in self.fnscope:
-            ref = self.fnscope[label]
+        refs = self.blscope_index.get(label, None)
+        if refs:
+            return refs[-1]
 
-        return ref
+        return self.fnscope.get(label, None)
 
     def _getScopeName(self):
         """
@@ -871,9 +1048,9 @@ class VariableScope(object):
         if label in self.blscope[-1]:
             raise TokenError(token, "`%s` already defined at scope %s" % (label, self.name))
 
-        for bl in reversed(self.blscope):
-            if label in bl:
-                return bl[label]
+        refs = self.blscope_index.get(label, None)
+        if refs:
+            return refs[-1]
 
         # two subsequent block scopes (not nested, but parallel)
         # may define the same variable identifier, but it will
@@ -936,6 +1113,7 @@ class VariableScope(object):
             if len(self.blscope) == 0:
                 raise TokenError(token, "block scope not defined")
             self.blscope[-1][label] = new_ref
+            self.blscope_index.setdefault(label, []).append(new_ref)
             new_ref.count = 0
 
         token.value = identifier
@@ -958,7 +1136,7 @@ class VariableScope(object):
         if label in self.fnscope:
             ref = self._getRef(label)
 
-        elif any([label in bl for bl in self.blscope]):
+        elif label in self.blscope_index:
             ref = self._getRef(label)
 
         elif token.value == 'arguments':
@@ -1088,6 +1266,10 @@ class VariableScope(object):
         for key, ref in mapping.items():
             ref.count -= 1
             #print("ref.count--", key, ref.count)
+            refs = self.blscope_index[key]
+            refs.pop()
+            if not refs:
+                del self.blscope_index[key]
 
         self.blscope_stale.update(mapping)
         return mapping
@@ -1122,6 +1304,9 @@ class VariableScope(object):
     def updateDeferedBlock(self):
         # copy block scope refs to the defered scopes
 
+        if not self.defered_functions:
+            return
+
         refs = self.flattenBlockScope()
         for key, ref in refs.items():
             for defered in self.defered_functions:
@@ -1228,12 +1413,37 @@ class MinifyVariableScope(VariableScope):
         super(MinifyVariableScope, self).__init__(name, parent)
         self.label_index = 0
         self.class_counter = 0
+        # a LabelAllocator which records where each variable is used,
+        # or None when the labels are final. see TransformMinifyScope
+        self.allocator = None
 
     def _createRef(self, scflags, label, type_):
 
         ident =  self.nextLabel(type_) # + '_' + label
 
-        return MinifyRef(self._getScopeName(), scflags, label, ident, 1)
+        ref = MinifyRef(self._getScopeName(), scflags, label, ident, 1)
+        # class names are unique across the program, and are not reassigned
+        if type_ != DF_CLASS:
+            ref.scope = self
+        return ref
+
+    def define(self, scflags, token, type_=DF_IDENTIFIER):
+        ref = super(MinifyVariableScope, self).define(scflags, token, type_)
+        if self.allocator is not None:
+            self.allocator.use(self, ref)
+        return ref
+
+    def load(self, token):
+        ref = super(MinifyVariableScope, self).load(token)
+        if self.allocator is not None:
+            self.allocator.use(self, ref)
+        return ref
+
+    def store(self, token):
+        ref = super(MinifyVariableScope, self).store(token)
+        if self.allocator is not None:
+            self.allocator.use(self, ref)
+        return ref
 
     def nextLabel(self, type_):
         c = ""
@@ -1276,6 +1486,138 @@ class MinifyVariableScope(VariableScope):
                     break
             return c
 
+class LabelAllocator(object):
+    """
+    assign the labels of a minified program once every variable is known
+
+    A variable is the set of refs which share a label in the scope that
+    allocated it. While the program is scoped, the scopes in which each
+    variable is visible and used are recorded: every scope between a
+    use and the scope which defines the variable. Undefined globals
+    keep their name, and are used in every scope up to the global scope.
+
+    Two variables may share a label unless one is defined in a scope
+    where the other is used. The variables are given labels in order of
+    the number of times they are referenced, so that the most used
+    variables have the shortest labels, and variables in sibling scopes
+    reuse the same labels.
+    """
+
+    def __init__(self):
+        super(LabelAllocator, self).__init__()
+        # (scope, label) => scopes in which the variable is used
+        self.variables = {}
+        # (scope, label) => id of a ref => ref
+        self.refs = {}
+        # label => scopes in which the undefined global is used
+        self.globals = {}
+        self.label_index = 0
+
+    def use(self, scope, ref):
+        """
+        record that a ref is used in the given scope
+        """
+        if isinstance(ref, MinifyRef):
+            if ref.scope is None:
+                return
+            target = ref.scope
+            key = (target, ref.outLabel)
+            scopes = self.variables.get(key, None)
+            if scopes is None:
+                scopes = self.variables[key] = set()
+                self.refs[key] = {}
+            self.refs[key][id(ref)] = ref
+        elif isinstance(ref, UndefinedRef):
+            target = None
+            scopes = self.globals.get(ref.label, None)
+            if scopes is None:
+                scopes = self.globals[ref.label] = set()
+        else:
+            return
+
+        # every scope from the use to the definition
+        while scope is not None and scope not in scopes:
+            scopes.add(scope)
+            if scope is target:
+                break
+            scope = scope.parent.scope if scope.parent is not None else None
+
+    def assign(self, ast):
+        """
+        rename every variable in the ast
+        """
+
+        # count the references to each variable, and find the tokens to rename
+        counts = {key: 0 for key in self.variables}
+        tokens = {key: [] for key in self.variables}
+        refs = self.refs
+        stack = [ast]
+        while stack:
+            token = stack.pop()
+            stack.extend(token.children)
+            ref = token.ref
+            if not isinstance(ref, MinifyRef) or ref.scope is None:
+                continue
+            key = (ref.scope, ref.outLabel)
+            if key not in counts:
+                counts[key] = 0
+                tokens[key] = []
+                refs[key] = {}
+                self.variables[key] = {ref.scope}
+            if token.ref_attr in (1, 2, 4):
+                counts[key] += 1
+            if token.value == ref.outLabel:
+                tokens[key].append(token)
+            refs[key][id(ref)] = ref
+
+        # scope => labels of the variables defined in the scope
+        defined = {}
+        # scope => labels of the variables used in the scope
+        used = {}
+        for label, scopes in self.globals.items():
+            for scope in scopes:
+                used.setdefault(scope, set()).add(label)
+
+        # sort by count, then by the order the variables were defined
+        order = sorted(counts, key=lambda key: -counts[key])
+
+        # the labels in the order they are assigned, shortest first
+        labels = []
+        for key in order:
+            target, _ = key
+            scopes = self.variables[key]
+
+            excluded = set(used.get(target, ()))
+            for scope in scopes:
+                excluded.update(defined.get(scope, ()))
+
+            index = 0
+            while True:
+                if index == len(labels):
+                    labels.append(self._nextLabel())
+                if labels[index] not in excluded:
+                    break
+                index += 1
+            label = labels[index]
+
+            defined.setdefault(target, set()).add(label)
+            for scope in scopes:
+                used.setdefault(scope, set()).add(label)
+
+            for token in tokens[key]:
+                token.value = label
+            for ref in refs[key].values():
+                ref.outLabel = label
+
+    def _nextLabel(self):
+        # labels start with a lowercase letter, and do not
+        # collide with class names. see MinifyVariableScope
+        while True:
+            c = encode_identifier(alphabet64, self.label_index)
+            self.label_index += 1
+            if c not in Lexer.reserved_words:
+                return c
+
 ST_MASK     = 0x000FF
 ST_SCOPE_MASK     = 0xFFF00
 ST_VISIT    = 0x001
@@ -1640,14 +1982,19 @@ class TransformAssignScope(object):
 
     def _transform(self, token):
 
-        while self.seq:
+        seq = self.seq
+        states = self.states
+        state_defaults = self.state_defaults
+
+        while seq:
             # process tokens from in the order they are discovered. (DFS)
-            flags, scope, token, parent = self.seq.pop()
+            flags, scope, token, parent = seq.pop()
 
-            fn = self.states[flags & ST_MASK].get(token.type, None)
+            state = flags & ST_MASK
+            fn = states[state].get(token.type, None)
 
             if not fn:
-                fn = self.state_defaults[flags & ST_MASK]
+                fn = state_defaults[state]
 
             fn(flags, scope, token, parent)
 
@@ -2767,26 +3114,50 @@ class TransformMinifyScope(TransformAssignScope):
     """
     Minify javascript by intelligently renaming variables to shorter identifiers
 
-    This is largely an experiment and does the renaming in a single pass.
-    There could be a significant number of improvements
-
-    - come up with better ways to encode the names in a single pass fashion
-    - keep track of all scopes and wait to assign until the end
-    - keep track of al references and sort by frequency
-    - assign names based on frequency of store/load counts
-
+    By default the renaming is done in a single pass, and each scope
+    hands out labels in the order the variables are defined.
 
+    When rank_labels is true, the labels are assigned in a second pass
+    once every scope is known. The most referenced variables are given
+    the shortest labels, and labels are reused across sibling scopes.
+    see LabelAllocator
     """
     def __init__(self):
         super(TransformMinifyScope, self).__init__()
 
+        self.rank_labels = False
+        self.allocator = None
 
     def newScope(self, name, parentScope=None):
         scope = MinifyVariableScope(name, parentScope)
         scope.options.disable_warnings = self.disable_warnings
         scope.options.warnings_as_errors = self.warnings_as_errors
+        scope.allocator = self.allocator
         return scope
 
+    def transform(self, ast):
+
+        if not self.rank_labels:
+            return super(TransformMinifyScope, self).transform(ast)
+
+        self.allocator = LabelAllocator()
+        try:
+            super(TransformMinifyScope, self).transform(ast)
+            self.allocator.assign(ast)
+        finally:
+            self.allocator = None
+
+        # the labels of the global variables have been reassigned
+        scope = self.global_scope
+        for mapping in (scope.gscope, scope.fnscope, scope.blscope[0]):
+            for name, ref in mapping.items():
+                self.globals[name] = ref.identity()
+
+        vars = dict(scope.fnscope)
+        vars.update(scope.flattenBlockScope())
+
+        return {label:ref.identity() for label,ref in vars.items()}
+
 class TransformBaseV2(object):
     def __init__(self):
         super(TransformBaseV2, self).__init__()
@@ -2827,6 +3198,11 @@ class TransformBaseV2(object):
         raise NotImplementedError()
 
 class TransformBaseV3(object):
+
+    # see TransformBase
+    visit_types = None
+    depends = ()
+
     def __init__(self):
         super(TransformBaseV3, self).__init__()
         self.tokens = []
@@ -2838,22 +3214,22 @@ class TransformBaseV3(object):
 
     def scan(self, token):
 
-        self.tokens = [(1, token, token)]
+        self.tokens = [(None, token, token)]
 
         while self.tokens:
             # process tokens from in the order they are discovered. (DFS)
-            mode, token, parent = self.tokens.pop()
+            finalize, token, parent = self.tokens.pop()
             self.processed += 1
 
-            if mode==1:
+            if finalize is None:
                 self.visit(token, parent)
                 for child in reversed(token.children):
-                    self.tokens.append((1, child, token))
+                    self.tokens.append((None, child, token))
             else:
-                self.finalize(token, parent)
+                finalize(token, parent)
 
     def defer(self, token, parent):
-        self.tokens.append((0, token, parent))
+        self.tokens.append((self.finalize, token, parent))
 
     def visit(self, token, parent):
         raise NotImplementedError()
@@ -2893,19 +3269,146 @@ def js_map_get_attr(obj, key):
     index = literal_eval(key)
     return obj.children[index]
 
+js_compare_ops = {
+    "===": operator.eq,
+    "!==": operator.ne,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+
+# function bodies have their own var scope
+js_function_types = {
+    Token.T_FUNCTION,
+    Token.T_ASYNC_FUNCTION,
+    Token.T_GENERATOR,
+    Token.T_ASYNC_GENERATOR,
+    Token.T_ANONYMOUS_FUNCTION,
+    Token.T_ASYNC_ANONYMOUS_FUNCTION,
+    Token.T_ANONYMOUS_GENERATOR,
+    Token.T_ASYNC_ANONYMOUS_GENERATOR,
+    Token.T_LAMBDA,
+    Token.T_METHOD,
+}
+
+def js_literal(token):
+    """
+    returns (type, value) for a number, string, boolean, null or
+    undefined literal. returns None for any other expression
+    """
+    while token.type == Token.T_GROUPING and token.value == "()" and len(token.children) == 1:
+        token = token.children[0]
+
+    if token.type == Token.T_KEYWORD:
+        if token.value in ("true", "false"):
+            return ("boolean", token.value == "true")
+        if token.value in ("null", "undefined"):
+            return (token.value, None)
+        return None
+
+    if token.type == Token.T_NUMBER:
+        type_ = "number"
+    elif token.type == Token.T_STRING and "\\" not in token.value:
+        # escape sequences are not the same in python
+        type_ = "string"
+    else:
+        return None
+
+    try:
+        value = py_ast.literal_eval(token.value)
+    except (ValueError, SyntaxError):
+        return None
+
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+
+    return (type_, value)
+
+def js_truthy(literal):
+    type_, value = literal
+    return type_ not in ("null", "undefined") and bool(value)
+
+def js_compare(op, lhs, rhs):
+    """
+    returns the result of comparing two literals, or None when the
+    result depends on type coercion
+    """
+    ltype, lvalue = lhs
+    rtype, rvalue = rhs
+
+    if op in ("===", "!=="):
+        equal = ltype == rtype and lvalue == rvalue
+        return equal if op == "===" else not equal
+
+    if op in ("==", "!="):
+        if ltype == rtype:
+            equal = lvalue == rvalue
+        elif {ltype, rtype} == {"null", "undefined"}:
+            equal = True
+        elif ltype in ("null", "undefined") or rtype in ("null", "undefined"):
+            equal = False
+        else:
+            return None
+        return equal if op == "==" else not equal
+
+    if ltype == rtype and ltype in ("number", "string"):
+        return js_compare_ops[op](lvalue, rvalue)
+
+    return None
+
+def js_declares_var(token):
+    """
+    returns true if a var is declared in the function scope of the token
+    """
+    stack = [token]
+    while stack:
+        token = stack.pop()
+        if token.type == Token.T_VAR and token.value == "var":
+            return True
+        if token.type not in js_function_types:
+            stack.extend(token.children)
+    return False
+
+def js_is_lexical(token):
+    """
+    returns true if the statement declares a block scoped name
+    """
+    if token.type == Token.T_VAR:
+        return token.value != "var"
+    return token.type == Token.T_CLASS or token.type in js_function_types
+
 class TransformConstEval(TransformBaseV3):
+    """
+    evaluate expressions of literals and const variables
 
-    def __init__(self):
+    fold_branches: when true, comparisons and logical operators are
+        also folded, and an if statement or ternary expression with a
+        literal test is replaced by the branch which is taken. a branch
+        is not removed when it declares a var. see daedalus.fold
+
+    variables are resolved using the scope references, when the ast
+    has been scoped
+    """
+
+    visit_types = {Token.T_ASSIGN, Token.T_BINARY}
+
+    def __init__(self, fold_branches=False):
         super().__init__()
 
         self.constexpr_values = {}
 
-    def visit(self, token, parent):
+        self.fold_branches = fold_branches
+        if fold_branches:
+            self.visit_types = self.visit_types | {Token.T_PREFIX,
+                Token.T_LOGICAL_AND, Token.T_LOGICAL_OR,
+                Token.T_NULLISH_COALESCING, Token.T_TERNARY, Token.T_BRANCH}
 
-        if token.type == Token.T_ASSIGN:
-            self.defer(token, parent)
+    def visit(self, token, parent):
 
-        if token.type == Token.T_BINARY:
+        if token.type in self.visit_types:
             self.defer(token, parent)
 
     def finalize(self, token, parent):
@@ -2913,15 +3416,28 @@ class TransformConstEval(TransformBaseV3):
         if token.type == Token.T_ASSIGN:
             self.visit_assign(token, parent)
 
-        if token.type == Token.T_BINARY:
+        elif token.type == Token.T_BINARY:
             self.visit_binary(token, parent)
 
+        elif token.type == Token.T_PREFIX:
+            self.visit_prefix(token, parent)
+
+        elif token.type in (Token.T_LOGICAL_AND, Token.T_LOGICAL_OR,
+                Token.T_NULLISH_COALESCING):
+            self.visit_logical(token, parent)
+
+        elif token.type == Token.T_TERNARY:
+            self.visit_ternary(token, parent)
+
+        elif token.type == Token.T_BRANCH:
+            self.visit_branch(token, parent)
+
     def resolve_reference(self, token):
         visited = set()
-        while token.type in js_vars:
+        while token.type in js_vars or token.ref is not None:
             visited.add(token)
 
-            if not hasattr(token, "ref"):
+            if token.ref is None:
                 break
 
             ref = token.ref
@@ -2944,7 +3460,7 @@ class TransformConstEval(TransformBaseV3):
 
         if token.value == "=":
 
-            if hasattr(lhs, "ref") and lhs.type in js_vars:
+            if lhs.ref is not None:
 
                 ref = lhs.ref
 
@@ -2957,7 +3473,7 @@ class TransformConstEval(TransformBaseV3):
                     #print("assign", ref.name, " = ", rhs)
         else:
             # +=, etc not yet supported
-            if hasattr(lhs, "ref") and lhs.type in js_vars:
+            if lhs.ref is not None:
                 ref = lhs.ref
                 if ref.name in self.constexpr_values:
                     del self.constexpr_values[ref.name]
@@ -2969,11 +3485,20 @@ class TransformConstEval(TransformBaseV3):
         lhs = self.resolve_reference(lhs)
         rhs = self.resolve_reference(rhs)
 
-        if is_str(lhs) and is_str(rhs):
+        if self.fold_branches and token.value in js_compare_ops:
+            lv = self.literal(lhs)
+            rv = self.literal(rhs)
+            result = js_compare(token.value, lv, rv) if lv and rv else None
+            if result is not None:
+                token.type = Token.T_KEYWORD
+                token.value = "true" if result else "false"
+                token.children = []
+
+        elif is_str(lhs) and is_str(rhs):
             lv = literal_eval(lhs)
             rv = literal_eval(rhs)
 
-            if token.value in js_num_ops:
+            if token.value in js_str_ops:
                 #print("compute: %s:%d %r%s%r" % (token.file, token.line, lv, token.value, rv))
                 token.type = Token.T_STRING
                 token.value = repr(js_str_ops[token.value](lv, rv))
@@ -2998,6 +3523,160 @@ class TransformConstEval(TransformBaseV3):
                 token.value = repr(lv + rv)
                 token.children = []
 
+    def literal(self, token):
+        """
+        returns the literal value of an expression, see js_literal
+        """
+        while token.type == Token.T_GROUPING and token.value == "()" and len(token.children) == 1:
+            token = token.children[0]
+        return js_literal(self.resolve_reference(token))
+
+    def replace(self, token, other):
+        """
+        replace the token with another token, in place
+        """
+        token.type = other.type
+        token.line = other.line
+        token.index = other.index
+        token.value = other.value
+        token.children = other.children
+        token.file = other.file
+        token.original_value = other.original_value
+        token.ref = other.ref
+        token.ref_attr = other.ref_attr
+
+    def visit_prefix(self, token, parent):
+
+        if token.value != "!" or len(token.children) != 1:
+            return
+
+        value = self.literal(token.children[0])
+        if value is not None:
+            token.type = Token.T_KEYWORD
+            token.value = "false" if js_truthy(value) else "true"
+            token.children = []
+
+    def visit_logical(self, token, parent):
+
+        lhs, rhs = token.children
+        value = self.literal(lhs)
+        if value is None:
+            return
+
+        if token.type == Token.T_LOGICAL_AND:
+            self.replace(token, rhs if js_truthy(value) else lhs)
+        elif token.type == Token.T_LOGICAL_OR:
+            self.replace(token, lhs if js_truthy(value) else rhs)
+        else:
+            self.replace(token, rhs if value[0] in ("null", "undefined") else lhs)
+
+    def visit_ternary(self, token, parent):
+
+        test, lhs, rhs = token.children
+        value = self.literal(test)
+        if value is not None:
+            self.replace(token, lhs if js_truthy(value) else rhs)
+
+    def visit_branch(self, token, parent):
+
+        if token.value != "if" or len(token.children) < 2:
+            return
+
+        test = token.children[0]
+        if test.type == Token.T_ARGLIST:
+            if len(test.children) != 1:
+                return
+            test = test.children[0]
+
+        value = self.literal(test)
+        if value is None:
+            return
+
+        if js_truthy(value):
+            keep = token.children[1]
+            removed = token.children[2:]
+        else:
+            keep = token.children[2] if len(token.children) > 2 else None
+            removed = token.children[1:2]
+
+        # a var declared in the removed branch is still defined
+        if any(js_declares_var(child) for child in removed):
+            return
+
+        statements = parent.type in (Token.T_MODULE, Token.T_BLOCK)
+
+        # a labeled statement is replaced in place, so that the label
+        # is not removed or attached to the next statement
+        if statements:
+            index = next(i for i, child in enumerate(parent.children) if child is token)
+            if index > 0 and parent.children[index - 1].type == Token.T_BLOCK_LABEL:
+                statements = False
+
+        if keep is None:
+            if statements or (parent.type == Token.T_BRANCH and
+                    len(parent.children) == 3 and parent.children[2] is token):
+                # the statement, or the else branch, is removed
+                self._remove(parent, token, [])
+            else:
+                self.replace(token, Token(Token.T_BLOCK, token.line, token.index, "{}"))
+
+        elif statements and keep.type == Token.T_BLOCK and \
+                not any(js_is_lexical(child) for child in keep.children):
+            self._remove(parent, token, keep.children)
+
+        else:
+            self.replace(token, keep)
+
+    def _remove(self, parent, token, children):
+        """
+        replace a child of the parent with a list of tokens
+        """
+        for index, child in enumerate(parent.children):
+            if child is token:
+                parent.children[index:index + 1] = children
+                break
+
+def copyTracked(ast, copy_output=True):
+    """
+    copy an ast to be analyzed by a transform, such as the scope
+    transform, which modifies the ast
+
+    returns a copy of the ast, the tokens to modify, and a dictionary
+    of id(copy token) => (token, parent)
+
+    copy_output: when true, the tokens to modify are a second copy of
+        the ast. otherwise the tokens of the ast are modified
+    """
+
+    def clone(tok):
+        new_tok = Token(tok.type, tok.line, tok.index, tok.value)
+        new_tok.file = tok.file
+        new_tok.original_value = tok.original_value
+        return new_tok
+
+    root = clone(ast)
+    output = clone(ast) if copy_output else ast
+    mapping = {id(root): (output, None)}
+
+    queue = [(child, root, output) for child in reversed(ast.children)]
+    while queue:
+        tok, parent, out_parent = queue.pop()
+
+        new_tok = clone(tok)
+        parent.children.append(new_tok)
+
+        if copy_output:
+            out_tok = clone(tok)
+            out_parent.children.append(out_tok)
+        else:
+            out_tok = tok
+        mapping[id(new_tok)] = (out_tok, out_parent)
+
+        for child in reversed(tok.children):
+            queue.append((child, new_tok, out_tok))
+
+    return root, output, mapping
+
 def getModuleImportExport(ast, warn_include=False):
     """
     returns:
@@ -0,0 +1,384 @@
+
+"""
+remove the unused exports of each module
+
+Starting from the exports of the root module, the names imported from
+each module are followed through the module graph. Within a module,
+a top level function, class or variable declaration is kept when it is
+reachable from an export which is used by another module, or from a
+statement which is always kept. Every other statement, such as an
+expression or a loop, is always kept since it may have side effects.
+
+A variable declaration can only be removed when every value is free of
+side effects: literals, references, functions, classes and objects or
+arrays of those. A class can only be removed when the class it extends
+is a plain name, and every static property is free of side effects.
+
+The analysis is conservative. Every name which appears in a statement
+is a reference, including property keys and local variables which
+shadow a top level name. A reference to the global name of a module,
+instead of an imported name, keeps every export of that module.
+"""
+
+from .token import Token
+
+_function_types = (
+    Token.T_FUNCTION,
+    Token.T_ASYNC_FUNCTION,
+    Token.T_GENERATOR,
+    Token.T_ASYNC_GENERATOR,
+)
+
+# expressions which are free of side effects, without looking at the children
+_pure_leaf_types = {
+    Token.T_NUMBER,
+    Token.T_STRING,
+    Token.T_REGEX,
+    Token.T_TEXT,
+    Token.T_ANONYMOUS_FUNCTION,
+    Token.T_ASYNC_ANONYMOUS_FUNCTION,
+    Token.T_ANONYMOUS_GENERATOR,
+    Token.T_ASYNC_ANONYMOUS_GENERATOR,
+    Token.T_LAMBDA,
+}
+
+# expressions which are free of side effects when the children are
+_pure_node_types = {
+    Token.T_LIST,
+    Token.T_GROUPING,
+    Token.T_TEMPLATE_STRING,
+    Token.T_TEMPLATE_EXPRESSION,
+    Token.T_TERNARY,
+    Token.T_BINARY,
+    Token.T_LOGICAL_AND,
+    Token.T_LOGICAL_OR,
+    Token.T_NULLISH_COALESCING,
+}
+
+_pure_keywords = {"true", "false", "null", "undefined", "this"}
+
+_pure_prefix = {"-", "+", "!", "~", "typeof", "void"}
+
+def isPure(token):
+    """
+    returns true if evaluating the expression has no side effects
+    """
+    type_ = token.type
+
+    if type_ in _pure_leaf_types:
+        return True
+
+    if type_ in _pure_node_types:
+        return all(isPure(child) for child in token.children)
+
+    if type_ == Token.T_KEYWORD:
+        return token.value in _pure_keywords
+
+    if type_ == Token.T_PREFIX:
+        return token.value in _pure_prefix and isPure(token.children[0])
+
+    if type_ == Token.T_OBJECT:
+        for child in token.children:
+            if child.type == Token.T_TEXT:
+                continue
+            if child.type == Token.T_BINARY and child.value == ":":
+                key, value = child.children
+                if key.type != Token.T_LIST and isPure(value):
+                    continue
+            elif child.type in _function_types and child.children[0].type == Token.T_TEXT:
+                continue
+            return False
+        return True
+
+    return False
+
+def _isPureClass(token):
+    """
+    returns true if defining the class has no side effects
+    """
+    _, extends, block = token.children
+    if any(child.type != Token.T_TEXT for child in extends.children):
+        return False
+
+    for child in block.children:
+        if child.type == Token.T_METHOD:
+            # a computed method name is evaluated when the class is defined
+            if child.children[0].type != Token.T_TEXT:
+                return False
+        elif child.type == Token.T_ASSIGN:
+            # instance properties are evaluated when the class is constructed
+            if child.children[0].type != Token.T_TEXT:
+                return False
+        elif child.type == Token.T_STATIC_PROPERTY:
+            prop = child.children[0]
+            if prop.type == Token.T_ASSIGN:
+                if prop.children[0].type != Token.T_TEXT or not isPure(prop.children[1]):
+                    return False
+            elif prop.type != Token.T_TEXT:
+                return False
+        else:
+            return False
+    return True
+
+def scanStatement(token):
+    """
+    returns the names defined by a top level statement, and true if the
+    statement can be removed when none of the names are used
+    """
+    type_ = token.type
+
+    if type_ in _function_types:
+        return [token.children[0].value], True
+
+    if type_ == Token.T_CLASS:
+        return [token.children[0].value], _isPureClass(token)
+
+    if type_ == Token.T_VAR:
+        names = []
+        removable = True
+        for child in token.children:
+            if child.type == Token.T_TEXT:
+                names.append(child.value)
+            elif child.type == Token.T_ASSIGN and child.children[0].type == Token.T_TEXT:
+                names.append(child.children[0].value)
+                removable = removable and isPure(child.children[1])
+            else:
+                # a destructuring assignment may throw
+                names.extend(sorted(getNames(child.children[0])))
+                removable = False
+        return names, removable
+
+    return [], False
+
+def getNames(token):
+    """
+    returns the set of names which appear in the ast
+    """
+    names = set()
+    stack = [token]
+    while stack:
+        token = stack.pop()
+        if token.type == Token.T_TEXT:
+            names.add(token.value)
+        stack.extend(token.children)
+    return names
+
+class ModuleShake(object):
+    """
+    the statements, imports and exports of a module which are kept
+    """
+
+    def __init__(self, exports, module_imports, removed, removed_names):
+        super(ModuleShake, self).__init__()
+        # the exported names which are used by another module
+        self.exports = exports
+        # module name => {imported name: local name} which are used
+        self.module_imports = module_imports
+        # file path => ids of the top level statements which are removed
+        self.removed = removed
+        # file path => names defined by the removed statements
+        self.removed_names = removed_names
+
+    def __eq__(self, other):
+        return isinstance(other, ModuleShake) and \
+            self.exports == other.exports and \
+            self.module_imports == other.module_imports and \
+            self.removed == other.removed
+
+    def __ne__(self, other):
+        return not self == other
+
+    def names(self):
+        """
+        returns the sorted names of every removed declaration
+        """
+        return sorted(set().union(*self.removed_names.values()))
+
+    def filterFile(self, jsf, ast):
+        """
+        returns the ast and exports of a file without the removed statements
+
+        ast: the ast of the file which was shaken
+        """
+        removed = self.removed.get(jsf.path, None)
+        if not removed:
+            return ast, jsf.exports
+
+        ast = Token(Token.T_MODULE, 0, 0, "",
+            [child for child in ast.children if id(child) not in removed])
+        names = self.removed_names[jsf.path]
+        exports = [name for name in jsf.exports if name not in names]
+        return ast, exports
+
+class TreeShaker(object):
+    """
+    find the statements of each module which are not used
+    """
+
+    def __init__(self, order):
+        """
+        order: the modules of the program, sorted so that each module
+            follows the modules it imports
+        """
+        super(TreeShaker, self).__init__()
+        self.order = order
+        self.name2mod = {mod.name(): mod for mod in order}
+
+        # the first part of a module name is a global variable
+        self.global_names = {}
+        for name in self.name2mod:
+            self.global_names.setdefault(name.split('.')[0], []).append(name)
+
+        # module name => exported names which are used
+        self.used = {name: set() for name in self.name2mod}
+        # modules which are used by name, every export is kept
+        self.whole = set()
+
+    def use(self, modname, names):
+        """
+        mark exported names of a module as used by code outside of the program
+        """
+        if modname in self.used:
+            self.used[modname].update(names)
+
+    def shake(self):
+        """
+        returns a dictionary of module name => ModuleShake
+        """
+        results = {}
+        visited = {}
+        changed = True
+        while changed:
+            # a module is visited after every module which imports it,
+            # unless it is used by name
+            changed = False
+            for mod in reversed(self.order):
+                name = mod.name()
+                key = (len(self.used[name]), name in self.whole)
+                if visited.get(name, None) != key:
+                    visited[name] = key
+                    results[name] = self._shakeModule(mod)
+                    changed = True
+        return results
+
+    def _shakeModule(self, mod):
+
+        modname = mod.name()
+        whole = modname in self.whole
+
+        # file path => list of (statement, names, removable)
+        statements = {}
+        # file path => name => indices of the statements defining the name
+        defined = {}
+        # name => paths of the files which export the name
+        exported = {}
+        for path, jsf in mod.files.items():
+            stmts = []
+            names = {}
+            for token in mod.foldedAST(jsf).children:
+                stmt_names, removable = scanStatement(token)
+                for name in stmt_names:
+                    names.setdefault(name, []).append(len(stmts))
+                stmts.append((token, stmt_names, removable))
+            statements[path] = stmts
+            defined[path] = names
+            for name in jsf.exports:
+                exported.setdefault(name, []).append(path)
+
+        # local name => (module name, imported name)
+        imported = {}
+        for other, names in mod.module_imports.items():
+            for src, dst in names.items():
+                imported[dst] = (other, src)
+        # the argument names of the module function are the last part
+        # of the name of each imported module
+        arguments = {}
+        for other in mod.module_imports:
+            arguments.setdefault(other.split('.')[-1], []).append(other)
+
+        kept = set()
+        queue = []
+        used_imports = set()
+
+        def keep(path, index):
+            if (path, index) not in kept:
+                kept.add((path, index))
+                queue.append((path, index))
+
+        def useModule(other):
+            if other in self.name2mod and other not in self.whole:
+                self.whole.add(other)
+
+        def resolveExport(name):
+            # a name in the scope of the module
+            found = False
+            for path in exported.get(name, ()):
+                for index in defined[path].get(name, ()):
+                    keep(path, index)
+                    found = True
+            if not found and name in imported:
+                used_imports.add(name)
+                found = True
+            return found
+
+        def resolve(path, name):
+            indices = defined[path].get(name, None)
+            if indices is not None:
+                for index in indices:
+                    keep(path, index)
+            elif resolveExport(name):
+                pass
+            elif name in arguments:
+                for other in arguments[name]:
+                    useModule(other)
+            elif name in self.global_names:
+                for other in self.global_names[name]:
+                    useModule(other)
+
+        for path, stmts in statements.items():
+            for index, (_, _, removable) in enumerate(stmts):
+                if not removable:
+                    keep(path, index)
+
+        if whole:
+            exports = set(mod.module_exports)
+        else:
+            exports = self.used[modname] & mod.module_exports
+        for name in exports:
+            resolveExport(name)
+
+        while queue:
+            path, index = queue.pop()
+            token = statements[path][index][0]
+            if token.type == Token.T_IMPORT:
+                # import module with {names}
+                self.use(token.value, getNames(token))
+            for name in getNames(token):
+                resolve(path, name)
+
+        for other, names in mod.module_imports.items():
+            for src, dst in names.items():
+                if dst in used_imports:
+                    self.use(other, [src])
+
+        removed = {}
+        removed_names = {}
+        for path, stmts in statements.items():
+            ids = set()
+            names = set()
+            for index, (token, stmt_names, _) in enumerate(stmts):
+                if (path, index) not in kept:
+                    ids.add(id(token))
+                    names.update(stmt_names)
+            if ids:
+                # a name may also be defined by a statement which is kept
+                for index, (_, stmt_names, _) in enumerate(stmts):
+                    if (path, index) in kept:
+                        names.difference_update(stmt_names)
+                removed[path] = ids
+                removed_names[path] = names
+
+        module_imports = {other: {src: dst for src, dst in names.items() if dst in used_imports}
+            for other, names in mod.module_imports.items()}
+
+        return ModuleShake(exports, module_imports, removed, removed_names)
@@ -617,29 +617,34 @@ class VmCompiler(object):
 
         fnidx = 0
 
+        C_INSTRUCTION = VmCompiler.C_INSTRUCTION
+        C_VISIT = VmCompiler.C_VISIT
+        C_LOOP_END = VmCompiler.C_LOOP_END
+        visit_actions = self.visit_actions
+
         while fnidx < len(self.module.functions):
             self.fn = self.module.functions[fnidx]
-            self.seq = [(0,  VmCompiler.C_VISIT, self.fn.ast)]
+            self.seq = seq = [(0,  C_VISIT, self.fn.ast)]
             self.fn_jumps = {}
 
             self.target_continue = []
             self.target_break = []
 
-            while self.seq:
-                depth, state, obj = self.seq.pop()
+            while seq:
+                depth, state, obj = seq.pop()
 
-                if state & VmCompiler.C_INSTRUCTION:
+                if state & C_INSTRUCTION:
                     self._push_instruction(obj)
 
-                elif state & VmCompiler.C_VISIT:
+                elif state & C_VISIT:
 
-                    fn = self.visit_actions.get(obj.type, None)
+                    fn = visit_actions.get(obj.type, None)
                     if fn is not None:
                         fn(depth, state, obj)
                     else:
                         raise VmCompileError(obj, "token not supported for visit")
 
-                elif state & VmCompiler.C_LOOP_END:
+                elif state & C_LOOP_END:
                     self.target_continue.pop()
                     self.target_break.pop()
 
@@ -0,0 +1,268 @@
+
+"""
+watch a set of files for changes
+
+On linux the directories containing the files are watched using
+inotify, which is called using ctypes. Otherwise the modified time of
+every file is checked periodically.
+
+A javascript file created in one of a set of directories is also a
+change. This allows a build which failed because an included file did
+not exist to be run again once the file is created.
+
+Changes are debounced: the callback is called once the files have not
+changed for a short time, so that saving several files, or an editor
+which writes a file in several steps, results in a single call.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+_event_mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: int wd, uint32 mask, uint32 cookie, uint32 len
+_event_header = struct.Struct("iIII")
+
+def _loadInotify():
+    """
+    returns the c library if inotify is available, otherwise None
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+class InotifyBackend(object):
+    """
+    wait for changes to files using inotify
+    """
+
+    def __init__(self, libc):
+        super(InotifyBackend, self).__init__()
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # directory => watch descriptor
+        self.watches = {}
+        # watch descriptor => directory
+        self.directories = {}
+        self.paths = set()
+        # directories where a new javascript file is a change
+        self.created = set()
+
+    def update(self, paths, directories=()):
+        """ set the files, and the directories for new files, to watch """
+        self.paths = set(paths)
+        self.created = set(directories)
+        directories = {os.path.dirname(path) for path in self.paths} | self.created
+
+        for directory in list(self.watches):
+            if directory not in directories:
+                wd = self.watches.pop(directory)
+                del self.directories[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+        for directory in directories:
+            if directory not in self.watches:
+                wd = self.libc.inotify_add_watch(self.fd,
+                    os.fsencode(directory), _event_mask)
+                if wd >= 0:
+                    self.watches[directory] = wd
+                    self.directories[wd] = directory
+
+    def wait(self, timeout):
+        """
+        returns true if a watched file changed before the timeout
+        """
+        changed = False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        while readable:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _event_header.unpack_from(data, offset)
+                offset += _event_header.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                directory = self.directories.get(wd, None)
+                if directory is None:
+                    continue
+                name = os.fsdecode(name)
+                if os.path.join(directory, name) in self.paths:
+                    changed = True
+                elif directory in self.created and name.endswith(".js") and \
+                   mask & (IN_CREATE | IN_MOVED_TO):
+                    changed = True
+            readable, _, _ = select.select([self.fd], [], [], 0)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+        self.fd = -1
+
+class PollingBackend(object):
+    """
+    wait for changes to files by checking the modified time of each file
+    """
+
+    def __init__(self, interval=0.5):
+        super(PollingBackend, self).__init__()
+        self.interval = interval
+        # path => modified time, or None if the file does not exist
+        self.mtimes = {}
+        # directory => names of the javascript files in the directory
+        self.listings = {}
+
+    def _stat(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _list(self, directory):
+        try:
+            return {name for name in os.listdir(directory) if name.endswith(".js")}
+        except OSError:
+            return set()
+
+    def update(self, paths, directories=()):
+        """ set the files, and the directories for new files, to watch """
+        self.mtimes = {path: self.mtimes[path] if path in self.mtimes else self._stat(path)
+            for path in paths}
+        self.listings = {directory: self.listings[directory]
+            if directory in self.listings else self._list(directory)
+            for directory in directories}
+
+    def wait(self, timeout):
+        """
+        returns true if a watched file changed before the timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            changed = False
+            for path, mtime in self.mtimes.items():
+                current = self._stat(path)
+                if current != mtime:
+                    self.mtimes[path] = current
+                    changed = True
+            for directory, names in self.listings.items():
+                current = self._list(directory)
+                if current - names:
+                    changed = True
+                self.listings[directory] = current
+            remaining = deadline - time.time()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+class FileWatcher(object):
+    """
+    call a function from a background thread when a watched file changes
+
+    callback: a function which takes no arguments
+    debounce: the time in seconds to wait for more changes before
+        calling the callback
+    poll: when true use the polling backend even if inotify is available
+    """
+
+    def __init__(self, callback, debounce=0.2, poll=False):
+        super(FileWatcher, self).__init__()
+        self.callback = callback
+        self.debounce = debounce
+
+        libc = None if poll else _loadInotify()
+        self.backend = None
+        if libc is not None:
+            try:
+                self.backend = InotifyBackend(libc)
+            except OSError:
+                self.backend = None
+        if self.backend is None:
+            self.backend = PollingBackend()
+
+        self.lock = threading.Lock()
+        self.paths = None
+        self.directories = ()
+        self.thread = None
+        self.alive = False
+
+    def watch(self, paths, directories=()):
+        """
+        set the files to watch. can be called from any thread
+
+        directories: a javascript file created in one of these
+            directories is also a change
+        """
+        with self.lock:
+            self.paths = set(paths)
+            self.directories = set(directories)
+
+    def _update(self):
+        with self.lock:
+            paths, self.paths = self.paths, None
+            directories = self.directories
+        if paths is not None:
+            self.backend.update(paths, directories)
+
+    def start(self):
+        self._update()
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.alive = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.backend.close()
+
+    def _run(self):
+        while self.alive:
+            self._update()
+            if not self.backend.wait(0.5):
+                continue
+            # wait until the files stop changing
+            while self.alive and self.backend.wait(self.debounce):
+                pass
+            if self.alive:
+                try:
+                    self.callback()
+                except Exception as e:
+                    sys.stderr.write("error: file watcher callback failed: %s\n" % e)
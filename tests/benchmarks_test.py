@@ -0,0 +1,61 @@
+#! cd .. && python3 -m tests.benchmarks_test
+
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from daedalus.builder import Builder
+from benchmarks.project import generate_project
+from benchmarks.suite import run, compare
+
+class BenchmarkSuiteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_generate_project(self):
+
+        path = generate_project(self.tmpdir, modules=4, files=2, fanout=3)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "mod3", "file1.js")))
+
+        builder = Builder([self.tmpdir], {})
+        builder.cache = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            css, js, html = builder.build(path)
+        self.assertIsNone(builder.error)
+        self.assertIn("value3", js)
+        self.assertIn("margin-left", css)
+
+        # every module is imported by a later module
+        with open(os.path.join(self.tmpdir, "mod3", "mod3.js")) as rf:
+            text = rf.read()
+        for m in range(3):
+            self.assertIn("from module mod%d " % m, text)
+
+    def test_002_run(self):
+
+        results = run(self.tmpdir, ["lexer", "build_edit"], 1, modules=2, files=1)
+        self.assertEqual(set(results["results"]), {"lexer", "build_edit"})
+        self.assertEqual(results["options"], {"modules": 2, "files": 1})
+
+    def test_003_compare(self):
+
+        baseline = {"results": {"lexer": 1.0, "parser": 2.0, "minify": 1.0}}
+        current = {"results": {"lexer": 1.05, "parser": 3.0, "build_cold": 1.0}}
+        rows = compare(baseline, current, 0.1)
+        self.assertEqual([(row[0], row[4]) for row in rows],
+            [("lexer", False), ("parser", True)])
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
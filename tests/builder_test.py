@@ -1,11 +1,14 @@
 #! cd .. && python3 -m tests.builder_test
 
+import io
 import unittest
 from tests.util import parsecmp, TOKEN
 
 from daedalus.lexer import Lexer
 from daedalus.parser import Parser
-from daedalus.builder import buildFileIIFI, buildModuleIIFI, Builder
+from daedalus.token import Token
+from daedalus.builder import buildFileIIFI, buildModuleIIFI, Builder, \
+    sort_dependencies, merge_ast, concat_ast
 
 class FileIIFIOpTestCase(unittest.TestCase):
 
@@ -118,6 +121,43 @@ class ModuleIIFIOpTestCase(unittest.TestCase):
 
         self.assertFalse(parsecmp(expected, mod, False))
 
+class SortDependenciesTestCase(unittest.TestCase):
+
+    def test_001_diamond(self):
+
+        graph = {"a": ["b", "c"], "b": ["d"], "c": ["e", "d"], "d": [], "e": ["d"]}
+        order, cycle = sort_dependencies("a", graph.__getitem__)
+        self.assertIsNone(cycle)
+        self.assertEqual(order, ["d", "e", "b", "c", "a"])
+
+    def test_001_wide_fan_in(self):
+
+        # the number of paths from the root doubles with every layer
+        graph = {}
+        for i in range(60):
+            graph[(i, 0)] = [(i + 1, 0), (i + 1, 1)]
+            graph[(i, 1)] = [(i + 1, 0), (i + 1, 1)]
+        graph[(60, 0)] = []
+        graph[(60, 1)] = []
+        order, cycle = sort_dependencies((0, 0), graph.__getitem__)
+        self.assertIsNone(cycle)
+        self.assertEqual(order[:2], [(60, 0), (60, 1)])
+        self.assertEqual(order[-1], (0, 0))
+        self.assertEqual(len(order), 121)
+
+    def test_002_cycle(self):
+
+        graph = {"a": ["b"], "b": ["c"], "c": ["d", "e"], "d": ["b"], "e": []}
+        order, cycle = sort_dependencies("a", graph.__getitem__)
+        self.assertIsNone(order)
+        self.assertEqual(cycle, ["b", "c", "d", "b"])
+
+        order, cycle = sort_dependencies("a", {"a": ["b"], "b": ["a"]}.__getitem__)
+        self.assertEqual(cycle, ["a", "b", "a"])
+
+        order, cycle = sort_dependencies("a", {"a": ["a"]}.__getitem__)
+        self.assertEqual(cycle, ["a", "a"])
+
 class BuilderTestTestCase(unittest.TestCase):
 
     def test_001_build(self):
@@ -131,6 +171,83 @@ class BuilderTestTestCase(unittest.TestCase):
         css, js, html = builder.build(path, minify=True, onefile=True)
 
         return
+
+    def test_002_scan_dependencies(self):
+
+        path = "res/daedalus_test/daedalus_test.js"
+
+        builder = Builder([], {})
+        graph = builder.scanDependencies(path)
+        self.assertEqual([modname for modname, _, _, _ in graph],
+            ["daedalus_test", "unittest", "daedalus"])
+
+        # the graph matches the modules found by parsing every file
+        builder = Builder([], {})
+        builder.cache = None
+        builder.discover(path)
+        self.assertEqual({index_path: set(files) for _, index_path, files, _ in graph},
+            {index_path: set(jsm.files) for index_path, jsm in builder.modules.items()})
+        for _, index_path, _, module_imports in graph:
+            self.assertEqual(module_imports, builder.modules[index_path].module_imports)
+
+    def test_003_parallel_load(self):
+
+        path = "res/daedalus_test/daedalus_test.js"
+
+        builder = Builder([], {})
+        builder.cache = None
+        expected = builder.build(path, minify=True, onefile=True)
+
+        builder = Builder([], {})
+        builder.cache = None
+        builder.jobs = 2
+        self.assertEqual(builder.build(path, minify=True, onefile=True), expected)
+        self.assertEqual(builder.preloaded, {})
+
+    def test_004_modify_ast(self):
+
+        path = "res/daedalus_test/daedalus_test.js"
+
+        for minify in (False, True):
+            builder = Builder([], {})
+            builder.cache = None
+            expected = builder.build(path, minify=minify, onefile=True)
+
+            # the files are loaded again after the asts are modified
+            builder = Builder([], {})
+            builder.cache = None
+            builder.copy_ast = False
+            self.assertEqual(builder.build(path, minify=minify, onefile=True), expected)
+            self.assertEqual(builder.build(path, minify=minify, onefile=True), expected)
+
+    def test_005_stream_output(self):
+
+        path = "res/daedalus_test/daedalus_test.js"
+
+        for minify in (False, True):
+            builder = Builder([], {})
+            builder.cache = None
+            css, js, html = builder.build(path, minify=minify, sourcemap=True)
+            expected = (css, html, builder.sourcemap)
+
+            # the javascript is written to the file instead of returned
+            builder = Builder([], {})
+            builder.cache = None
+            builder.copy_ast = False
+            output = io.StringIO()
+            css, js2, html = builder.build(path, minify=minify, sourcemap=True, output=output)
+            self.assertEqual(js2, "")
+            self.assertEqual(output.getvalue(), js)
+            self.assertEqual((css, html, builder.sourcemap), expected)
+
+    def test_006_concat_ast(self):
+
+        asts = [Token(Token.T_MODULE, 0, 0, "", [Token(Token.T_NUMBER, 0, 0, str(i))])
+            for i in range(3)]
+        ast = concat_ast(asts)
+        self.assertEqual([child.value for child in ast.children], ["0", "1", "2"])
+        self.assertEqual(merge_ast(merge_ast(asts[0], asts[1]), asts[2]).children, ast.children)
+
 def main():
     unittest.main()
 
@@ -0,0 +1,122 @@
+#! cd .. && python3 -m tests.cache_test
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from daedalus.lexer import Lexer
+from daedalus.cache import AstCache
+from daedalus.builder import JsFile
+
+class AstCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, "cache")
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_key(self):
+
+        cache = AstCache(self.cache_dir)
+        key = cache.key("x = 1", {}, "mod", 1)
+        self.assertEqual(key, cache.key("x = 1", {}, "mod", 1))
+        self.assertNotEqual(key, cache.key("x = 2", {}, "mod", 1))
+        self.assertNotEqual(key, cache.key("x = 1", {"preserve_documentation": True}, "mod", 1))
+        self.assertNotEqual(key, cache.key("x = 1", {}, "mod2", 1))
+
+    def test_001_get_put(self):
+
+        cache = AstCache(self.cache_dir)
+        key = cache.key("x = 1", {})
+        self.assertIsNone(cache.get(key))
+        self.assertTrue(cache.put(key, (1, [2, 3])))
+        self.assertEqual(cache.get(key), (1, [2, 3]))
+
+        # a second process sharing the directory
+        other = AstCache(self.cache_dir)
+        self.assertEqual(other.get(key), (1, [2, 3]))
+
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "writes": 1, "evictions": 0})
+        self.assertEqual(os.listdir(os.path.dirname(cache._path(key))), [key[2:]])
+
+    def test_001_corrupt_entry(self):
+
+        cache = AstCache(self.cache_dir)
+        key = cache.key("x = 1", {})
+        cache.put(key, ("data",))
+        with open(cache._path(key), "wb") as wb:
+            wb.write(b"\x80\x05")
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.misses, 1)
+
+    def test_002_evict(self):
+
+        cache = AstCache(self.cache_dir, max_size=2500)
+        keys = [cache.key("x = %d" % i, {}) for i in range(5)]
+        for i, key in enumerate(keys):
+            cache.put(key, ("x" * 1000,))
+            # use the first entry, so that it is the most recently used
+            os.utime(cache._path(key), (i, i))
+            os.utime(cache._path(keys[0]), (10, 10))
+
+        self.assertEqual(cache.evictions, 3)
+        self.assertLessEqual(cache.size, 2500)
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[4]))
+        for key in keys[1:4]:
+            self.assertIsNone(cache.get(key))
+
+    def test_002_overwrite(self):
+
+        cache = AstCache(self.cache_dir)
+        key = cache.key("x = 1", {})
+        cache.put(key, ("x" * 1000,))
+        size = cache.size
+
+        # replacing an entry does not change the size
+        cache.put(key, ("x" * 1000,))
+        self.assertEqual(cache.size, size)
+        cache.put(key, ("x" * 500,))
+        self.assertEqual(cache.size, size - 500)
+        self.assertEqual(cache.size, os.stat(cache._path(key)).st_size)
+
+    def test_003_jsfile(self):
+
+        path = os.path.join(self.tmpdir, "mod.js")
+        with open(path, "w") as wf:
+            wf.write("export const x = 1\n")
+
+        cache = AstCache(self.cache_dir)
+        jsf = JsFile(path, "mod", quiet=True)
+        jsf.cache = cache
+        jsf.load()
+        self.assertEqual(cache.writes, 1)
+
+        # a new checkout with an identical file, and an older mtime
+        os.utime(path, (0, 0))
+        with mock.patch.object(Lexer, "lex", side_effect=AssertionError("lexed")):
+            jsf2 = JsFile(path, "mod", quiet=True)
+            jsf2.cache = cache
+            jsf2.load()
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(jsf2.exports, jsf.exports)
+        self.assertEqual(jsf2.ast.toString(1), jsf.ast.toString(1))
+
+        # modified content is a miss
+        with open(path, "w") as wf:
+            wf.write("export const x = 2\n")
+        jsf2.load()
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.writes, 2)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
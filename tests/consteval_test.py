@@ -6,6 +6,7 @@ from tests.util import parsecmp, TOKEN
 from daedalus.lexer import Lexer
 from daedalus.parser import Parser
 from daedalus.transform import TransformIdentityScope, TransformConstEval
+from daedalus.formatter import Formatter
 
 text1 = """
     const a = "hello" + ' world'
@@ -167,6 +168,89 @@ class ConstEvalTestCase(unittest.TestCase):
 
         self.assertFalse(parsecmp(expected, ast, False))
 
+class ConstEvalFoldTestCase(unittest.TestCase):
+
+    def fold(self, text, scope=False):
+        parser = Parser()
+        parser.disable_all_warnings = True
+        if not scope:
+            parser.transforms = [TransformConstEval(fold_branches=True)]
+        ast = parser.parse(Lexer().lex(text))
+        if scope:
+            xform = TransformIdentityScope()
+            xform.disable_warnings = True
+            xform.transform(ast)
+            TransformConstEval(fold_branches=True).transform(ast)
+        return Formatter({"minify": True}).format(ast)
+
+    def test_001_compare(self):
+
+        self.assertEqual(self.fold("""
+            const a = ["qt" === "web", 1 < 2, "a" != "a", null == undefined,
+                null === undefined, 1 == "1", !false, !"", x === 1]
+        """), "const a=[false,true,false,true,false,1==\"1\",true,true,x===1]")
+
+    def test_002_logical(self):
+
+        self.assertEqual(self.fold("""
+            const a = [(false && f()) || g(), true && x, 0 || y, null ?? 2,
+                1 ? p : q, ("a" === "b") ? p : q, x ? p : q]
+        """), "const a=[g(),x,y,2,p,q,x?p:q]")
+
+    def test_003_branch(self):
+
+        self.assertEqual(self.fold("""
+            if (true) { a() } else { b() }
+            if (false) { a() } else if (1 === 2) { b() } else { c() }
+            if (0) { d() }
+            if (1) { const x = 1; e(x) }
+            if (x) { f() } else if (false) { g() }
+            function h() { if ("") return 1; else return 2 }
+        """), "a();c();{const x=1;e(x)}if(x){f()}function h(){return 2}")
+
+    def test_004_branch_var(self):
+
+        # a var declared in the removed branch is still defined
+        self.assertEqual(self.fold("""
+            if (false) { var x = 1 } else { f() }
+            if (false) { function g() { var y } }
+        """), "if(false){var x=1}else{f()}")
+
+    def test_005_const_reference(self):
+
+        self.assertEqual(self.fold("""
+            const platform = "qt"
+            const isQt = platform === "qt"
+            function f() { return isQt ? 1 : 2 }
+            if (platform !== "qt") { g() }
+            let other = "web"
+            if (other === "web") { h() }
+        """, True), "const platform=\"qt\";const isQt=true;function f(){return 1};"
+            "let other=\"web\";if(other===\"web\"){h()}")
+
+    def test_006_branch_label(self):
+
+        # the labeled statement is replaced, and the label is kept
+        self.assertEqual(self.fold("""
+            function f(x) { outer: if (false) { x() } }
+            function g(x) { outer: if (false) { x() } return 1 }
+            function h(x) { outer: if (true) { x(); break outer } }
+        """), "function f(x){outer:{}}function g(x){outer:{}return 1}"
+            "function h(x){outer:{x();break outer}}")
+
+    def test_007_disabled(self):
+
+        # by default only arithmetic is evaluated
+        parser = Parser()
+        parser.disable_all_warnings = True
+        parser.transforms = [TransformConstEval()]
+        ast = parser.parse(Lexer().lex("""
+            const a = [1 + 2, 1 < 2, !false, true && x, 1 ? p : q]
+            if (false) { f() }
+        """))
+        self.assertEqual(Formatter({"minify": True}).format(ast),
+            "const a=[3,1<2,!false,true&&x,1?p:q];if(false){f()}")
+
 def main():
     unittest.main()
 
@@ -0,0 +1,111 @@
+#! cd .. && python3 -m tests.fold_test
+
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from daedalus.builder import Builder
+from daedalus.incremental import IncrementalBuilder
+
+class ConstantFoldTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.write("app/app.js",
+            "from module config import {target}\n"
+            "function desktop() {\n"
+            "    return 'desktop'\n"
+            "}\n"
+            "function mobile() {\n"
+            "    return 'mobile'\n"
+            "}\n"
+            "export function main() {\n"
+            "    if (target === 'mobile') {\n"
+            "        return mobile()\n"
+            "    } else {\n"
+            "        return desktop()\n"
+            "    }\n"
+            "}\n"
+            "export const verbose = config.debug ? 'yes' : 'no'\n"
+            "export const mode = title + (debug && '!')\n"
+            "export function shift(k) {\n"
+            "    return [k - offset, -offset, k - config.scale]\n"
+            "}\n")
+        self.write("config/config.js",
+            "export function version() {\n"
+            "    return 1\n"
+            "}\n")
+        self.path = os.path.join(self.tmpdir, "app", "app.js")
+        self.static_data = {
+            "config": {"target": "desktop", "debug": False, "scale": -0.5},
+            "app": {"title": "demo", "debug": False, "offset": -1},
+        }
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as wf:
+            wf.write(text)
+
+    def build(self, builder, fold_constants=True):
+        builder.cache = None
+        builder.fold_constants = fold_constants
+        with contextlib.redirect_stdout(io.StringIO()):
+            css, js, html = builder.build(self.path)
+        self.assertIsNone(builder.error)
+        return js.replace(" ", "")
+
+    def test_001_fold(self):
+
+        builder = Builder([self.tmpdir], self.static_data)
+        js = self.build(builder)
+
+        # the branch which is not taken is removed, and the function
+        # which it used is removed by tree shaking
+        self.assertIn("returndesktop()", js)
+        self.assertNotIn("mobile", js)
+        self.assertEqual(builder.shake_report["app"], ["mobile"])
+
+        # imported names, attributes of a module, and the static
+        # data of the module are replaced
+        self.assertIn("constverbose='no'", js)
+        self.assertIn("constmode=\"demo\"+(false)", js)
+
+        # a negative value is not joined to the operator before it
+        self.assertIn("return[k-(-1),-(-1),k-(-0.5)]", js)
+
+        # the static data is still exported
+        self.assertIn("consttarget=\"desktop\"", js)
+
+    def test_002_disabled(self):
+
+        builder = Builder([self.tmpdir], self.static_data)
+        js = self.build(builder, False)
+        self.assertIn("if(target==='mobile')", js)
+        self.assertIn("returnmobile()", js)
+        self.assertIn("config.debug?'yes':'no'", js)
+
+    def test_003_incremental(self):
+
+        builder = IncrementalBuilder([self.tmpdir], self.static_data)
+        js = self.build(builder)
+        mod = builder.modules[os.path.join(self.tmpdir, "app", "app.js")]
+        folded = mod.folded
+
+        # the folded ast is reused when the file is not modified
+        self.assertEqual(self.build(builder), js)
+        self.assertIs(mod.folded[mod.index_js.path], folded[mod.index_js.path])
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
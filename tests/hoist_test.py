@@ -0,0 +1,113 @@
+#! cd .. && python3 -m tests.hoist_test
+
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+import subprocess
+
+from daedalus.builder import Builder
+
+class ScopeHoistTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.write("app/app.js",
+            "from module lib import {twice}\n"
+            "include './other.js'\n"
+            "export function main() {\n"
+            "    const helper = 3\n"
+            "    return [twice(helper), counter, {table}, lib.table.a]\n"
+            "}\n")
+        self.write("app/other.js",
+            "function helper() {\n"
+            "    return 5\n"
+            "}\n"
+            "export const counter = helper()\n"
+            "export const table = {a: 2}\n")
+        self.write("lib/lib.js",
+            "include './extra.js'\n"
+            "function helper(x) {\n"
+            "    return 2 * x\n"
+            "}\n"
+            "export function twice(x) {\n"
+            "    const {a: b} = table\n"
+            "    return helper(x) + b\n"
+            "}\n")
+        self.write("lib/extra.js",
+            "export const table = {a: 1}\n")
+        self.path = os.path.join(self.tmpdir, "app", "app.js")
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as wf:
+            wf.write(text)
+
+    def build(self, scope_hoist, minify=False):
+        builder = Builder([self.tmpdir], {})
+        builder.cache = None
+        builder.scope_hoist = scope_hoist
+        with contextlib.redirect_stdout(io.StringIO()):
+            css, js, html = builder.build(self.path, minify=minify)
+        self.assertIsNone(builder.error)
+        return builder, js
+
+    def test_001_hoist(self):
+
+        _, js = self.build(True)
+        js = js.replace(" ", "")
+
+        # every file is in one function
+        self.assertEqual(js.count("function(){"), 1)
+        self.assertIn("lib={};", js)
+        self.assertIn("app={};", js)
+
+        # colliding names are renamed
+        self.assertIn("functionhelper(x){", js)
+        self.assertIn("functionhelper$1(){", js)
+        self.assertIn("table$1={'a':2}", js)
+        self.assertIn("constcounter=helper$1()", js)
+
+        # imported names refer to the declaration, and local
+        # declarations are not renamed
+        self.assertIn("consthelper=3", js)
+        self.assertIn("return[twice(helper),counter,{'table':table$1},lib.table.a]", js)
+
+        # the exports are assigned to the module object
+        self.assertIn("Object.assign(lib,{'table':table,'twice':twice})", js)
+        self.assertIn("Object.assign(app,{'counter':counter,'main':main,'table':table$1})", js)
+
+    def test_002_disabled(self):
+
+        _, js = self.build(False)
+        self.assertIn("consttwice=lib.twice", js.replace(" ", ""))
+
+    @unittest.skipUnless(shutil.which("node"), "node is not installed")
+    def test_003_equivalent(self):
+
+        outputs = []
+        for scope_hoist in (False, True):
+            for minify in (False, True):
+                builder, js = self.build(scope_hoist, minify)
+                js += "\nconsole.log(JSON.stringify(%s.main()))\n" % builder.globals["app"]
+                proc = subprocess.run(["node", "-e", js], stdout=subprocess.PIPE,
+                    universal_newlines=True)
+                self.assertEqual(proc.returncode, 0)
+                outputs.append(proc.stdout)
+
+        self.assertEqual(outputs[0], '[7,5,{"table":{"a":2}},1]\n')
+        self.assertEqual(outputs, outputs[:1] * 4)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#! cd .. && python3 -m tests.incremental_test
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from daedalus.builder import Builder
+from daedalus.incremental import IncrementalBuilder
+
+class IncrementalBuilderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.write("app/app.js",
+            "include './view.js'\n"
+            "from module lib import {twice}\n"
+            "export function main() {\n"
+            "    return view(twice(2))\n"
+            "}\n")
+        self.write("app/view.js",
+            "function view(x) {\n"
+            "    return '' + x\n"
+            "}\n")
+        self.write("lib/lib.js",
+            "export function twice(x) {\n"
+            "    return 2 * x\n"
+            "}\n")
+        self.path = os.path.join(self.tmpdir, "app", "app.js")
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mtime = os.stat(path).st_mtime if os.path.exists(path) else 0
+        with open(path, "w") as wf:
+            wf.write(text)
+        # the modified time must change for the file to be reloaded
+        if os.stat(path).st_mtime <= mtime:
+            os.utime(path, (mtime + 1, mtime + 1))
+
+    def build(self, builder, minify=False):
+        builder.cache = None
+        css, js, html = builder.build(self.path, minify=minify, sourcemap=True)
+        self.assertIsNone(builder.error)
+        return js, builder.sourcemap
+
+    def full_build(self, minify=False):
+        return self.build(Builder([self.tmpdir], {}), minify)
+
+    def test_001_build(self):
+
+        builder = IncrementalBuilder([self.tmpdir], {})
+        self.assertEqual(self.build(builder), self.full_build())
+        self.assertEqual(builder.compiled_count, 2)
+
+        # nothing has changed
+        self.assertEqual(self.build(builder), self.full_build())
+        self.assertEqual(builder.compiled_count, 0)
+
+    def test_002_modify(self):
+
+        builder = IncrementalBuilder([self.tmpdir], {})
+        self.build(builder)
+
+        self.write("lib/lib.js",
+            "export function twice(x) {\n"
+            "    return x + x\n"
+            "}\n")
+        js, srcmap = self.build(builder)
+        self.assertEqual((js, srcmap), self.full_build())
+        self.assertIn("x+x", js)
+        self.assertEqual(builder.compiled_count, 1)
+
+        self.write("app/view.js",
+            "function view(x) {\n"
+            "    return 'value: ' + x\n"
+            "}\n")
+        self.assertEqual(self.build(builder), self.full_build())
+        self.assertEqual(builder.compiled_count, 1)
+
+    def test_003_minify(self):
+
+        builder = IncrementalBuilder([self.tmpdir], {})
+        self.assertEqual(self.build(builder, True), self.full_build(True))
+        self.assertEqual(self.build(builder), self.full_build())
+
+    def test_004_jobs(self):
+
+        builder = IncrementalBuilder([self.tmpdir], {})
+        builder.jobs = 2
+        self.assertEqual(self.build(builder), self.full_build())
+
+        # a rebuild only parses the modified files, and does not
+        # scan the dependencies of every file again
+        self.write("lib/lib.js",
+            "export function twice(x) {\n"
+            "    return x + x\n"
+            "}\n")
+        self.write("app/view.js",
+            "function view(x) {\n"
+            "    return 'value: ' + x\n"
+            "}\n")
+        with mock.patch.object(builder, "scanDependencies") as scan, \
+                mock.patch.object(builder, "_preloadTasks") as preload:
+            self.assertEqual(self.build(builder), self.full_build())
+        scan.assert_not_called()
+        tasks, = preload.call_args[0]
+        self.assertEqual(sorted(os.path.basename(task[0]) for task in tasks),
+            ["lib.js", "view.js"])
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,15 @@
 #! cd .. && python3 -m tests.lexer_test
 
 import io
+import os
+import sys
+import glob
+import mmap
+import tempfile
 import unittest
 
 from daedalus.lexer import Token, LexerBase, Lexer, LexError
-from tests.util import edit_distance
+from tests.util import edit_distance, engine_variant
 
 def tokcmp(a, b):
     if a is None:
@@ -532,6 +537,27 @@ class LexerStringTestCase(unittest.TestCase):
 
         self.assertFalse(lexcmp(expected, tokens, False))
 
+    def test_001_backtick_substitution(self):
+
+        text = " x = `a${b + c}\n${f(d)}` "
+        tokens = list(Lexer().lex(text))
+        tpl = tokens[2]
+        self.assertEqual(tpl.type, Token.T_TEMPLATE_STRING)
+        self.assertEqual([c.type for c in tpl.children], [Token.T_STRING,
+            Token.T_TEMPLATE_EXPRESSION, Token.T_STRING, Token.T_TEMPLATE_EXPRESSION])
+
+        # substitutions are lexed with positions relative to the template
+        expected = [
+            Token(Token.T_TEXT, 1, 10, 'b'),
+            Token(Token.T_SPECIAL, 1, 12, '+'),
+            Token(Token.T_TEXT, 1, 14, 'c'),
+        ]
+        expr = tpl.children[1].children
+        self.assertFalse(lexcmp(expected, expr, False))
+        self.assertEqual([(t.line, t.index) for t in expr], [(1, 10), (1, 12), (1, 14)])
+
+        self.assertEqual([t.value for t in tpl.children[3].children], ['f', '(', 'd', ')'])
+
     def test_001_join(self):
 
         text = " x = \"abc\" \"def\" "
@@ -588,6 +614,138 @@ class LexerLogicTestCase(unittest.TestCase):
 
         #self.assertFalse(lexcmp(expected, tokens, False))
 
+class RegexLexer(Lexer):
+    """ a lexer which always uses the regex engine """
+    def __init__(self, opts=None):
+        opts = dict(opts or {})
+        opts['engine'] = 'regex'
+        super(RegexLexer, self).__init__(opts)
+
+def regex_engine(cls):
+    """ create a copy of a lexer test case which uses the regex engine """
+    return engine_variant(cls, sys.modules[__name__], 'Lexer', RegexLexer, "RegexEngine")
+
+LexerInputRegexEngineTestCase = regex_engine(LexerInputTestCase)
+LexerInputErrorRegexEngineTestCase = regex_engine(LexerInputErrorTestCase)
+LexerBasicRegexEngineTestCase = regex_engine(LexerBasicTestCase)
+LexerCustomRegexEngineTestCase = regex_engine(LexerCustomTestCase)
+LexerStringRegexEngineTestCase = regex_engine(LexerStringTestCase)
+LexerLogicRegexEngineTestCase = regex_engine(LexerLogicTestCase)
+
+class LexerEngineTestCase(unittest.TestCase):
+    """ the regex engine must produce tokens identical to the default engine,
+    including the line and column of every token
+    """
+
+    def assertSameTokens(self, text, opts=None):
+        opts = dict(opts or {})
+        expected = Lexer(opts).lex(text)
+        opts['engine'] = 'regex'
+        actual = Lexer(opts).lex(text)
+        expected = [(t.type, t.value, t.line, t.index) for t in expected]
+        actual = [(t.type, t.value, t.line, t.index) for t in actual]
+        self.assertEqual(expected, actual)
+
+    def test_001_positions(self):
+        texts = [
+            "a / b\nc /= d\n/abc/g.test(x)",
+            "x = a /\n b",
+            "  s = 'abc' \n 'def' + \"x\\\ny\" + `a\nb ${c}`",
+            "function *gen() { yield * x; }",
+            "pyimport ..mod.sub",
+            "a?.b ?? c ??= d ? .5 : 1e-5",
+            "x = 1 + 2 ** 3 >>>= 4 !== 5 => 6",
+            "s = '\\U0001F600' // comment\n/* multi\nline */ y",
+            "ab\\\ncd\n\n\n  e",
+        ]
+        for text in texts:
+            for opts in ({}, {'preserve_documentation': True}):
+                self.assertSameTokens(text, opts)
+
+    def test_002_documentation(self):
+        text = " /** comment \n more text */ x /**/ y /*/ z"
+        self.assertSameTokens(text, {'preserve_documentation': True})
+
+    def test_003_first_token(self):
+        text = "a + b\nc / d"
+        expected = Lexer()
+        expected._first_token = (3, 7)
+        actual = Lexer({'engine': 'regex'})
+        actual._first_token = (3, 7)
+        expected = [(t.type, t.value, t.line, t.index) for t in expected.lex(text)]
+        actual = [(t.type, t.value, t.line, t.index) for t in actual.lex(text)]
+        self.assertEqual(expected, actual)
+
+    def test_004_source_files(self):
+        root = os.path.join(os.path.dirname(__file__), "..")
+        paths = glob.glob(os.path.join(root, "examples", "*.js"))
+        paths.append(os.path.join(root, "tests", "lexer.js"))
+        for path in paths:
+            with open(path) as rf:
+                text = rf.read()
+            for opts in ({}, {'preserve_documentation': True}):
+                self.assertSameTokens(text, opts)
+
+    def test_005_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            Lexer({'engine': 'unknown'})
+
+class LexerIterTokensTestCase(unittest.TestCase):
+    """ iter_tokens must yield the same tokens as lex """
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(__file__), "..", "examples", "minesweeper.js")
+        with open(path) as rf:
+            self.text = rf.read()
+
+    def assertSameTokens(self, expected, actual):
+        expected = [(t.type, t.value, t.line, t.index) for t in expected]
+        actual = [(t.type, t.value, t.line, t.index) for t in actual]
+        self.assertEqual(expected, actual)
+
+    def test_001_string(self):
+        for engine in ('default', 'regex'):
+            expected = Lexer({'engine': engine}).lex(self.text)
+            actual = Lexer({'engine': engine}).iter_tokens(self.text, batch_size=3)
+            self.assertSameTokens(expected, list(actual))
+
+    def test_002_stream(self):
+        expected = Lexer().lex(self.text)
+        for engine in ('default', 'regex'):
+            stream = io.StringIO(self.text)
+            actual = Lexer({'engine': engine}).iter_tokens(stream, batch_size=16)
+            self.assertSameTokens(expected, list(actual))
+
+            stream = io.BytesIO(self.text.encode("utf-8"))
+            actual = Lexer({'engine': engine}).iter_tokens(stream, batch_size=16)
+            self.assertSameTokens(expected, list(actual))
+
+    def test_003_mmap(self):
+        text = "const s = '\u00e9t\u00e9' // \u00e9\n" * 200
+        expected = Lexer().lex(text)
+        with tempfile.TemporaryFile() as wf:
+            wf.write(text.encode("utf-8"))
+            wf.flush()
+            for engine in ('default', 'regex'):
+                mm = mmap.mmap(wf.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    actual = Lexer({'engine': engine}).iter_tokens(mm)
+                    self.assertSameTokens(expected, list(actual))
+                finally:
+                    mm.close()
+
+    def test_004_error(self):
+        text = "x = 1\n" * 100 + "s = 'abc"
+        for engine in ('default', 'regex'):
+            with self.assertRaises(LexError) as e:
+                list(Lexer({'engine': engine}).iter_tokens(text, batch_size=4))
+            self.assertTrue("unterminated string" in str(e.exception))
+
+    def test_005_end_of_sequence(self):
+        for engine in ('default', 'regex'):
+            with self.assertRaises(LexError):
+                list(Lexer({'engine': engine}).iter_tokens("a ?"))
+
 def main():
     unittest.main()
 
@@ -1,11 +1,18 @@
 #! cd .. && python3 -m tests.parser_test
 
 
+import os
+import sys
+import glob
 import unittest
-from tests.util import parsecmp, TOKEN
+import pickle
+from tests.util import parsecmp, TOKEN, engine_variant
 
 from daedalus.lexer import Token, Lexer
-from daedalus.parser import Parser as ParserBase, ParseError
+from daedalus.parser import Parser as ParserBase, ParseError, LazyToken
+import daedalus.parser
+from daedalus.formatter import Formatter
+from daedalus import serialize
 from daedalus.transform import TransformError
 
 class Parser(ParserBase):
@@ -47,6 +54,23 @@ class ParserTestCase(unittest.TestCase):
             text = "["
             Parser().parse(Lexer().lex(text))
 
+    def test_001_parse_mismatched(self):
+
+        for text in ["(]", "([)]", "{ ) }", ")", "f(a))"]:
+            with self.assertRaises(ParseError):
+                Parser().parse(Lexer().lex(text))
+
+    def test_001_parse_nested(self):
+
+        depth = 2000
+        text = "x = " + "[" * depth + "1" + "]" * depth
+        ast = Parser().parse(Lexer().lex(text))
+        node = ast.children[0].children[1]
+        for _ in range(depth - 1):
+            self.assertEqual(node.type, Token.T_LIST)
+            node = node.children[0]
+        self.assertEqual(node.children[0].value, "1")
+
     def test_001_hard(self):
 
         text = """{[0](){}}"""
@@ -79,6 +103,33 @@ class ParserTestCase(unittest.TestCase):
                 TOKEN('T_TEXT', 'd')))
         self.assertFalse(parsecmp(expected, ast, False))
 
+    def test_003_iter_tokens(self):
+
+        text = """
+            const f = (a, b) => { return [a, {b}] }
+            f(1, 2)
+        """
+        expected = Parser().parse(Lexer().lex(text))
+        ast = Parser().parse(Lexer().iter_tokens(text, batch_size=2))
+        self.assertEqual(expected.toString(3), ast.toString(3))
+
+    def test_004_token_pickle(self):
+
+        text = """
+            const f = (a, b) => { return [a, {b}] }
+        """
+        ast = Parser().parse(Lexer().lex(text))
+        ast.children[0].ref_attr = 4
+        copy = pickle.loads(pickle.dumps(ast))
+        self.assertEqual(ast.toString(1), copy.toString(1))
+        self.assertEqual(copy.children[0].ref_attr, 4)
+
+        clone = ast.clone(value="module", ref_attr=2)
+        self.assertEqual(clone.value, "module")
+        self.assertEqual(clone.ref_attr, 2)
+        with self.assertRaises(AttributeError):
+            ast.clone(undefined_attribute=1)
+
 class ParserTypesTestCase(unittest.TestCase):
 
     def _test(self, text, expected):
@@ -643,6 +694,22 @@ class ParserBinOpTestCase(unittest.TestCase):
 
         self.assertFalse(parsecmp(expected, ast, False))
 
+    def test_001_binary_newline(self):
+
+        text = """x = (a
+            && b)"""
+        tokens = Lexer().lex(text)
+        ast = Parser().parse(tokens)
+        expected = TOKEN('T_MODULE', '',
+                    TOKEN('T_ASSIGN', '=',
+                        TOKEN('T_TEXT', 'x'),
+                        TOKEN('T_GROUPING', '()',
+                            TOKEN('T_LOGICAL_AND', '&&',
+                                TOKEN('T_TEXT', 'a'),
+                                TOKEN('T_TEXT', 'b')))))
+
+        self.assertFalse(parsecmp(expected, ast, False))
+
     def test_001_destructure_assign(self):
 
         text = "var [a,b,c] = d"
@@ -2052,6 +2119,160 @@ class ParserTypeAnnotationTestCase(unittest.TestCase):
                         TOKEN('T_KEYWORD', 'int')))))
         self.assertFalse(parsecmp(expected, ast, False))
 
+class PrattParser(ParserBase):
+    """ a parser which always uses the pratt engine """
+    def __init__(self):
+        super(PrattParser, self).__init__()
+        self.disable_all_warnings = True
+        self.engine = "pratt"
+
+def pratt_engine(cls):
+    """ create a copy of a parser test case which uses the pratt engine """
+    return engine_variant(cls, sys.modules[__name__], 'Parser', PrattParser, "PrattEngine")
+
+ParserPrattEngineTestCase = pratt_engine(ParserTestCase)
+ParserTypesPrattEngineTestCase = pratt_engine(ParserTypesTestCase)
+ParserUnaryOpPrattEngineTestCase = pratt_engine(ParserUnaryOpTestCase)
+ParserBinOpPrattEngineTestCase = pratt_engine(ParserBinOpTestCase)
+ParserBinOpErrorPrattEngineTestCase = pratt_engine(ParserBinOpErrorTestCase)
+ParserKeywordPrattEngineTestCase = pratt_engine(ParserKeywordTestCase)
+ParserFunctionPrattEngineTestCase = pratt_engine(ParserFunctionTestCase)
+ParserClassPrattEngineTestCase = pratt_engine(ParserClassTestCase)
+ParserChallengePrattEngineTestCase = pratt_engine(ParserChallengeTestCase)
+ParserModulePrattEngineTestCase = pratt_engine(ParserModuleTestCase)
+ParserTypeAnnotationPrattEngineTestCase = pratt_engine(ParserTypeAnnotationTestCase)
+
+class ParserEngineTestCase(unittest.TestCase):
+    """ the pratt engine must produce an AST identical to the default engine
+    """
+
+    def assertSameAst(self, text):
+        expected = Parser().parse(Lexer().lex(text))
+        ast = PrattParser().parse(Lexer().lex(text))
+        self.assertEqual(expected.toString(1), ast.toString(1))
+
+    def test_001_precedence(self):
+        self.assertSameAst("x = a + b * c ** d ** e - f / g % h << 2 >>> i")
+        self.assertSameAst("x = a < b == c != d & e ^ f | g ?? h && i || j |> k")
+        self.assertSameAst("x = a instanceof B && !c || d ? e + 1 : f * 2")
+
+    def test_001_newlines(self):
+        self.assertSameAst("x = a\n+\nb\n*\nc\ny = d\n\n-e\n")
+        self.assertSameAst("x = (a\n && b\n || c)")
+        self.assertSameAst("x = a ** b ** \n c")
+
+    def test_001_import_star(self):
+        self.assertSameAst("export * from './mod.js'\nx = a * b")
+
+    def test_001_invalid(self):
+        for text in ["x = a + ", "x = * b", "x = a + * b", "f(a, + b)", "return a * if",
+                "import * as mod from './mod.js'"]:
+            errors = []
+            for cls in (Parser, PrattParser):
+                try:
+                    errors.append(cls().parse(Lexer().lex(text)).toString(1))
+                except (ParseError, TransformError) as e:
+                    errors.append(str(e))
+            self.assertEqual(errors[0], errors[1], text)
+
+    def test_002_examples(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = glob.glob(os.path.join(root, "examples", "*.js"))
+        paths.append(os.path.join(root, "tests", "lexer.js"))
+        for path in paths:
+            with open(path) as rf:
+                self.assertSameAst(rf.read())
+
+    def test_002_unknown_engine(self):
+        parser = Parser()
+        parser.engine = "unknown"
+        with self.assertRaises(ValueError):
+            parser.parse(Lexer().lex("x = 1"))
+
+class ParserLazyFunctionTestCase(unittest.TestCase):
+
+    def parse(self, text, lazy=True):
+        parser = Parser()
+        parser.lazy_functions = lazy
+        return parser.parse(Lexer().lex(text))
+
+    def lazyTokens(self, ast):
+        # find the lazy tokens without parsing them
+        found = []
+        stack = [ast]
+        while stack:
+            token = stack.pop()
+            if isinstance(token, LazyToken):
+                found.append(token)
+                if not token.isParsed():
+                    continue
+            stack.extend(token.children)
+        return found
+
+    def test_001_deferred(self):
+        text = """
+            function f(a) { return a + 1 }
+            class A { m() { const x = {a: 1}; return x?.a } }
+            const g = (b) => { return b }
+        """
+        ast = self.parse(text)
+        tokens = self.lazyTokens(ast)
+        self.assertEqual(len(tokens), 2)
+        self.assertFalse(any(token.isParsed() for token in tokens))
+        self.assertEqual(ast.toString(1), self.parse(text, False).toString(1))
+        self.assertTrue(all(token.isParsed() for token in tokens))
+
+    def test_001_nested(self):
+        text = """
+            function f() {
+                function g() { return `${x}` }
+                return g
+            }
+        """
+        ast = self.parse(text)
+        outer, = self.lazyTokens(ast)
+        self.assertEqual(outer.children[1].type, Token.T_RETURN)
+        inner, = [token for token in self.lazyTokens(outer) if token is not outer]
+        self.assertFalse(inner.isParsed())
+        self.assertEqual(ast.toString(1), self.parse(text, False).toString(1))
+
+    def test_001_default(self):
+        # the default deferred group is parsed immediately
+        class EagerParser(Parser):
+            def defer_group(self, children, token):
+                return True
+            def deferred_group(self, token, span):
+                return daedalus.parser.ParserBase.deferred_group(self, token, span)
+
+        text = "function f(a) { return [a, (a + 1)] }"
+        ast = EagerParser().parse(Lexer().lex(text))
+        self.assertEqual(self.lazyTokens(ast), [])
+        self.assertEqual(ast.toString(1), self.parse(text, False).toString(1))
+
+    def test_001_error(self):
+        # an error in the body is raised when the body is parsed
+        ast = self.parse("function f() { x = (1 ]; }")
+        body, = self.lazyTokens(ast)
+        with self.assertRaises(ParseError):
+            body.children
+
+        with self.assertRaises(ParseError):
+            self.parse("function f() { x = (1; ")
+
+    def test_002_examples(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = glob.glob(os.path.join(root, "examples", "*.js"))
+        paths.append(os.path.join(root, "tests", "lexer.js"))
+        for path in paths:
+            with open(path) as rf:
+                text = rf.read()
+            expected = self.parse(text, False)
+            ast = self.parse(text)
+            self.assertEqual(Formatter().format(ast), Formatter().format(expected), path)
+            ast = self.parse(text)
+            self.assertEqual(serialize.loads(serialize.dumps((ast,)))[0].toString(1),
+                expected.toString(1), path)
+
 def main():
     unittest.main()
 
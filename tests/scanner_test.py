@@ -0,0 +1,116 @@
+#! cd .. && python3 -m tests.scanner_test
+
+import os
+import glob
+import unittest
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+from daedalus.transform import getModuleImportExport, TransformError
+from daedalus.scanner import scanImportExport
+
+def parse_import_export(text):
+    parser = Parser()
+    parser.disable_all_warnings = True
+    ast = parser.parse(Lexer().lex(text))
+    _, imports, module_imports, exports = getModuleImportExport(ast)
+    return imports, module_imports, exports
+
+class ScannerTestCase(unittest.TestCase):
+
+    def assertScan(self, text):
+        expected = parse_import_export(text)
+        self.assertEqual(scanImportExport(text), expected)
+        return expected
+
+    def test_001_import_module(self):
+
+        imports, module_imports, exports = self.assertScan(
+            "import module api.requests\n"
+            "import module daedalus with {a, b as c}\n"
+            "from module daedalus import {\n    d,\n    e\n}\n")
+        self.assertEqual(module_imports, {
+            "api.requests": {},
+            "daedalus": {"a": "a", "b": "c", "d": "d", "e": "e"},
+        })
+
+    def test_001_import_from(self):
+
+        imports, module_imports, exports = self.assertScan(
+            "import {a, b as c} from './a.js'\n"
+            "import {x} from '@daedalus/api/requests'\n"
+            "$import('util', {y: z})\n"
+            "include './b.js'\n"
+            "$include('./c.js')\n")
+        self.assertEqual(imports, {
+            "./a.js": {"a": "a", "b": "c"},
+            "./b.js": {},
+            "./c.js": {},
+        })
+        self.assertEqual(module_imports, {"api.requests": {"x": "x"}, "util": {"y": "z"}})
+
+    def test_001_not_an_import(self):
+
+        imports, module_imports, exports = self.assertScan(
+            "import daedalus with {a}\n"
+            "from daedalus import {a}\n"
+            "const s = 'import module x'\n"
+            "// import module y\n"
+            "function f() {\n    include = 1\n}\n")
+        self.assertEqual((imports, module_imports, exports), ({}, {}, []))
+
+    def test_002_export(self):
+
+        imports, module_imports, exports = self.assertScan(
+            "export const a = 1, b = f(x, y)\n"
+            "export let c = 1,\n    d = 2\n"
+            "export function e() {\n    return 1\n}\n"
+            "export class F extends G {\n}\n"
+            "export {h, i}\n"
+            "export j, k\n")
+        self.assertEqual(exports, ["a", "b", "c", "d", "e", "F", "h", "i", "j", "k"])
+
+    def test_002_export_from(self):
+
+        imports, module_imports, exports = self.assertScan(
+            "export * from './a.js'\n"
+            "export * from '@daedalus/api/b'\n")
+        self.assertEqual(imports, {"./a.js": {}})
+        self.assertEqual(module_imports, {"api.b": {"*": "*"}})
+        self.assertEqual(exports, ["api.b/*"])
+
+    def test_002_after_block(self):
+
+        # a statement which follows a block on the same line
+        imports, module_imports, exports = self.assertScan(
+            "function f() {} import module foo\n"
+            "class A {} export const q = 1\n"
+            "if (x) {} include './a.js'\n")
+        self.assertEqual(imports, {"./a.js": {}})
+        self.assertEqual(module_imports, {"foo": {}})
+        self.assertEqual(exports, ["q"])
+
+    def test_003_errors(self):
+
+        with self.assertRaises(TransformError):
+            scanImportExport("import {a} from './a'")
+
+        with self.assertRaises(TransformError):
+            scanImportExport("export * from 'a'")
+
+    def test_004_examples(self):
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = glob.glob(os.path.join(root, "res", "**", "*.js"), recursive=True)
+        paths += glob.glob(os.path.join(root, "examples", "*.js"))
+        self.assertTrue(paths)
+        for path in sorted(paths):
+            with open(path) as rf:
+                text = rf.read()
+            self.assertEqual(scanImportExport(text), parse_import_export(text), path)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
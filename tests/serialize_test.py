@@ -0,0 +1,94 @@
+#! cd .. && python3 -m tests.serialize_test
+
+import os
+import glob
+import shutil
+import tempfile
+import unittest
+
+from daedalus.lexer import Lexer, Token
+from daedalus.parser import Parser
+from daedalus import serialize
+
+class SerializeTestCase(unittest.TestCase):
+
+    def roundtrip(self, record):
+        return serialize.loads(serialize.dumps(record))
+
+    def test_001_values(self):
+
+        record = (None, True, False, 0, -1, 300, -70000, "", "abc", "é中",
+            [1, [2, "x"]], (3, None), {"a": {"b": "c"}, "d": []})
+        self.assertEqual(self.roundtrip(record), record)
+
+    def test_001_token_attributes(self):
+
+        tok = Token(Token.T_TEXT, 70000, 3, "x", file="mod.js")
+        tok.original_value = "y"
+        tok.ref_attr = 4
+        tok._maybe_illegal = True
+        root = Token(Token.T_MODULE, 0, 0, "", [tok, Token(Token.T_NUMBER, 2, -1, "1")])
+
+        copy, = self.roundtrip((root,))
+        self.assertEqual(copy.toString(1), root.toString(1))
+        child = copy.children[0]
+        self.assertEqual(child.file, "mod.js")
+        self.assertEqual(child.original_value, "y")
+        self.assertEqual(child.ref_attr, 4)
+        self.assertTrue(child._maybe_illegal)
+        self.assertIsNone(copy.children[1].file)
+        self.assertEqual(copy.children[1].index, -1)
+        self.assertFalse(hasattr(copy.children[1], '_maybe_illegal'))
+
+    def test_001_unsupported(self):
+
+        with self.assertRaises(serialize.SerializeError):
+            serialize.dumps((1.5,))
+
+        tok = Token(Token.T_TEXT, 1, 0, "x")
+        tok.ref = object()
+        with self.assertRaises(serialize.SerializeError):
+            serialize.dumps((tok,))
+
+        with self.assertRaises(serialize.SerializeError):
+            serialize.loads(b"XXXX\x01")
+
+    def test_002_examples(self):
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        paths = sorted(glob.glob(os.path.join(root, "examples", "*.js")))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path) as rf:
+                text = rf.read()
+            parser = Parser()
+            parser.disable_all_warnings = True
+            ast = parser.parse(Lexer().lex(text))
+            data = serialize.dumps((len(text), ast))
+            size, copy = serialize.loads(data)
+            self.assertEqual(size, len(text))
+            self.assertEqual(copy.toString(1), ast.toString(1), path)
+
+    def test_003_lazy_mmap(self):
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "record")
+            ast = Parser().parse(Lexer().lex("x = f(1, [2, 3])"))
+            with open(path, "wb") as wb:
+                wb.write(serialize.dumps((ast, ["x"], {"./a.js": {"a": "a"}})))
+
+            reader = serialize.load(path)
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(reader[2], {"./a.js": {"a": "a"}})
+            self.assertEqual(reader.decoded, [False, False, True])
+            self.assertEqual(reader[0].toString(1), ast.toString(1))
+            self.assertEqual(list(reader)[1], ["x"])
+        finally:
+            shutil.rmtree(tmpdir)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 
 import unittest
 
+from daedalus.lexer import Lexer, Token
+from daedalus.parser import Parser
+from daedalus.formatter import Formatter
 from daedalus.sourcemap import SourceMap
 
 class SourceMapTestCase(unittest.TestCase):
@@ -31,6 +34,39 @@ class SourceMapTestCase(unittest.TestCase):
         expected = [[[0, 0, 0, 0], [7, 0, 0, 8]], [[2, 0, 1, -7], [5, 0, 0, 5], [2, 0, 0, 2], [5, 0, 0, 5]]]
 
         self.assertEqual(expected, vlqs)
+
+    def test_002_join(self):
+
+        parts = [
+            ("a", "function f(x) {\n  return x + 1\n}"),
+            ("b", "const y = f(2)\nlet z = [y,\n  y]"),
+            (None, "w = 0"),
+            ("a", "console.log(f(y), z)"),
+        ]
+
+        asts = []
+        for name, text in parts:
+            tokens = Lexer().lex(text)
+            for token in tokens:
+                token.file = name
+            asts.append(Parser().parse(tokens))
+
+        whole = Token(Token.T_MODULE, 0, 0, "", sum([ast.children for ast in asts], []))
+        formatter = Formatter(opts={'minify': False})
+        expected = formatter.format(whole)
+
+        texts = []
+        maps = []
+        for ast in asts:
+            formatter_ = Formatter(opts={'minify': False})
+            texts.append(formatter_.format(ast))
+            maps.append(formatter_.sourcemap)
+        srcmap = SourceMap.join(maps)
+
+        self.assertEqual("\n".join(texts), expected)
+        self.assertEqual(srcmap.getSourceMap(), formatter.sourcemap.getSourceMap())
+        self.assertEqual(srcmap.getServerMap(), formatter.sourcemap.getServerMap())
+
 def main():
     unittest.main()
 
@@ -0,0 +1,84 @@
+#! cd .. && python3 -m tests.trace_test
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from daedalus.trace import Tracer, span
+from daedalus.builder import Builder
+
+class TracerTestCase(unittest.TestCase):
+
+    def test_001_span(self):
+
+        tracer = Tracer()
+        with span(tracer, "outer"):
+            with span(tracer, "inner", file="a.js"):
+                pass
+        tracer.addTime("transform", 0.5, 2)
+
+        # spans are recorded when they end
+        inner, outer = tracer.events
+        self.assertEqual(inner["name"], "inner")
+        self.assertEqual(inner["ph"], "X")
+        self.assertEqual(inner["args"], {"file": "a.js"})
+        self.assertNotIn("args", outer)
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertGreaterEqual(outer["ts"] + outer["dur"], inner["ts"] + inner["dur"])
+
+        self.assertEqual(tracer.totals["inner"][0], 1)
+        self.assertEqual(tracer.totals["transform"], [2, 0.5])
+
+        summary = tracer.summary()
+        self.assertIn("transform", summary)
+        self.assertIn("a.js", summary)
+
+    def test_001_disabled(self):
+        # without a tracer the span does nothing
+        with span(None, "phase", file="a.js"):
+            pass
+
+    def test_002_save(self):
+
+        tracer = Tracer()
+        with span(tracer, "phase"):
+            pass
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "trace.json")
+            tracer.save(path)
+            with open(path) as rf:
+                data = json.load(rf)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEqual([event["name"] for event in data["traceEvents"]], ["phase"])
+
+class BuilderTraceTestCase(unittest.TestCase):
+
+    def test_001_build(self):
+
+        builder = Builder([], {})
+        builder.cache = None
+        builder.tracer = Tracer()
+        builder.build("res/daedalus_test/daedalus_test.js", sourcemap=True)
+        self.assertIsNone(builder.error)
+
+        names = {event["name"] for event in builder.tracer.events}
+        for name in ["discover", "load", "lex", "parse", "imports", "order", "fold", "shake",
+                "module", "assemble", "scope", "format", "sourcemap", "html"]:
+            self.assertIn(name, names)
+
+        # the time spent in each transform is attached to the parse span
+        parse = next(event for event in builder.tracer.events if event["name"] == "parse")
+        self.assertIn("TransformGrouping", parse["args"]["transforms"])
+        self.assertIn("transform TransformGrouping", builder.tracer.totals)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -2,14 +2,17 @@
 
 
 import unittest
+from unittest import mock
 from tests.util import parsecmp, TOKEN
 
 from daedalus.lexer import Lexer
 from daedalus.parser import Parser as ParserBase
 from daedalus.formatter import Formatter
+from daedalus.token import Token
 from daedalus.transform import TransformIdentityScope, \
     TransformMinifyScope, getModuleImportExport, TransformIdentityBlockScope, \
-    TransformExtractStyleSheet, TransformError
+    TransformExtractStyleSheet, TransformError, TransformPipeline, \
+    TransformConstEval, IdentityScope, SC_BLOCK, SC_FUNCTION
 
 class Parser(ParserBase):
     def __init__(self):
@@ -693,6 +696,151 @@ class TransformImportExport(unittest.TestCase):
         expected_text = "const Point=undefined"
         self.assertEqual(text, expected_text)
 
+class TransformPipelineTestCase(unittest.TestCase):
+
+    text = """
+        const a = 1 + 2, b = {min-height: 0};
+        lbl: { f(a?.b); g(x?.[0]) }
+        switch (a) { case 1: f(); break; default: g(__LINE__) }
+        const styles = {
+            body: StyleSheet({background: '#000000'}),
+        }
+        x = `${[1, 2, 3]}`
+    """
+
+    def parse(self, text):
+        parser = Parser()
+        xform = TransformExtractStyleSheet("__test__")
+        parser.transforms = [TransformConstEval(), xform]
+        ast = parser.parse(Lexer().lex(text))
+        return ast, xform.getStyles()
+
+    def test_001_schedule(self):
+
+        parser = Parser()
+        parser.transforms = [TransformConstEval(), TransformExtractStyleSheet("__test__")]
+        with mock.patch.object(TransformPipeline, "transform", autospec=True) as transform:
+            parser.parse(Lexer().lex("x = 1"))
+        pipeline = transform.call_args[0][0]
+
+        stages = [[type(xform).__name__ for xform in stage] for stage in pipeline.stages]
+        self.assertEqual(stages, [
+            ["TransformGrouping"],
+            ["TransformRemoveSemicolons"],
+            ["TransformFlatten", "TransformOptionalChaining",
+             "TransformMagicConstants", "TransformTemplateString",
+             "TransformConstEval"],
+            ["TransformExtractStyleSheet"],
+        ])
+
+    def test_002_fused(self):
+
+        ast1, styles1 = self.parse(self.text)
+
+        # apply every transform in a separate traversal
+        separate = staticmethod(lambda xforms: [[xform] for xform in xforms])
+        with mock.patch.object(TransformPipeline, "schedule", separate):
+            ast2, styles2 = self.parse(self.text)
+
+        self.assertEqual(ast1.toString(3), ast2.toString(3))
+        self.assertEqual(styles1, styles2)
+        self.assertEqual(Formatter().format(ast1), Formatter().format(ast2))
+
+    def test_003_timings(self):
+
+        timings = {}
+        parser = Parser()
+        parser.transforms = [TransformConstEval()]
+        parser.transform_timings = timings
+        parser.parse(Lexer().lex(self.text))
+
+        self.assertIn("traversal", timings)
+        self.assertIn("TransformGrouping", timings)
+        self.assertIn("TransformConstEval", timings)
+        self.assertTrue(all(elapsed >= 0 for elapsed in timings.values()))
+
+class TransformMinifyRankTestCase(unittest.TestCase):
+
+    def minify(self, text, rank_labels):
+        ast = Parser().parse(Lexer().lex(text))
+        xform = TransformMinifyScope()
+        xform.rank_labels = rank_labels
+        globals = xform.transform(ast)
+        return Formatter().format(ast), globals
+
+    def test_001_rank(self):
+        text = """
+            let first = 1
+            let second = 2
+            second = second + second + second
+            function f(x) { let y = x * 2; return y + second }
+            function g(p) { let q = p * 3; return q + first + a }
+        """
+
+        # the most referenced variable is given the first label which
+        # does not collide with the undefined global 'a'. sibling functions
+        # reuse labels which are not used by a variable they reference
+        output, globals = self.minify(text, True)
+        self.assertEqual(globals, {'f': 'd', 'g': 'e', 'first': 'c', 'second': 'b'})
+        self.assertEqual(output, "let c=1;let b=2;b=b+b+b;"
+            "function d(a){let c=a*2;return c+b};"
+            "function e(b){let d=b*3;return d+c+a}")
+
+    def test_002_single_pass(self):
+        text = """
+            let first = 1
+            function f(x) { return x + first }
+        """
+
+        output, globals = self.minify(text, False)
+        self.assertEqual(globals, {'f': 'a', 'first': 'b'})
+        self.assertEqual(output, "let b=1;function a(c){return c+b}")
+
+class VariableScopeTestCase(unittest.TestCase):
+
+    def define(self, scope, scflags, label):
+        return scope.define(scflags, Token(Token.T_TEXT, 1, 0, label))
+
+    def test_001_nested_blocks(self):
+
+        scope = IdentityScope("test")
+        scope.options.disable_warnings = True
+        fn = self.define(scope, SC_FUNCTION, "x")
+        refs = []
+        for depth in range(100):
+            scope.pushBlockScope()
+            refs.append(self.define(scope, SC_BLOCK, "x"))
+            self.define(scope, SC_BLOCK, "v%d" % depth)
+
+        # the innermost definition is found, and an outer block
+        # is found once the inner blocks are removed
+        self.assertIs(scope._getRef("x"), refs[-1])
+        self.assertEqual(scope._getRef("x").counter, 100)
+        self.assertIsNotNone(scope._getRef("v0"))
+        for ref in reversed(refs):
+            self.assertIs(scope._getRef("x"), ref)
+            scope.popBlockScope()
+        self.assertIs(scope._getRef("x"), fn)
+        self.assertIsNone(scope._getRef("v0"))
+        self.assertEqual(scope.blscope_index, {})
+
+    def test_002_parallel_blocks(self):
+
+        text = """
+            function f(a) {
+                let x = a
+                if (a) { let x = 1; a += x } else { let x = 2; a += x }
+                { { x += a } }
+                return x
+            }
+        """
+        ast = Parser().parse(Lexer().lex(text))
+        TransformIdentityBlockScope().transform(ast)
+        output = Formatter().format(ast)
+        self.assertIn("a+=x#b2", output)
+        self.assertIn("x+=a", output)
+        self.assertIn("return x", output)
+
 def main():
     unittest.main()
 
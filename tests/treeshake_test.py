@@ -0,0 +1,169 @@
+#! cd .. && python3 -m tests.treeshake_test
+
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from daedalus.lexer import Lexer
+from daedalus.parser import Parser
+from daedalus.builder import Builder
+from daedalus.incremental import IncrementalBuilder
+from daedalus.treeshake import scanStatement
+
+def parse(text):
+    parser = Parser()
+    parser.disable_all_warnings = True
+    return parser.parse(Lexer().lex(text))
+
+class ScanStatementTestCase(unittest.TestCase):
+
+    def scan(self, text):
+        return [scanStatement(token) for token in parse(text).children]
+
+    def test_001_declarations(self):
+
+        self.assertEqual(self.scan("""
+            function f() { g() }
+            async function g() {}
+            class A extends B { static x = 1; m() {} }
+            const x = 1, y = [x, {a: 2}], z = () => x
+            let w
+        """), [
+            (["f"], True),
+            (["g"], True),
+            (["A"], True),
+            (["x", "y", "z"], True),
+            (["w"], True),
+        ])
+
+    def test_002_side_effects(self):
+
+        self.assertEqual(self.scan("""
+            const x = f()
+            let y = 1, z = a.b
+            class A extends mixin(B) {}
+            class C { static x = f() }
+            var [a, b] = c
+            x.y = 1
+        """), [
+            (["x"], False),
+            (["y", "z"], False),
+            (["A"], False),
+            (["C"], False),
+            (["a", "b"], False),
+            ([], False),
+        ])
+
+class TreeShakeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.write("app/app.js",
+            "from module lib import {twice, unused}\n"
+            "export function main() {\n"
+            "    return twice(2)\n"
+            "}\n")
+        self.write("lib/lib.js",
+            "include './extra.js'\n"
+            "let counter = 0\n"
+            "function helper(x) {\n"
+            "    return 2 * x\n"
+            "}\n"
+            "export function twice(x) {\n"
+            "    return helper(x)\n"
+            "}\n"
+            "export function unused() {\n"
+            "    return counter\n"
+            "}\n"
+            "console.log('loaded')\n")
+        self.write("lib/extra.js",
+            "export const table = {a: 1}\n"
+            "export class Model {}\n")
+        self.path = os.path.join(self.tmpdir, "app", "app.js")
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mtime = os.stat(path).st_mtime if os.path.exists(path) else 0
+        with open(path, "w") as wf:
+            wf.write(text)
+        # the modified time must change for the file to be reloaded
+        if os.stat(path).st_mtime <= mtime:
+            os.utime(path, (mtime + 1, mtime + 1))
+
+    def build(self, builder, tree_shake=True):
+        builder.cache = None
+        builder.tree_shake = tree_shake
+        with contextlib.redirect_stdout(io.StringIO()):
+            css, js, html = builder.build(self.path)
+        self.assertIsNone(builder.error)
+        return js
+
+    def test_001_shake(self):
+
+        builder = Builder([self.tmpdir], {})
+        js = self.build(builder)
+
+        self.assertEqual(builder.shake_report,
+            {"lib": ["Model", "counter", "table", "unused"]})
+
+        # used declarations, and the statements they depend on, are kept
+        self.assertIn("function twice", js)
+        self.assertIn("function helper", js)
+        self.assertIn("console.log('loaded')", js)
+        self.assertIn("return{'main':main}", js.replace(" ", ""))
+        self.assertIn("return{'twice':twice}", js.replace(" ", ""))
+        self.assertNotIn("unused", js)
+        self.assertNotIn("Model", js)
+
+    def test_002_disabled(self):
+
+        builder = Builder([self.tmpdir], {})
+        js = self.build(builder, False)
+
+        self.assertEqual(builder.shake_report, {})
+        self.assertIn("function unused", js)
+        self.assertIn("class Model", js)
+
+    def test_003_module_name(self):
+
+        # a module used by name keeps every export
+        self.write("app/app.js",
+            "from module lib import {twice}\n"
+            "export function main() {\n"
+            "    return lib.unused() + twice(2)\n"
+            "}\n")
+
+        builder = Builder([self.tmpdir], {})
+        js = self.build(builder)
+        self.assertEqual(builder.shake_report, {})
+        self.assertIn("function unused", js)
+
+    def test_004_incremental(self):
+
+        builder = IncrementalBuilder([self.tmpdir], {})
+        self.assertNotIn("function unused", self.build(builder))
+
+        # the library is built again when another export is used
+        self.write("app/app.js",
+            "from module lib import {twice, unused}\n"
+            "export function main() {\n"
+            "    return twice(unused())\n"
+            "}\n")
+        js = self.build(builder)
+        self.assertIn("function unused", js)
+        self.assertEqual(js, self.build(Builder([self.tmpdir], {})))
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
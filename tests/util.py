@@ -2,6 +2,7 @@
 from daedalus.lexer import Token
 import time
 import math
+from unittest import mock
 
 def edit_distance(hyp, ref, eq=None):
     """
@@ -132,6 +133,22 @@ def parsecmp(expected, actual, debug=False):
         print(actual.toString(2))
     return error_count
 
+def engine_variant(cls, module, name, replacement, suffix):
+    """
+    create a copy of a test case which replaces a global of the test
+    module, such as the lexer or parser class, while each test is run.
+    the copy is named by inserting the suffix before TestCase
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(module, name, replacement)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cls.setUp(self)
+
+    name_ = cls.__name__.replace("TestCase", suffix + "TestCase")
+    return type(name_, (cls,), {"setUp": setUp})
+
 def TOKEN(t, v, *children):
     return Token(getattr(Token, t), 1, 0, v, children)
 
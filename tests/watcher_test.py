@@ -0,0 +1,167 @@
+#! cd .. && python3 -m tests.watcher_test
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from daedalus.watcher import FileWatcher, InotifyBackend, PollingBackend, _loadInotify
+from daedalus.server import SampleResource
+
+class FileWatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "a.js")
+        self.other = os.path.join(self.tmpdir, "b.js")
+        self.write(self.path, "x = 1")
+        self.write(self.other, "y = 1")
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, text):
+        mtime = os.stat(path).st_mtime if os.path.exists(path) else 0
+        with open(path, "w") as wf:
+            wf.write(text)
+        if os.stat(path).st_mtime <= mtime:
+            os.utime(path, (mtime + 1, mtime + 1))
+
+    def check_watcher(self, poll):
+
+        calls = []
+        event = threading.Event()
+
+        def callback():
+            calls.append(time.time())
+            event.set()
+
+        watcher = FileWatcher(callback, debounce=0.2, poll=poll)
+        if poll:
+            self.assertIsInstance(watcher.backend, PollingBackend)
+        watcher.backend.interval = 0.05
+        watcher.watch([self.path])
+        watcher.start()
+        try:
+            # a file which is not watched
+            self.write(self.other, "y = 2")
+            self.assertFalse(event.wait(1.0))
+
+            # several changes result in a single call
+            for i in range(3):
+                self.write(self.path, "x = %d" % (i + 2))
+                time.sleep(0.05)
+            self.assertTrue(event.wait(5.0))
+            time.sleep(0.5)
+            self.assertEqual(len(calls), 1)
+        finally:
+            watcher.stop()
+
+    def check_created(self, poll):
+
+        event = threading.Event()
+        watcher = FileWatcher(event.set, debounce=0.1, poll=poll)
+        watcher.backend.interval = 0.05
+        watcher.watch([self.path], [self.tmpdir])
+        watcher.start()
+        try:
+            # a new file which is not javascript
+            self.write(os.path.join(self.tmpdir, "c.txt"), "")
+            self.assertFalse(event.wait(1.0))
+
+            self.write(os.path.join(self.tmpdir, "c.js"), "z = 1")
+            self.assertTrue(event.wait(5.0))
+        finally:
+            watcher.stop()
+
+    def test_001_polling(self):
+        self.check_watcher(True)
+
+    def test_002_polling_created(self):
+        self.check_created(True)
+
+    @unittest.skipIf(_loadInotify() is None, "inotify is not available")
+    def test_002_inotify_created(self):
+        self.check_created(False)
+
+    @unittest.skipIf(_loadInotify() is None, "inotify is not available")
+    def test_001_inotify(self):
+        watcher = FileWatcher(lambda: None)
+        self.assertIsInstance(watcher.backend, InotifyBackend)
+        watcher.backend.close()
+        self.check_watcher(False)
+
+class SampleResourceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "app", "app.js")
+        os.makedirs(os.path.dirname(self.path))
+        self.write(self.path, "export function main() {\n    return 1\n}\n")
+        # the builder uses an ast cache which is removed with the test
+        self.env = mock.patch.dict(os.environ,
+            {"DAEDALUS_CACHE_DIR": os.path.join(self.tmpdir, "cache")})
+        self.env.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, text):
+        mtime = os.stat(path).st_mtime if os.path.exists(path) else 0
+        with open(path, "w") as wf:
+            wf.write(text)
+        if os.stat(path).st_mtime <= mtime:
+            os.utime(path, (mtime + 1, mtime + 1))
+
+    def wait(self, resource, text):
+        deadline = time.time() + 10
+        while text not in resource.source and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertIn(text, resource.source)
+
+    def test_001_rebuild(self):
+
+        resource = SampleResource(self.path, [self.tmpdir], {}, self.tmpdir)
+        try:
+            self.assertIn(self.path, resource._watchPaths())
+            self.assertEqual(resource._watchDirectories(), [])
+            self.assertIn("return 1", resource.source)
+
+            self.write(self.path, "export function main() {\n    return 2\n}\n")
+            self.wait(resource, "return 2")
+        finally:
+            resource.watcher.stop()
+
+    def test_002_include_created(self):
+
+        resource = SampleResource(self.path, [self.tmpdir], {}, self.tmpdir)
+        try:
+            # the build fails until the included file is created
+            self.write(self.path, "include './b.js'\n"
+                "export function main() {\n    return other()\n}\n")
+            deadline = time.time() + 10
+            while resource.builder.error is None and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertIsNotNone(resource.builder.error)
+            self.assertIn(os.path.dirname(self.path), resource._watchDirectories())
+
+            self.write(os.path.join(os.path.dirname(self.path), "b.js"),
+                "export function other() {\n    return 3\n}\n")
+            self.wait(resource, "return 3")
+            self.assertIsNone(resource.builder.error)
+        finally:
+            resource.watcher.stop()
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()